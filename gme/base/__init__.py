@@ -8,6 +8,9 @@ DEV: functions/modules/classes with a * have not been developed yet
 
 This includes the following modules:
 	gmeBase
+	colParse
+	parseCheck
+	ftpStream
 
 *******************************
 """
@@ -18,6 +21,15 @@ except Exception,e: print e
 try: from gmeBase import *
 except Exception,e: print e
 
+try: import colParse
+except Exception,e: print e
+
+try: import parseCheck
+except Exception,e: print e
+
+try: import ftpStream
+except Exception,e: print e
+
 try: import fillGmedb
 except Exception,e: print e
 
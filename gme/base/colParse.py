@@ -0,0 +1,299 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: colParse
+   :synopsis: Vectorized parsers for the ASCII files of the gme data sources
+
+*****************************
+**Module**: colParse
+*****************************
+These turn a whole text file into numpy columns at once, driven by a
+list of column specs, instead of splitting each line and building an
+object per record in python.  Missing values are masked to NaN.
+
+A column spec is a tuple (name, where, kind, fill):
+	* **name** (str): the key of the column in the output
+	* **where**: the field index for :func:`splitColumns`, or a (start, end) pair of character positions for :func:`fixedColumns`
+	* **kind** (str): 'f' for floats, 'i' for ints, 'S' for the raw strings, 'date' for yyyy-mm-dd dates (as datetime64[D]) or 'hms' for hh:mm:ss[.sss] times of day (as timedelta64[ms])
+	* **fill**: for float columns, the value that marks missing data, a list of them, 'nines' for values written as all 9s (eg 999.99 or 99999), or None.  blank fixed width fields are always missing.
+
+**Functions**:
+	* :func:`splitColumns`
+	* :func:`fixedColumns`
+	* :func:`iagaColumns`
+	* :func:`makeTimes`
+	* :func:`columnsToRecs`
+	* :func:`columnsToArrays`
+"""
+
+def _nines(v):
+	"""the values that could be written only with 9s and a decimal point, eg 9999.99.  these are only candidates: 9.0 and 99.00 have the values of 9. and 99. but are real data, see :func:`_allNines`"""
+	import numpy as np
+	mask = np.zeros(len(v),dtype=bool)
+	with np.errstate(invalid='ignore'):
+		idx = np.where(v >= 9)[0]
+	w = v[idx]
+	for d in range(6):
+		x = w+10.**-d
+		mask[idx] |= np.abs(x-10.**np.round(np.log10(x))) < 10.**-d*1e-3
+	return mask
+
+def _allNines(tok):
+	"""mask the strings that have only 9s and decimal points, as the fill values are written"""
+	import numpy as np
+	tok = np.ascontiguousarray(tok,dtype=str)
+	c = tok.view(np.uint8).reshape(len(tok),tok.dtype.itemsize)
+	nines = c == ord('9')
+	return (nines | (c == ord('.')) | (c == ord(' ')) | (c == 0)).all(axis=1) & nines.any(axis=1)
+
+def _allNinesText(text):
+	"""for each whitespace separated field of a string, whether it has no characters but 9s and decimal points.  this works on the characters as bytes, so a whole chunk of lines is checked without splitting it.  it is only asked about fields whose values are already :func:`_nines` candidates, so they hold a 9"""
+	import numpy as np
+	c = np.frombuffer(text,dtype=np.uint8)
+	if(len(c) == 0): return np.zeros(0,dtype=bool)
+	space = (c == ord(' ')) | (c == ord('\t')) | (c == ord('\r')) | (c == ord('\n'))
+	#the first and last character of each field
+	edge = np.diff(np.concatenate(([True],space,[True])).view(np.int8))
+	first,last = np.flatnonzero(edge == -1),np.flatnonzero(edge == 1)
+	#count the other characters in each field by differencing a running sum
+	other = np.zeros(len(c)+1,dtype=np.int32)
+	np.cumsum(~(space | (c == ord('9')) | (c == ord('.'))),out=other[1:])
+	return other[last] == other[first]
+
+def _subField(tok, a, b):
+	"""characters a:b of each string in an array of strings"""
+	import numpy as np
+	w = max(tok.dtype.itemsize,b)
+	chars = np.ascontiguousarray(tok.astype('S%d' % w)).view('S1').reshape(len(tok),w)
+	return np.ascontiguousarray(chars[:,a:b]).view('S%d' % (b-a)).ravel()
+
+def _convert(tok, kind, fill, blanks=False):
+	"""convert an array of strings to a column of the given kind.  blanks says whether there can be blank fields, which split fields never are"""
+	import numpy as np
+	if(kind == 'S'): return tok
+	if(kind == 'date'): return tok.astype('datetime64[D]')
+	if(kind == 'hms'):
+		hms = [_subField(tok,a,a+2).astype(np.int64) for a in [0,3,6]]
+		ms = np.zeros(len(tok),dtype=np.int64)
+		if(tok.dtype.itemsize > 9):
+			frac = _subField(tok,8,12)
+			frac[np.char.strip(frac) == ''] = '0'
+			ms = np.round(frac.astype(np.float64)*1e3).astype(np.int64)
+		return (((hms[0]*60+hms[1])*60+hms[2])*1000+ms).astype('timedelta64[ms]')
+	#blank fields are missing
+	if(blanks): blank = np.char.strip(tok) == ''
+	else: blank = np.zeros(len(tok),dtype=bool)
+	if(blank.any()):
+		tok = tok.copy()
+		tok[blank] = '0'
+	if(kind == 'i' and fill == None and not blank.any()): return tok.astype(np.int64)
+	col = _mask(tok.astype(np.float64),'f',fill,lambda idx: _allNines(tok[idx]))
+	col[blank] = np.nan
+	return col
+
+def _mask(col, kind, fill, isNines=None):
+	"""set the fill values of a float column to NaN, or make it int if it is an int column without fill.  for 'nines', isNines is called with the indices of the rows whose values could be all 9s, and says which of them are written that way"""
+	import numpy as np
+	if(kind == 'i' and fill == None): return col.astype(np.int64)
+	if(fill == 'nines'):
+		idx = np.where(_nines(col))[0]
+		if(len(idx) > 0): col[idx[isNines(idx)]] = np.nan
+	elif(fill != None):
+		if(not isinstance(fill,(list,tuple))): fill = [fill]
+		for x in fill: col[col == x] = np.nan
+	return col
+
+def splitColumns(lines, cols, chunkSize=20000):
+	"""Parses lines of whitespace separated fields into numpy columns.  Every line must have the same number of fields, so headers should be dropped first.  The lines are split a chunk at a time, so memory use is bounded by chunkSize.
+
+	**Args**:
+		* **lines** (list): the lines of text
+		* **cols** (list): the column specs, with the field index for where
+		* [**chunkSize**] (int): the number of lines split at a time.  default = 20000
+	**Returns**:
+		* **out** (dict): a numpy array per column name
+	**Example**:
+		::
+
+			cols = splitColumns(lines,[('year',0,'i',None),('bx',14,'f','nines')])
+
+	"""
+	import numpy as np
+	parts = dict((c[0],[]) for c in cols)
+	numeric = all([c[2] in ['f','i'] for c in cols])
+	for i in range(0,len(lines),chunkSize):
+		chunk = lines[i:i+chunkSize]
+		nFields = len(chunk[0].split())
+		text = ' '.join(chunk)
+		#when every field is a number, numpy can parse the whole chunk
+		#straight to floats, which is much faster than going via strings
+		nums = None
+		if(numeric):
+			try: nums = np.fromstring(text,dtype=np.float64,sep=' ')
+			except ValueError: nums = None
+			if(nums is not None and len(nums) != nFields*len(chunk)): nums = None
+		if(nums is not None):
+			nums = nums.reshape(len(chunk),nFields)
+			#the text is only checked if some rows may be all 9s, and
+			#then once for all the columns
+			nines = []
+			def isNines(idx, where):
+				if(len(nines) == 0): nines.append(_allNinesText(text).reshape(len(chunk),nFields))
+				return nines[0][idx,where]
+			for name,where,kind,fill in cols:
+				parts[name].append(_mask(nums[:,where].copy(),kind,fill, \
+					lambda idx: isNines(idx,where)))
+			continue
+		tok = np.array(text.split())
+		if(len(tok) != nFields*len(chunk)):
+			raise ValueError('lines '+str(i)+' to '+str(i+len(chunk))+' do not all have '+str(nFields)+' fields')
+		tok = tok.reshape(len(chunk),nFields)
+		for name,where,kind,fill in cols:
+			parts[name].append(_convert(tok[:,where],kind,fill))
+	out = {}
+	for name,where,kind,fill in cols:
+		if(len(parts[name]) > 0): out[name] = np.concatenate(parts[name])
+		else: out[name] = _convert(np.zeros(0,dtype='S1'),kind,fill)
+	return out
+
+def fixedColumns(lines, cols):
+	"""Parses lines of fixed width fields into numpy columns.  Short lines are padded with blanks.
+
+	**Args**:
+		* **lines** (list): the lines of text
+		* **cols** (list): the column specs, with a (start, end) pair of character positions for where
+	**Returns**:
+		* **out** (dict): a numpy array per column name
+	**Example**:
+		::
+
+			cols = fixedColumns(lines,[('month',(2,4),'i',None),('kpSum',(28,31),'f',None)])
+
+	"""
+	import numpy as np
+	width = max([len(l) for l in lines]+[max([c[1][1] for c in cols])])
+	chars = np.array([l.ljust(width) for l in lines],dtype='S%d' % width)
+	out = {}
+	for name,(a,b),kind,fill in cols:
+		out[name] = _convert(_subField(chars,a,b),kind,fill,blanks=True)
+	return out
+
+def iagaColumns(lines, names, fill=99999.):
+	"""Parses the lines of an IAGA2002 file, as served by the WDC Kyoto, into numpy columns.  The header lines are dropped.
+
+	**Args**:
+		* **lines** (list): the lines of the file
+		* **names** (list): the names of the data columns after DATE, TIME and DOY, in order
+		* [**fill**] (float): the value that marks missing data.  default = 99999.
+	**Returns**:
+		* **cols** (dict): a datetime64 array 'time' and a float array for each name
+	**Example**:
+		::
+
+			cols = iagaColumns(lines,['dst'])
+
+	"""
+	lines = [l for l in lines if(l.strip() != '' and l[0] != ' ' and l[0:4] != 'DATE')]
+	spec = [('date',0,'date',None),('hms',1,'hms',None)]+[(names[i],3+i,'f',fill) for i in range(len(names))]
+	cols = splitColumns(lines,spec)
+	cols['time'] = cols.pop('date').astype('datetime64[ms]')+cols.pop('hms')
+	return cols
+
+def makeTimes(year, month=None, day=None, doy=None, hour=0, minute=0, second=0):
+	"""Builds a datetime64[ms] array from arrays of date and time parts.  Either month and day or doy (day of year) must be given.  second may be fractional.
+
+	**Args**:
+		* **year** (array): the years
+		* [**month**] (array): the months, 1-12
+		* [**day**] (array): the days of the month
+		* [**doy**] (array): the days of the year, 1-366
+		* [**hour**] (array): the hours.  default = 0
+		* [**minute**] (array): the minutes.  default = 0
+		* [**second**] (array): the seconds.  default = 0
+	**Returns**:
+		* **time** (numpy.ndarray): datetime64[ms] times
+	**Example**:
+		::
+
+			time = makeTimes(cols['year'],doy=cols['doy'],hour=cols['hour'],minute=cols['minute'])
+
+	"""
+	import numpy as np
+	year = np.asarray(year,dtype=np.int64)
+	t = (year-1970).astype('datetime64[Y]')
+	if(doy is not None): t = t.astype('datetime64[D]')+(np.asarray(doy,dtype=np.int64)-1)
+	else:
+		t = t.astype('datetime64[M]')+(np.asarray(month,dtype=np.int64)-1)
+		t = t.astype('datetime64[D]')+(np.asarray(day,dtype=np.int64)-1)
+	ms = (np.asarray(hour,dtype=np.int64)*3600+np.asarray(minute,dtype=np.int64)*60)*1000 + \
+		np.round(np.asarray(second,dtype=np.float64)*1e3).astype(np.int64)
+	return t.astype('datetime64[ms]')+ms.astype('timedelta64[ms]')
+
+def columnsToRecs(cols, make, names, mask=None, ints=[]):
+	"""Builds a list of record objects from parsed columns.  NaNs become None.
+
+	**Args**:
+		* **cols** (dict): the columns, including a datetime64 'time'
+		* **make** (function): called with no arguments to make each empty record
+		* **names** (list): the columns to copy into the records as attributes
+		* [**mask**] (numpy.ndarray): if given, only the rows where this is True are used.  default = None
+		* [**ints**] (list): the names of integer columns that were made float to hold NaNs, whose values should be ints again.  default = []
+	**Returns**:
+		* **recs** (list): the records
+	**Example**:
+		::
+
+			recs = columnsToRecs(cols,lambda: omniRec(res=5),['bx','bye'])
+
+	"""
+	import numpy as np, math
+	if(mask is not None): cols = dict((x,cols[x][mask]) for x in ['time']+list(names))
+	times = cols['time'].astype('datetime64[us]').astype(object)
+	vals = [cols[x].tolist() for x in names]
+	recs = []
+	for i in range(len(times)):
+		rec = make()
+		rec.time = times[i]
+		for j in range(len(names)):
+			v = vals[j][i]
+			if(isinstance(v,float) and math.isnan(v)): v = None
+			elif(names[j] in ints and v != None): v = int(v)
+			setattr(rec,names[j],v)
+		recs.append(rec)
+	return recs
+
+def columnsToArrays(cols, make, names, mask=None):
+	"""Wraps parsed columns in a :class:`gme.base.gmeBase.gmeArrays`, without making an object per record.
+
+	**Args**:
+		* **cols** (dict): the columns, including a datetime64 'time'
+		* **make** (function): called with no arguments to make an empty record, which gives the dataSet and info
+		* **names** (list): the columns to keep
+		* [**mask**] (numpy.ndarray): if given, only the rows where this is True are kept.  default = None
+	**Returns**:
+		* **arrs** (:class:`gme.base.gmeBase.gmeArrays`): the arrays
+	**Example**:
+		::
+
+			arrs = columnsToArrays(cols,lambda: omniRec(res=5),['bx','bye'])
+
+	"""
+	from gme.base.gmeBase import gmeArrays
+	if(mask is not None): cols = dict((x,cols[x][mask]) for x in ['time']+list(names))
+	else: cols = dict((x,cols[x]) for x in ['time']+list(names))
+	rec = make()
+	return gmeArrays(cols,dataSet=getattr(rec,'dataSet',None),info=getattr(rec,'info',None))
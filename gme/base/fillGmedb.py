@@ -1,100 +1,237 @@
 # Copyright (C) 2012  VT SuperDARN Lab
 # Full license can be found in LICENSE.txt
-# 
+#
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
 # the Free Software Foundation, either version 3 of the License, or
 # (at your option) any later version.
-# 
+#
 # This program is distributed in the hope that it will be useful,
 # but WITHOUT ANY WARRANTY; without even the implied warranty of
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 # GNU General Public License for more details.
-# 
+#
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-def fillGmeDb(time='recent'):
-	import gme, os
-	import pydarn.sdio.dbUtils as dbu
-	from multiprocessing import Process
+"""
+.. module:: fillGmedb
+   :synopsis: Loads the gme data sources into the mongodb
+
+*****************************
+**Module**: fillGmedb
+*****************************
+Each source is loaded as a list of tasks of a month (or a year, for
+files that hold a year) run across a pool of processes.  The time of the
+newest record loaded from each source, its high-water mark, is kept in
+the fillState collection of the gme database, so a rerun only fetches
+the data after it, less an overlap for data that is revised after it is
+first released.  A task that fails, including one where any record
+could not be written, is retried with an increasing delay.  The writes
+use the pymongo 2 API, which pymongo 3 still accepts.
+
+**Functions**:
+	* :func:`fillGmeDb`
+	* :func:`fillTasks`
+	* :func:`getHighWater`
+"""
+
+#what fillGmeDb loads: the module and reader that fetch a time range,
+#the extra reader arguments, the collection, the key the records are
+#upserted on and the query that selects the source's records in it, the
+#first year of data, the length of a task ('month' or 'year'), and the
+#number of days before the high-water mark that a rerun starts from
+fillSources = { \
+	'omni1':{'read':('gme.ind.omni','readOmniFtp'),'kw':{'res':1},'coll':'omni', \
+		'key':['time','res'],'match':{'res':1},'first':1995,'step':'month','overlap':31}, \
+	'omni5':{'read':('gme.ind.omni','readOmniFtp'),'kw':{'res':5},'coll':'omni', \
+		'key':['time','res'],'match':{'res':5},'first':1995,'step':'month','overlap':31}, \
+	'poes':{'read':('gme.sat.poes','readPoesFtp'),'kw':{},'coll':'poes', \
+		'key':['time','satnum'],'match':{},'first':1998,'step':'month','overlap':3}, \
+	'kp':{'read':('gme.ind.kp','readKpFtp'),'kw':{},'coll':'kp', \
+		'key':['time'],'match':{},'first':1980,'step':'year','overlap':62}, \
+	'dst':{'read':('gme.ind.dst','readDstWeb'),'kw':{},'coll':'dst', \
+		'key':['time'],'match':{},'first':1980,'step':'month','overlap':62}, \
+	'ae':{'read':('gme.ind.ae','readAeWeb'),'kw':{'res':60},'coll':'ae', \
+		'key':['time','res'],'match':{'res':60},'first':1980,'step':'month','overlap':62}, \
+	'symasy':{'read':('gme.ind.symasy','readSymAsyWeb'),'kw':{},'coll':'symasy', \
+		'key':['time'],'match':{},'first':1980,'step':'month','overlap':62}, \
+}
+
+def _writeConn(collName):
+	"""a write connection to a collection of the gme database"""
+	import os
+	import pydarn.sdio.dbUtils as db
+	return db.getDataConn(username=os.environ['DBWRITEUSER'],password=os.environ['DBWRITEPASS'], \
+		dbAddress=os.environ['SDDB'],dbName='gme',collName=collName)
+
+def getHighWater(name, state=None):
+	"""Returns the time of the newest record loaded from a source.  If fillGmeDb has not recorded it yet, it is read from the data.
+
+	**Args**:
+		* **name** (str): the source, one of the keys of fillSources
+		* [**state**]: a connection to the fillState collection.  if this is None, a write connection is made.  default = None
+	**Returns**:
+		* **hwm** (`datetime <http://tinyurl.com/bl352yx>`_ or None): the time of the newest record, or None if there are none
+	**Example**:
+		::
+
+			hwm = gme.base.getHighWater('dst')
+
+	"""
+	if(state == None): state = _writeConn('fillState')
+	doc = state.find_one({'_id':name})
+	if(doc != None): return doc['hwm']
+	spec = fillSources[name]
+	rec = state.database[spec['coll']].find_one(spec['match'],sort=[('time',-1)])
+	if(rec != None): return rec['time']
+	return None
+
+def fillTasks(name, sTime, eTime):
+	"""Splits a time range of a source into the time ranges of its tasks, a calendar month or year each.
+
+	**Args**:
+		* **name** (str): the source, one of the keys of fillSources
+		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the range
+		* **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the range
+	**Returns**:
+		* **tasks** (list): the (sTime, eTime) of each task, in order
+	**Example**:
+		::
+
+			tasks = gme.base.fillTasks('omni5',dt.datetime(2012,11,15),dt.datetime(2013,2,1))
+
+	"""
 	import datetime as dt
-	now = dt.datetime.now()
-	
-	if(time == 'recent'):
-		sYear = dt.datetime.now().year-5
-		#fill the omni database
-		p0 = Process(target=gme.mapOmniMongo, args=(sYear,now.year,1))
-		#fill the omni database
-		p1 = Process(target=gme.mapOmniMongo, args=(sYear,now.year))
-		#fill the poes database
-		p2 = Process(target=gme.mapPoesMongo, args=(sYear,now.year))
-		#fill the kp database
-		p3 = Process(target=gme.mapKpMongo, args=(sYear,now.year))
-		#fill the kp database
-		p4 = Process(target=gme.mapDstMongo, args=(sYear,now.year))
-		#fill the kp database
-		p5 = Process(target=gme.mapAeMongo, args=(sYear,now.year))
-		#fill the kp database
-		p6 = Process(target=gme.mapSymAsyMongo, args=(sYear,now.year))
-	else:
-		db = dbu.getDbConn(username=os.environ['DBWRITEUSER'],password=os.environ['DBWRITEPASS'],dbName='gme')
-		db.command('repairDatabase')
-		#fill the omni database
-		p0 = Process(target=gme.mapOmniMongo, args=(1995,now.year,1))
-		#fill the omni database
-		p1 = Process(target=gme.mapOmniMongo, args=(1995,now.year))
-		#fill the poes database
-		p2 = Process(target=gme.mapPoesMongo, args=(1998,now.year))
-		#fill the kp database
-		p3 = Process(target=gme.mapKpMongo, args=(1980,now.year))
-		#fill the kp database
-		p4 = Process(target=gme.mapDstMongo, args=(1980,now.year))
-		#fill the kp database
-		p5 = Process(target=gme.mapAeMongo, args=(1980,now.year))
-		#fill the kp database
-		p6 = Process(target=gme.mapSymAsyMongo, args=(1980,now.year))
-		
-	try: p0.start()
-	except Exception,e:
-		print e
-		print 'problem filling Omni db'
-		
-	try: p1.start()
-	except Exception,e:
-		print e
-		print 'problem filling Omni db'
-		
-	try: p2.start()
-	except Exception,e:
-		print e
-		print 'problem filling Poes db'
-		
-	try: p3.start()
-	except Exception,e:
-		print e
-		print 'problem filling Kp db'
-		
-	try: p4.start()
-	except Exception,e:
-		print e
-		print 'problem filling Dst db'
-		
-	try: p5.start()
-	except Exception,e:
-		print e
-		print 'problem filling AE db'
-		
-	try: p6.start()
-	except Exception,e:
-		print e
-		print 'problem filling AE db'
-		
-		
-	p0.join()
-	p1.join()
-	p2.join()
-	p3.join()
-	p4.join()
-	p5.join()
-	p6.join()
\ No newline at end of file
+	step = fillSources[name]['step']
+	tasks = []
+	if(step == 'year'): start = dt.datetime(sTime.year,1,1)
+	else: start = dt.datetime(sTime.year,sTime.month,1)
+	while(start <= eTime):
+		if(step == 'year'): end = dt.datetime(start.year+1,1,1)
+		elif(start.month == 12): end = dt.datetime(start.year+1,1,1)
+		else: end = dt.datetime(start.year,start.month+1,1)
+		tasks.append((max(start,sTime),min(end-dt.timedelta(seconds=1),eTime)))
+		start = end
+	return tasks
+
+def _fillTask(args):
+	"""the pool worker for fillGmeDb: load one time range of a source, retrying on errors.  returns (name, sTime, eTime, nDocs, newest record time, seconds, error)"""
+	import time, datetime as dt
+	import pydarn.sdio.dbUtils as db
+	name,sTime,eTime,retries,backoff = args
+	spec = fillSources[name]
+	t0 = time.time()
+	err = None
+	for attempt in range(retries+1):
+		try:
+			mod = __import__(spec['read'][0],fromlist=[spec['read'][1]])
+			recs = getattr(mod,spec['read'][1])(sTime,eTime,**spec['kw'])
+			if(recs == None or len(recs) == 0): return name,sTime,eTime,0,None,time.time()-t0,None
+			#this raises if any document failed, so the task is retried, and
+			#failing that the high-water mark stops before it
+			nDocs = db.bulkUpsert(_writeConn(spec['coll']),(rec.toDbDict() for rec in recs),spec['key'],replace=True)
+			last = max([rec.time for rec in recs])
+			return name,sTime,eTime,nDocs,last,time.time()-t0,None
+		except Exception,e:
+			err = str(e)
+			print e
+			print 'problem loading',name,sTime,'to',eTime,', attempt',attempt+1,'of',retries+1
+			if(attempt < retries): time.sleep(backoff*2**attempt)
+	return name,sTime,eTime,None,None,time.time()-t0,err
+
+def fillGmeDb(time='recent', sources=None, nProcs=4, retries=3, backoff=30., repair=False):
+	"""Loads the gme data sources into the mongodb, as tasks of a month or a year across a pool of processes.  The high-water mark of each source advances as the tasks before it finish, so an interrupted load resumes where it stopped.
+
+	.. warning::
+		In general, nobody except the database admins will need to use this function.  It is a write operation, so you must have DBWRITEUSER, DBWRITEPASS and SDDB defined
+
+	**Args**:
+		* [**time**] (str): 'recent' to load the data after each source's high-water mark (the last 5 years if a source has none), or 'all' to reload every source from its first year.  default = 'recent'
+		* [**sources**] (list or None): the sources to load, keys of fillSources.  if this is None, all of them are loaded.  default = None
+		* [**nProcs**] (int): the number of tasks run at once.  default = 4
+		* [**retries**] (int): the number of times a failed task is retried.  default = 3
+		* [**backoff**] (float): the seconds to wait before the first retry, doubling for each one after.  default = 30
+		* [**repair**] (bool): run repairDatabase on the gme database after loading.  default = False
+	**Returns**:
+		* **summary** (dict): for each source, a dict of the number of tasks, failed tasks, records written, task seconds and the new high-water mark
+	**Example**:
+		::
+
+			gme.base.fillGmeDb(sources=['dst','kp'],nProcs=2)
+
+	"""
+	import datetime as dt, multiprocessing as mp
+	import time as tm
+
+	assert(time == 'recent' or time == 'all'), "error, time must be 'recent' or 'all'"
+	if(sources == None): sources = sorted(fillSources.keys())
+	for name in sources: assert(fillSources.has_key(name)), 'error, unknown source '+name
+	now = dt.datetime.utcnow()
+	state = _writeConn('fillState')
+
+	#plan the tasks of each source, from its high-water mark
+	plan,tasks = {},[]
+	for name in sources:
+		spec = fillSources[name]
+		hwm = None
+		if(time == 'recent'): hwm = getHighWater(name,state)
+		if(hwm != None): sTime = hwm-dt.timedelta(days=spec['overlap'])
+		elif(time == 'recent'): sTime = dt.datetime(now.year-5,1,1)
+		else: sTime = dt.datetime(spec['first'],1,1)
+		ranges = fillTasks(name,sTime,now)
+		plan[name] = {'ranges':ranges,'done':{},'next':0,'hwm':hwm,'tasks':len(ranges), \
+			'failed':0,'docs':0,'secs':0.}
+		tasks.extend([(name,s,e,retries,backoff) for s,e in ranges])
+		print name,': loading',len(ranges),'tasks from',sTime,', high-water mark',hwm
+		#the upserts need the key index
+		_writeConn(spec['coll']).ensure_index([(x,1) for x in spec['key']])
+	#run the oldest data first, so the high-water marks advance steadily
+	tasks.sort(key=lambda x: x[1])
+
+	t0 = tm.time()
+	pool = mp.Pool(processes=nProcs)
+	try:
+		for name,sTime,eTime,nDocs,last,secs,err in pool.imap_unordered(_fillTask,tasks):
+			p = plan[name]
+			p['secs'] += secs
+			p['done'][sTime] = (nDocs,last)
+			if(nDocs == None):
+				p['failed'] += 1
+				print '%s %s: failed after %d attempts: %s' % (name,sTime.date(),retries+1,err)
+				continue
+			p['docs'] += nDocs
+			print '%s %s: wrote %d records in %.1f s (%.0f records/s)' % (name,sTime.date(),nDocs,secs,nDocs/max(secs,1e-6))
+			#advance the high-water mark over the tasks that are done in order,
+			#stopping at the first one that is still running or failed
+			hwm = p['hwm']
+			while(p['next'] < len(p['ranges'])):
+				res = p['done'].get(p['ranges'][p['next']][0])
+				if(res == None or res[0] == None): break
+				if(res[1] != None and (hwm == None or res[1] > hwm)): hwm = res[1]
+				p['next'] += 1
+			if(hwm != p['hwm']):
+				state.update({'_id':name},{'$set':{'hwm':hwm,'updated':dt.datetime.utcnow()}},upsert=True)
+				p['hwm'] = hwm
+		pool.close()
+	except:
+		pool.terminate()
+		raise
+	finally:
+		pool.join()
+
+	if(repair): state.database.command('repairDatabase')
+
+	#print the throughput summary
+	wall = max(tm.time()-t0,1e-6)
+	total = 0
+	print '\n%-8s %6s %6s %10s %9s %9s  %s' % ('source','tasks','failed','records','task s','rec/s','high-water mark')
+	for name in sources:
+		p = plan[name]
+		total += p['docs']
+		print '%-8s %6d %6d %10d %9.1f %9.0f  %s' % (name,p['tasks'],p['failed'],p['docs'],p['secs'], \
+			p['docs']/max(p['secs'],1e-6),p['hwm'])
+	print 'wrote %d records in %.1f s (%.0f records/s) with %d processes' % (total,wall,total/wall,nProcs)
+
+	return dict((name,{'tasks':plan[name]['tasks'],'failed':plan[name]['failed'],'docs':plan[name]['docs'], \
+		'secs':plan[name]['secs'],'hwm':plan[name]['hwm']}) for name in sources)
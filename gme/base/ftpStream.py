@@ -0,0 +1,152 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: ftpStream
+   :synopsis: Reads a time range of lines from an ASCII file on an FTP server
+
+*****************************
+**Module**: ftpStream
+*****************************
+The data files on the FTP servers hold a line per record in time order,
+and a query usually wants only a small part of one.  Rather than
+downloading the whole file into memory and then checking the times,
+:func:`retrRange` reads the file as it arrives, drops the lines before
+the start time a chunk at a time, and closes the transfer as soon as it
+passes the end time.  If the time span of the file is known, the
+transfer starts near the start time with a REST offset, so the lines
+before it are not sent at all.
+
+Only standard FTP commands are used (TYPE, SIZE, REST, RETR), so any
+server works, including a local one for testing.
+
+**Functions**:
+	* :func:`retrRange`
+"""
+
+#the lines are checked against the time range this many at a time
+chunkSize = 200
+
+def _estimateOffset(ftp, fname, sTime, fileStart, fileEnd):
+	"""the byte offset to start a transfer from to begin a little before sTime, assuming the records are spread evenly over the file"""
+	import ftplib
+	if(fileStart == None or fileEnd == None or sTime <= fileStart): return 0
+	try: size = ftp.size(fname)
+	except ftplib.all_errors: return 0
+	if(size == None): return 0
+	span = (fileEnd-fileStart).total_seconds()
+	frac = min((sTime-fileStart).total_seconds()/span,1.)
+	#back off a little, in case the records are not quite evenly spread
+	return max(0,int(size*frac)-max(4096,size//1000))
+
+def _open(ftp, fname, offset):
+	"""start a transfer of fname from offset, returning the data connection and a file to read it from"""
+	if(offset > 0): conn = ftp.transfercmd('RETR '+fname,rest=offset)
+	else: conn = ftp.transfercmd('RETR '+fname)
+	return conn,conn.makefile('rb')
+
+def _close(ftp, conn, fp, complete):
+	"""close a transfer, reading the reply of the server.  a transfer that is closed early is normally answered with an error, which is ignored"""
+	import ftplib
+	fp.close()
+	conn.close()
+	if(complete): ftp.voidresp()
+	else:
+		try: ftp.voidresp()
+		except ftplib.all_errors: pass
+
+def _readHeader(ftp, fname, nLines):
+	"""read just the first nLines of a file"""
+	conn,fp = _open(ftp,fname,0)
+	head = [fp.readline().rstrip('\r\n') for i in range(nLines)]
+	_close(ftp,conn,fp,False)
+	return head
+
+def _keepChunk(chunk, keep, lineTime, sTime, eTime):
+	"""add the lines of chunk that are in [sTime, eTime] to keep, returning True if the chunk goes past eTime"""
+	last = lineTime(chunk[-1])
+	if(last < sTime): return False
+	#the whole chunk is in range, so the lines need no checking
+	if(lineTime(chunk[0]) >= sTime and last <= eTime):
+		keep.extend(chunk)
+		return False
+	for l in chunk:
+		t = lineTime(l)
+		if(t > eTime): return True
+		if(t >= sTime): keep.append(l)
+	return False
+
+def _scan(ftp, fname, offset, header, lineTime, sTime, eTime):
+	"""read the lines in range from offset.  returns None if the first whole line after offset is already past sTime"""
+	conn,fp = _open(ftp,fname,offset)
+	complete,first = False,True
+	head,keep,chunk = [],[],[]
+	try:
+		#a transfer from an offset starts part way through a line
+		if(offset > 0): fp.readline()
+		else: head = [fp.readline().rstrip('\r\n') for i in range(header)]
+		for line in fp:
+			line = line.rstrip('\r\n')
+			if(line.strip() == ''): continue
+			if(first and offset > 0 and lineTime(line) > sTime): return None
+			first = False
+			chunk.append(line)
+			if(len(chunk) < chunkSize): continue
+			if(_keepChunk(chunk,keep,lineTime,sTime,eTime)): return head,keep
+			chunk = []
+		if(len(chunk) > 0 and _keepChunk(chunk,keep,lineTime,sTime,eTime)): return head,keep
+		complete = True
+		return head,keep
+	finally:
+		_close(ftp,conn,fp,complete)
+
+def retrRange(ftp, fname, lineTime, sTime, eTime, fileStart=None, fileEnd=None, header=0):
+	"""Reads the lines of an ASCII file on an FTP server that are in a time range.  The lines are checked as they arrive, so only the lines in range are held in memory, and the transfer is stopped once a line is past eTime.  The lines must be in time order.
+
+	**Args**:
+		* **ftp** (`ftplib.FTP <http://docs.python.org/2/library/ftplib.html>`_): a logged in connection, in the directory of the file
+		* **fname** (str): the file to read
+		* **lineTime** (function): called with a line to get its time
+		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time to keep
+		* **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): the latest time to keep
+		* [**fileStart**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the start of the time span of the file.  if this and fileEnd are given, the transfer starts from an offset near sTime.  default = None
+		* [**fileEnd**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the end of the time span of the file.  default = None
+		* [**header**] (int): the number of header lines at the start of the file.  default = 0
+	**Returns**:
+		* **head** (list): the header lines
+		* **lines** (list): the lines from sTime to eTime
+	**Example**:
+		::
+
+			head,lines = retrRange(ftp,'omni_min2011.asc',lineTime,dt.datetime(2011,3,1),dt.datetime(2011,3,2), \\
+				fileStart=dt.datetime(2011,1,1),fileEnd=dt.datetime(2012,1,1))
+
+	"""
+	import ftplib
+	#REST and SIZE count bytes, which needs binary mode
+	ftp.voidcmd('TYPE I')
+	offset = _estimateOffset(ftp,fname,sTime,fileStart,fileEnd)
+	out = None
+	if(offset > 0):
+		try: out = _scan(ftp,fname,offset,0,lineTime,sTime,eTime)
+		except (ftplib.error_perm,ftplib.error_temp),e:
+			#the server does not support REST
+			print e
+			out = None
+		if(out != None and header > 0): out = (_readHeader(ftp,fname,header),out[1])
+	#the offset overshot sTime, or there was none, so read from the start
+	if(out == None): out = _scan(ftp,fname,0,header,lineTime,sTime,eTime)
+	return out
@@ -26,6 +26,10 @@
 *****************************
 **Classes**:
 	* :class:`gmeData`
+	* :class:`gmeArrays`
+**Functions**:
+	* :func:`recsToArrays`
+	* :func:`concatArrays`
 """
 
 class gmeData:
@@ -130,4 +134,185 @@ class gmeData:
 	def __init__():
 		self.time = None
 		self.dataSet = None
-		self.info = None
\ No newline at end of file
+		self.info = None
+
+class gmeArrays:
+	"""a class to represent a time series of gme data as a struct of arrays: one numpy array per parameter, with a row per record, instead of a list of :class:`gmeData` objects.  This takes a fraction of the memory of the list, and a parameter can be used directly as an array.  The readers return this when called with asArrays=True.
+		
+	**Members**: 
+		* **time** (numpy.ndarray): the times of the records, as datetime64[ms], in order
+		* **names** (list): the names of the parameters
+		* **dataSet** (str): a string indicating the dataset
+		* **info** (str): information about where the data come from.  *Please be courteous and give credit to data providers when credit is due.*
+		* a numpy array for each parameter in names, eg **bz**.  missing values are NaN.  list parameters, eg kp, are 2d arrays with a row per record.
+   
+	**Methods**:
+		* :func:`sliceTime`
+		* :func:`toRecs`
+	**Example**:
+		::
+		
+			omni = gme.ind.readOmni(dt.datetime(2011,1,1),asArrays=True)
+			bz = omni.bzm
+			bz = omni['bzm']
+			hour = omni[dt.datetime(2011,1,1,3):dt.datetime(2011,1,1,4)]
+		
+	"""
+	def __init__(self, cols, dataSet=None, info=None):
+		"""the intialization fucntion for a :class:`gmeArrays` object.
+		
+		**Belongs to**: :class:`gmeArrays`
+		
+		**Args**: 
+			* **cols** (dict): a numpy array per parameter, plus 'time', all with the same number of rows and in time order
+			* [**dataSet**] (str): a string indicating the dataset.  default = None
+			* [**info**] (str): information about where the data come from.  default = None
+		**Returns**:
+			* Nothing.
+		**Example**:
+			::
+			
+				arrs = gme.base.gmeArrays({'time':times,'dst':dst},dataSet='Dst')
+			
+		"""
+		import numpy as np
+		self.time = np.asarray(cols['time']).astype('datetime64[ms]')
+		self.names = sorted([x for x in cols.iterkeys() if x != 'time'])
+		self.dataSet = dataSet
+		self.info = info
+		for x in self.names: setattr(self,x,np.asarray(cols[x]))
+	
+	def __len__(self):
+		return len(self.time)
+	
+	def __getitem__(self, key):
+		"""arrs['bz'] is a parameter, arrs[sTime:eTime] is a time slice, see :func:`sliceTime`, and any other index, eg arrs[10:20] or arrs[arrs.bz < 0], selects those records"""
+		import datetime as dt
+		if(isinstance(key,str)): return getattr(self,key)
+		if(isinstance(key,slice) and (isinstance(key.start,dt.datetime) or isinstance(key.stop,dt.datetime))):
+			return self.sliceTime(key.start,key.stop)
+		return self._select(key)
+	
+	def _select(self, idx):
+		"""a new gmeArrays with the rows idx"""
+		cols = dict((x,getattr(self,x)[idx]) for x in self.names)
+		cols['time'] = self.time[idx]
+		return gmeArrays(cols,dataSet=self.dataSet,info=self.info)
+	
+	def sliceTime(self, sTime=None, eTime=None):
+		"""This method selects the records in a time range, by binary search of the times.  The arrays of the result are views of these, not copies.
+		
+		**Belongs to**: :class:`gmeArrays`
+		
+		**Args**: 
+			* [**sTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the earliest time to keep.  if this is None, start from the first record.  default = None
+			* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time to keep.  if this is None, go to the last record.  default = None
+		**Returns**:
+			* **arrs** (:class:`gmeArrays`): the records from sTime to eTime, inclusive
+		**Example**:
+			::
+			
+				hour = arrs.sliceTime(dt.datetime(2011,1,1,3),dt.datetime(2011,1,1,4))
+			
+		"""
+		import numpy as np
+		i0,i1 = 0,len(self.time)
+		if(sTime != None): i0 = np.searchsorted(self.time,np.datetime64(sTime,'ms'),'left')
+		if(eTime != None): i1 = np.searchsorted(self.time,np.datetime64(eTime,'ms'),'right')
+		return self._select(slice(i0,max(i0,i1)))
+	
+	def toRecs(self, make):
+		"""This method converts the arrays to a list of record objects, like the readers return by default.
+		
+		**Belongs to**: :class:`gmeArrays`
+		
+		**Args**: 
+			* **make** (function): called with no arguments to make each empty record, eg gme.ind.dstRec
+		**Returns**:
+			* **recs** (list): the records
+		**Example**:
+			::
+			
+				dstList = arrs.toRecs(gme.ind.dstRec)
+			
+		"""
+		from gme.base.colParse import columnsToRecs
+		cols = dict((x,getattr(self,x)) for x in self.names)
+		cols['time'] = self.time
+		return columnsToRecs(cols,make,self.names)
+	
+	def __repr__(self):
+		myStr = str(self.dataSet)+' arrays of '+str(len(self.time))+' records'
+		if(len(self.time) > 0): myStr += ' FROM: '+str(self.time[0])+' TO: '+str(self.time[-1])
+		myStr += '\n'
+		for x in self.names:
+			myStr += x+' = '+str(getattr(self,x).dtype)+' '+str(getattr(self,x).shape)+'\n'
+		return myStr
+
+def _toArray(vals):
+	"""convert a list of record values to a numpy array, with None as NaN.  lists become 2d arrays."""
+	import numpy as np
+	full = [v for v in vals if v != None]
+	if(len(full) > 0 and isinstance(full[0],list)):
+		width = max([len(v) for v in full])
+		vals = [(list(v if v != None else [])+[None]*width)[:width] for v in vals]
+		return _toArray([x for v in vals for x in v]).reshape(len(vals),width)
+	if(len(full) > 0 and isinstance(full[0],basestring)):
+		return np.array([v if v != None else '' for v in vals],dtype=str)
+	if(len(full) == len(vals) and all([isinstance(v,(int,long)) for v in full])):
+		return np.array(vals,dtype=np.int64)
+	return np.array([v if v != None else np.nan for v in vals],dtype=np.float64)
+
+def recsToArrays(recs, names=None, dataSet=None, info=None):
+	"""Gathers a list of records into a :class:`gmeArrays`.  The records can be :class:`gmeData` objects or dicts from the mongodb, and are only iterated once, so a generator or a cursor can be given without holding all of the records at once.
+	
+	**Args**: 
+		* **recs** (iterable): the records, in time order
+		* [**names**] (list or None): the parameters to keep.  if this is None, all of the members of the first record except time, res, dataSet and info are kept.  default = None
+		* [**dataSet**] (str or None): the dataset.  if this is None, it is taken from the first record.  default = None
+		* [**info**] (str or None): the information about the data.  if this is None, it is taken from the first record.  default = None
+	**Returns**:
+		* **arrs** (:class:`gmeArrays`): the arrays
+	**Example**:
+		::
+		
+			arrs = gme.base.recsToArrays(dstList)
+		
+	"""
+	import numpy as np
+	times,vals = [],None
+	for rec in recs:
+		if(not isinstance(rec,dict)): rec = rec.__dict__
+		if(vals == None):
+			if(names == None):
+				names = [x for x in rec.iterkeys() if x not in ['_id','time','res','dataSet','info']]
+			if(dataSet == None): dataSet = rec.get('dataSet')
+			if(info == None): info = rec.get('info')
+			vals = dict((x,[]) for x in names)
+		times.append(rec['time'])
+		for x in names: vals[x].append(rec.get(x))
+	if(vals == None): vals = dict((x,[]) for x in (names or []))
+	cols = dict((x,_toArray(v)) for x,v in vals.iteritems())
+	cols['time'] = np.array(times,dtype='datetime64[ms]')
+	return gmeArrays(cols,dataSet=dataSet,info=info)
+
+def concatArrays(arrsList):
+	"""Joins :class:`gmeArrays` of the same data, eg from consecutive years, end to end.  None entries are skipped.
+	
+	**Args**: 
+		* **arrsList** (list): the arrays, in time order
+	**Returns**:
+		* **arrs** (:class:`gmeArrays` or None): the joined arrays, or None if there are none
+	**Example**:
+		::
+		
+			arrs = gme.base.concatArrays([arrs2010,arrs2011])
+		
+	"""
+	import numpy as np
+	arrsList = [a for a in arrsList if a != None]
+	if(len(arrsList) == 0): return None
+	names = arrsList[0].names
+	cols = dict((x,np.concatenate([getattr(a,x) for a in arrsList])) for x in names)
+	cols['time'] = np.concatenate([a.time for a in arrsList])
+	return gmeArrays(cols,dataSet=arrsList[0].dataSet,info=arrsList[0].info)
@@ -0,0 +1,171 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: parseCheck
+   :synopsis: Checks the vectorized parsers against the per-line parsers
+
+*****************************
+**Module**: parseCheck
+*****************************
+The readers parse whole files at once with :mod:`gme.base.colParse`.
+The per-line parsers they replaced, eg :func:`gme.ind.omni.omniRec.parseFtp`,
+are kept, and are what the vectorized ones must agree with.
+:func:`checkParsers` runs both on the same made-up lines, using the fill
+values and number formats of the real files, and fails if any record
+differs.  Run it after changing either::
+
+	python -c "import gme; gme.base.parseCheck.checkParsers()"
+
+**Functions**:
+	* :func:`checkParsers`
+"""
+
+#values that must be kept: they have the values of fills, or look like
+#them, but are not written only with 9s
+_realVals = ['9.0','99.00','999.0','9.90','099.9','0.99','19.99','+9.9','9.9E+01', \
+	'-9.9','-99.99','-999.9','-9999.99','9','99','0','-0.5']
+#fill values written as all 9s
+_ninesFill = ['9.99','99.99','999.99','9999.99','99999.9','999999.','9999999.','99999','999']
+
+def _pick(rs, vals, frac):
+	"""a random choice from vals with probability frac, or else a random number"""
+	if(rs.rand() < frac): return vals[rs.randint(len(vals))]
+	return '%.2f' % (rs.randn()*10**rs.randint(0,4))
+
+def _omniLines(rs, n):
+	"""lines like those of the omni high res ascii files"""
+	import datetime as dt
+	lines = []
+	for i in range(n):
+		t = dt.datetime(2011,1,1)+dt.timedelta(minutes=i)
+		vals = [_pick(rs,_realVals+_ninesFill,.5).rjust(rs.randint(5,10)) for j in range(42)]
+		lines.append('%4d %3d %2d %2d ' % (t.year,t.timetuple().tm_yday,t.hour,t.minute)+' '.join(vals))
+	return lines
+
+def _poesLines(rs, n):
+	"""lines like those of the NOAA NGDC poes files, with a header line"""
+	from gme.sat.poes import poesRec
+	import datetime as dt
+	names = [x for x in poesRec().__dict__.iterkeys() if x not in ['dataSet','info','satnum','time']]
+	lines = ['year month day hour minute second '+' '.join(names)]
+	fills = ['-999','-999.','-999.0','-999.000','-9.99e2']
+	for i in range(n):
+		t = dt.datetime(2011,1,1)+dt.timedelta(seconds=16*i)
+		vals = [_pick(rs,_realVals+fills,.5) for x in names]
+		lines.append('%4d %2d %2d %2d %2d %6.3f ' % (t.year,t.month,t.day,t.hour,t.minute,t.second+rs.randint(1000)/1e3)+ \
+			' '.join(vals))
+	return lines
+
+def _kpLines(rs, n):
+	"""lines like those of the GFZ-Potsdam kp files, with some blank fields"""
+	import datetime as dt
+	lines = []
+	for i in range(n):
+		t = dt.datetime(2011,1,1)+dt.timedelta(days=i%365)
+		kp = ''.join([rs.choice([' ','0','1','4','8'])+rs.choice(['0','3','7','7','5']) for j in range(8)])
+		ap = ''.join(['%3d' % rs.randint(0,400) for j in range(8)])
+		blank = lambda s: '   ' if rs.rand() < .2 else s
+		lines.append('%02d%02d%02d 1234 ' % (t.year%100,t.month,t.day)+kp+blank('%3d' % rs.randint(0,90))+ap+ \
+			blank('%3d' % rs.randint(0,400))+' 1.0'+blank('%3d' % rs.randint(0,300)))
+	return lines
+
+def _iagaLines(rs, n, nVals):
+	"""lines like those of the IAGA2002 files from the WDC Kyoto, with a header"""
+	import datetime as dt
+	lines = [' Format                 IAGA-2002                                    |', \
+		'DATE       TIME         DOY     X      |']
+	for i in range(n):
+		t = dt.datetime(2011,1,1)+dt.timedelta(minutes=i)
+		vals = [_pick(rs,['99999','99999.0','9999','-999.9','999.9'],.5).rjust(9) for j in range(nVals)]
+		lines.append(t.strftime('%Y-%m-%d %H:%M:%S.000 ')+'%03d' % t.timetuple().tm_yday+''.join(vals))
+	return lines
+
+def _quiet(parse, lines):
+	"""parse each line with the per-line parser, hiding what it prints about blank fields"""
+	import sys, StringIO
+	out,sys.stdout = sys.stdout,StringIO.StringIO()
+	try: return [parse(l) for l in lines]
+	finally: sys.stdout = out
+
+def _compare(what, lines, old, new, names):
+	"""count the records of old and new that differ in time or any of names, printing the first few"""
+	import math
+	bad = 0
+	if(len(old) != len(new)):
+		print what+':',len(old),'records from the lines and',len(new),'from the columns'
+		return max(len(old),len(new))
+	for i in range(len(old)):
+		for x in ['time']+names:
+			a,b = getattr(old[i],x),getattr(new[i],x)
+			if(a == b or (isinstance(a,float) and isinstance(b,float) and math.isnan(a) and math.isnan(b))): continue
+			bad += 1
+			if(bad <= 5): print what+':',x,'is',a,'from the line and',b,'from the columns in',repr(lines[i])
+			break
+	return bad
+
+def checkParsers(n=3000, seed=0):
+	"""Parses the same made-up lines with the vectorized parsers and the per-line parsers of omni, poes, kp, dst, ae and sym/asy data, and checks that they give the same records.  The lines include fills written with 9s, values that only look like them (eg 99.00 or -999.9), negative fills, blank fixed width fields and header lines.
+
+	**Args**:
+		* [**n**] (int): the number of lines made for each source.  default = 3000
+		* [**seed**] (int): the seed of the random values.  default = 0
+	**Returns**:
+		* **bad** (dict): the number of records that differ, for each source.  an AssertionError is raised if there are any
+	**Example**:
+		::
+
+			gme.base.parseCheck.checkParsers()
+
+	"""
+	import numpy as np
+	from gme.base.colParse import columnsToRecs
+	from gme.ind.omni import omniRec, omniCols, parseOmniLines
+	from gme.ind.kp import kpDay, parseKpLines
+	from gme.ind.dst import dstRec
+	from gme.ind.ae import aeRec
+	from gme.ind.symasy import symAsyRec
+	from gme.sat.poes import poesRec, parsePoesLines
+	from gme.base.colParse import iagaColumns
+
+	rs = np.random.RandomState(seed)
+	bad = {}
+
+	lines = _omniLines(rs,n)
+	names = [x[0] for x in omniCols]
+	bad['omni'] = _compare('omni',lines,_quiet(lambda l: omniRec(ftpLine=l),lines), \
+		columnsToRecs(parseOmniLines(lines),omniRec,names),names)
+
+	lines = _poesLines(rs,n)
+	cols = parsePoesLines(lines)
+	names = [x for x in cols.iterkeys() if x != 'time']
+	bad['poes'] = _compare('poes',lines[1:],_quiet(lambda l: poesRec(ftpLine=l,header=lines[0]),lines[1:]), \
+		columnsToRecs(cols,poesRec,names),names)
+
+	lines = _kpLines(rs,n)
+	names = ['kp','ap','kpSum','apMean','sunspot']
+	bad['kp'] = _compare('kp',lines,_quiet(lambda l: kpDay(ftpLine=l,year=2011),lines), \
+		columnsToRecs(parseKpLines(lines,2011),kpDay,names,ints=['kpSum','apMean','sunspot']),names)
+
+	for name,make,names in [('dst',dstRec,['dst']),('ae',aeRec,['ae','au','al','ao']), \
+			('symasy',symAsyRec,['asyd','asyh','symd','symh'])]:
+		lines = _iagaLines(rs,n,len(names))
+		bad[name] = _compare(name,lines[2:],_quiet(lambda l: make(webLine=l),lines[2:]), \
+			columnsToRecs(iagaColumns(lines,names),make,names),names)
+
+	for name in sorted(bad.keys()): print '%-7s %d of %d records differ' % (name,bad[name],n)
+	assert(sum(bad.values()) == 0), 'error, the vectorized parsers disagree with the per-line parsers'
+	return bad
@@ -24,6 +24,7 @@ This includes the following modules:
 
 	* **kp**
 	* **omni**
+	* **indArchive**
 """
 
 try: import kp
@@ -50,4 +51,9 @@ except Exception, e: print e
 try: import symasy
 except Exception, e: print e
 try: from symasy import *
-except Exception, e: print e
\ No newline at end of file
+except Exception, e: print e
+
+try: import indArchive
+except Exception, e: print e
+try: from indArchive import *
+except Exception, e: print e
@@ -119,7 +119,7 @@ class aeRec(gme.base.gmeBase.gmeData):
 		if(webLine != None): self.parseWeb(webLine)
 		if(dbDict != None): self.parseDb(dbDict)
 		
-def readAe(sTime=None,eTime=None,res=60,ae=None,al=None,au=None,ao=None):
+def readAe(sTime=None,eTime=None,res=60,ae=None,al=None,au=None,ao=None,asArrays=False):
 	"""This function reads ae data from the mongodb.  **The data are 1-minute values**
 	
 	**Args**: 
@@ -130,8 +130,9 @@ def readAe(sTime=None,eTime=None,res=60,ae=None,al=None,au=None,ao=None):
 		* [**al**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with al values in the range [a,b] will be returned.  default = None
 		* [**au**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with au values in the range [a,b] will be returned.  default = None
 		* [**ao**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with ao values in the range [a,b] will be returned.  default = None
+		* [**asArrays**] (bool): if this is True, the data are returned as a :class:`gme.base.gmeBase.gmeArrays`, with an array per parameter, instead of a list of objects.  default = False
 	**Returns**:
-		* **aeList** (list or None): if data is found, a list of :class:`gme.ind.ae.aeRec` objects matching the input parameters is returned.  If no data is found, None is returned.
+		* **aeList** (list or None): if data is found, a list of :class:`gme.ind.ae.aeRec` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If no data is found, None is returned.
 	**Example**:
 		::
 		
@@ -142,6 +143,7 @@ def readAe(sTime=None,eTime=None,res=60,ae=None,al=None,au=None,ao=None):
 	"""
 	import datetime as dt
 	import pydarn.sdio.dbUtils as db
+	from gme.base.gmeBase import recsToArrays
 	
 	#check all the inputs for validity
 	assert(sTime == None or isinstance(sTime,dt.datetime)), \
@@ -176,6 +178,11 @@ def readAe(sTime=None,eTime=None,res=60,ae=None,al=None,au=None,ao=None):
 	if(qryList != []): qry = aeData.find(qryDict)
 	else: qry = aeData.find()
 	if(qry.count() > 0):
+		#gather the documents straight into arrays, without making objects
+		if(asArrays):
+			arrs = recsToArrays(qry.sort('time'))
+			print '\nreturning arrays of',len(arrs),'records of ae data'
+			return arrs
 		aeList = []
 		for rec in qry.sort('time'):
 			aeList.append(aeRec(dbDict=rec))
@@ -184,9 +191,25 @@ def readAe(sTime=None,eTime=None,res=60,ae=None,al=None,au=None,ao=None):
 	#if we didn't find anything on the mongodb
 	else:
 		print '\ncould not find requested data in the mongodb'
-		return None
+		if(sTime == None): return None
+		
+		#read from the local archive, which fetches what it is missing
+		#from the web
+		try:
+			from gme.ind.indArchive import readArchive
+			ranges = dict((x,var[x]) for x in ['ae','al','au','ao'] if var[x] != None)
+			aeList = readArchive('ae',sTime,eTime,res=res,ranges=ranges,asArrays=asArrays)
+		except Exception,e:
+			print e
+			print 'problem reading the local archive'
+			return None
+		if(aeList != None and len(aeList) == 0):
+			print '\nno ae data matched your conditions, returning None...'
+			return None
+		if(aeList != None): print '\nreturning a list with',len(aeList),'records of ae data'
+		return aeList
 			
-def readAeWeb(sTime,eTime=None,res=60):
+def readAeWeb(sTime,eTime=None,res=60,asArrays=False):
 	"""This function reads ae data from the WDC kyoto website
 	
 	.. warning::
@@ -196,6 +219,7 @@ def readAeWeb(sTime,eTime=None,res=60):
 		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
 		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be equal to sTime.  eTime must not be more than 366 days after sTime.  default = None
 		* [**res**] (int): the time resolution desired, either 1 or 60 minutes.  default=60
+		* [**asArrays**] (bool): if this is True, return a :class:`gme.base.gmeBase.gmeArrays` instead of a list of objects.  default = False
 	**Example**:
 		::
 		
@@ -206,6 +230,7 @@ def readAeWeb(sTime,eTime=None,res=60):
 	"""
 	import datetime as dt
 	import mechanize
+	from gme.base.colParse import iagaColumns, columnsToRecs, columnsToArrays
 	
 	assert(isinstance(sTime,dt.datetime)),'error, sTime must be a datetime object'
 	if(eTime == None): eTime = sTime
@@ -283,15 +308,15 @@ def readAeWeb(sTime,eTime=None,res=60):
 	#get the data
 	lines = response.readlines()
 
-	aeList = []
-	for l in lines:
-		#check for headers
-		if(l[0] == ' ' or l[0:4] == 'DATE'): continue
-		cols=l.split()
-		try: aeList.append(aeRec(webLine=l,res=res))
-		except Exception,e:
-			print e
-			print 'problem assigning initializing ae object'
+	#parse all of the lines at once, and make the objects from the columns
+	try: cols = iagaColumns(lines,['ae','au','al','ao'])
+	except Exception,e:
+		print e
+		print 'problem parsing the ae data'
+		return None
+	if(len(cols['time']) == 0): return None
+	if(asArrays): return columnsToArrays(cols,lambda: aeRec(res=res),['ae','au','al','ao'])
+	aeList = columnsToRecs(cols,lambda: aeRec(res=res),['ae','au','al','ao'])
 		
 	if(aeList != []): return aeList
 	else: return None
@@ -330,6 +355,7 @@ def mapAeMongo(sYear,eYear=None,res=60):
 	
 	#set up all of the indices
 	mongoData.ensure_index('time')
+	mongoData.ensure_index([('time',1),('res',1)])
 	mongoData.ensure_index('ae')
 	mongoData.ensure_index('al')
 	mongoData.ensure_index('au')
@@ -340,24 +366,10 @@ def mapAeMongo(sYear,eYear=None,res=60):
 		#1 day at a time, to not fill up RAM
 		templist = readAeWeb(dt.datetime(yr,1,1),dt.datetime(yr,1,1)+dt.timedelta(days=366),res=res)
 		if(templist == None): continue
-		for rec in templist:
-			#check if a duplicate record exists
-			qry = mongoData.find({'$and':[{'time': rec.time}, {'res': rec.res}]})
-			print rec.time
-			tempRec = rec.toDbDict()
-			cnt = qry.count()
-			#if this is a new record, insert it
-			if(cnt == 0): mongoData.insert(tempRec)
-			#if this is an existing record, update it
-			elif(cnt == 1):
-				print 'foundone!!'
-				dbDict = qry.next()
-				temp = dbDict['_id']
-				dbDict = tempRec
-				dbDict['_id'] = temp
-				mongoData.save(dbDict)
-			else:
-				print 'strange, there is more than 1 AE record for',rec.time
+		#upsert the records on their natural key in bulk
+		t0 = dt.datetime.now()
+		nDocs = db.bulkUpsert(mongoData,(rec.toDbDict() for rec in templist),['time','res'],replace=True)
+		db.printRate('ae '+str(yr),nDocs,t0)
 		del templist
 	
 
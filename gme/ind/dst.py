@@ -108,15 +108,16 @@ class dstRec(gme.base.gmeBase.gmeData):
 		if(webLine != None): self.parseWeb(webLine)
 		if(dbDict != None): self.parseDb(dbDict)
 		
-def readDst(sTime=None,eTime=None,dst=None):
+def readDst(sTime=None,eTime=None,dst=None,asArrays=False):
 	"""This function reads dst data from the mongodb.
 	
 	**Args**: 
 		* [**sTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the earliest time you want data for, default=None
 		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, end Time will be 1 day after sTime.  default = None
 		* [**dst**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with dst values in the range [a,b] will be returned.  default = None
+		* [**asArrays**] (bool): if this is True, the data are returned as a :class:`gme.base.gmeBase.gmeArrays`, with an array per parameter, instead of a list of objects.  default = False
 	**Returns**:
-		* **dstList** (list or None): if data is found, a list of :class:`gme.ind.dst.dstRec` objects matching the input parameters is returned.  If no data is found, None is returned.
+		* **dstList** (list or None): if data is found, a list of :class:`gme.ind.dst.dstRec` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If no data is found, None is returned.
 	**Example**:
 		::
 		
@@ -127,6 +128,7 @@ def readDst(sTime=None,eTime=None,dst=None):
 	"""
 	import datetime as dt
 	import pydarn.sdio.dbUtils as db
+	from gme.base.gmeBase import recsToArrays
 	
 	#check all the inputs for validity
 	assert(sTime == None or isinstance(sTime,dt.datetime)), \
@@ -155,6 +157,11 @@ def readDst(sTime=None,eTime=None,dst=None):
 	if(qryList != []): qry = dstData.find(qryDict)
 	else: qry = dstData.find()
 	if(qry.count() > 0):
+		#gather the documents straight into arrays, without making objects
+		if(asArrays):
+			arrs = recsToArrays(qry.sort('time'))
+			print '\nreturning arrays of',len(arrs),'records of dst data'
+			return arrs
 		dstList = []
 		for rec in qry.sort('time'):
 			dstList.append(dstRec(dbDict=rec))
@@ -163,9 +170,26 @@ def readDst(sTime=None,eTime=None,dst=None):
 	#if we didn't find anything on the mongodb
 	else:
 		print '\ncould not find requested data in the mongodb'
-		return None
+		if(sTime == None): return None
+		
+		#read from the local archive, which fetches what it is missing
+		#from the web
+		try:
+			from gme.ind.indArchive import readArchive
+			ranges = {}
+			if(dst != None): ranges['dst'] = dst
+			dstList = readArchive('dst',sTime,eTime,ranges=ranges,asArrays=asArrays)
+		except Exception,e:
+			print e
+			print 'problem reading the local archive'
+			return None
+		if(dstList != None and len(dstList) == 0):
+			print '\nno dst data matched your conditions, returning None...'
+			return None
+		if(dstList != None): print '\nreturning a list with',len(dstList),'records of dst data'
+		return dstList
 			
-def readDstWeb(sTime,eTime=None):
+def readDstWeb(sTime,eTime=None,asArrays=False):
 	"""This function reads dst data from the WDC kyoto website
 	
 	.. warning::
@@ -174,6 +198,7 @@ def readDstWeb(sTime,eTime=None):
 	**Args**: 
 		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
 		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be equal to sTime.  default = None
+		* [**asArrays**] (bool): if this is True, return a :class:`gme.base.gmeBase.gmeArrays` instead of a list of objects.  default = False
 	**Example**:
 		::
 		
@@ -185,6 +210,7 @@ def readDstWeb(sTime,eTime=None):
 	
 	import datetime as dt
 	import mechanize
+	from gme.base.colParse import iagaColumns, columnsToRecs, columnsToArrays
 	
 	assert(isinstance(sTime,dt.datetime)),'error, sTime must be a datetime object'
 	if(eTime == None): eTime = sTime
@@ -227,15 +253,15 @@ def readDstWeb(sTime,eTime=None):
 	#get the data
 	lines = response.readlines()
 
-	dstList = []
-	for l in lines:
-		#check for headers
-		if(l[0] == ' ' or l[0:4] == 'DATE'): continue
-		cols=l.split()
-		try: dstList.append(dstRec(webLine=l))
-		except Exception,e:
-			print e
-			print 'problemm assigning initializing dst object'
+	#parse all of the lines at once, and make the objects from the columns
+	try: cols = iagaColumns(lines,['dst'])
+	except Exception,e:
+		print e
+		print 'problem parsing the dst data'
+		return None
+	if(len(cols['time']) == 0): return None
+	if(asArrays): return columnsToArrays(cols,dstRec,['dst'])
+	dstList = columnsToRecs(cols,dstRec,['dst'])
 		
 	if(dstList != []): return dstList
 	else: return None
@@ -278,24 +304,10 @@ def mapDstMongo(sYear,eYear=None):
 	for yr in range(sYear,eYear+1):
 		#1 year at a time, to not fill up RAM
 		templist = readDstWeb(dt.datetime(yr,1,1),dt.datetime(yr,12,31))
-		for rec in templist:
-			#check if a duplicate record exists
-			qry = mongoData.find({'time':rec.time})
-			print rec.time
-			tempRec = rec.toDbDict()
-			cnt = qry.count()
-			#if this is a new record, insert it
-			if(cnt == 0): mongoData.insert(tempRec)
-			#if this is an existing record, update it
-			elif(cnt == 1):
-				print 'foundone!!'
-				dbDict = qry.next()
-				temp = dbDict['_id']
-				dbDict = tempRec
-				dbDict['_id'] = temp
-				mongoData.save(dbDict)
-			else:
-				print 'strange, there is more than 1 DST record for',rec.time
+		#upsert the records on their natural key in bulk
+		t0 = dt.datetime.now()
+		nDocs = db.bulkUpsert(mongoData,(rec.toDbDict() for rec in templist),['time'],replace=True)
+		db.printRate('dst '+str(yr),nDocs,t0)
 		del templist
 		
 
@@ -0,0 +1,382 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+.. module:: indArchive
+   :synopsis: A local columnar archive of the geomagnetic indices
+
+**Module**: gme.ind.indArchive
+*************************
+The indices read from the web and FTP servers (omni, kp, dst, ae and
+sym/asy) are kept in one HDF5 file per index and resolution under
+archiveDir, with a group per year holding a chunked, compressed column
+per member plus the times in epoch seconds.  A time range is read by
+binary searching the time column and reading only that slice of the
+other columns, so repeated queries never touch the network.
+
+A year whose data was fetched after the year ended is complete and is
+never fetched again.  The latest year is topped up with the records
+newer than its last time (the watermark) when a query goes past the
+watermark, at most once every archiveRefresh seconds.
+
+**Functions**:
+	* :func:`readArchive`
+	* :func:`readArchiveColumns`
+	* :func:`updateArchive`
+	* :func:`archiveWatermark`
+"""
+
+import os
+
+#where the archive files are kept
+archiveDir = '/tmp/gme/archive'
+#the least number of seconds between two fetches of the latest year
+archiveRefresh = 6*3600
+
+#what is archived for each index: the module with the record class and
+#the reader that fetches it, the valid resolutions (the first is the
+#default, None if the reader takes no res), the first year of data, and
+#the members as (name, kind, width), where kind is 'f' for floats, 'i'
+#for ints, 'S2' for strings, and width is the length of list members
+_specs = { \
+	'omni':{'mod':'gme.ind.omni','cls':'omniRec','fetch':'readOmniFtp','res':[5,1],'first':1995, \
+		'fields':[(x,'f',1) for x in ['timeshift','bMagAvg','bx','bye','bze','bym','bzm', \
+		'flowSpeed','vxe','vye','vze','np','temp','pDyn','e','beta','machNum','ae','al','au', \
+		'symd','symh','asyd','asyh']]}, \
+	'kp':{'mod':'gme.ind.kp','cls':'kpDay','fetch':'readKpFtp','res':[None],'first':1932, \
+		'fields':[('kp','S2',8),('ap','i',8),('kpSum','i',1),('apMean','i',1),('sunspot','i',1)]}, \
+	'dst':{'mod':'gme.ind.dst','cls':'dstRec','fetch':'readDstWeb','res':[None],'first':1957, \
+		'fields':[('dst','f',1)]}, \
+	'ae':{'mod':'gme.ind.ae','cls':'aeRec','fetch':'readAeWeb','res':[60,1],'first':1990, \
+		'fields':[(x,'f',1) for x in ['ae','au','al','ao']]}, \
+	'symasy':{'mod':'gme.ind.symasy','cls':'symAsyRec','fetch':'readSymAsyWeb','res':[None],'first':1981, \
+		'fields':[(x,'f',1) for x in ['symh','symd','asyh','asyd']]}, \
+}
+
+def _spec(name, res):
+	"""check the index name and resolution, returning the spec and the resolution to use"""
+	assert(_specs.has_key(name)), 'error, name must be one of '+str(sorted(_specs.keys()))
+	spec = _specs[name]
+	if(res == None): res = spec['res'][0]
+	assert(res in spec['res']), 'error, res for '+name+' must be one of '+str(spec['res'])
+	return spec,res
+
+def _fileName(name, res):
+	"""the archive file for an index and resolution"""
+	if(res == None): return os.path.join(archiveDir,name+'.h5')
+	return os.path.join(archiveDir,name+str(res)+'.h5')
+
+def _epoch(time):
+	"""a datetime in epoch seconds"""
+	import calendar
+	return calendar.timegm(time.timetuple())+time.microsecond*1e-6
+
+def _arraysToColumns(spec, arrs):
+	"""convert the gmeArrays from a reader to the archive columns, sorted by time"""
+	import numpy as np
+	order = np.argsort(arrs.time,kind='mergesort')
+	cols = {'time':arrs.time[order].astype(np.int64)*1e-3}
+	n = len(order)
+	for attr,kind,width in spec['fields']:
+		shape = (n,width) if width > 1 else (n,)
+		if(attr not in arrs.names):
+			col = np.full(shape,'?',dtype='S2') if kind == 'S2' else np.full(shape,np.nan)
+		elif(kind == 'S2'): col = arrs[attr].astype('S2')
+		else: col = arrs[attr].astype(np.float64)
+		cols[attr] = col.reshape(shape)[order]
+	return cols
+
+def _columnsToArrays(spec, res, cols):
+	"""wrap a dict of numpy arrays in a gmeArrays"""
+	import numpy as np
+	from gme.base.gmeBase import gmeArrays
+	mod = __import__(spec['mod'],fromlist=[spec['cls']])
+	cls = getattr(mod,spec['cls'])
+	if(res != None): rec = cls(res=res)
+	else: rec = cls()
+	cols = dict(cols)
+	cols['time'] = np.round(cols['time']*1e3).astype(np.int64).astype('datetime64[ms]')
+	return gmeArrays(cols,dataSet=getattr(rec,'dataSet',None),info=getattr(rec,'info',None))
+
+def _columnsToRecs(spec, res, cols):
+	"""convert a dict of numpy arrays back to a list of record objects"""
+	import datetime as dt, math
+	mod = __import__(spec['mod'],fromlist=[spec['cls']])
+	cls = getattr(mod,spec['cls'])
+	def conv(kind,v):
+		if(kind == 'S2'): return str(v)
+		if(math.isnan(v)): return None
+		if(kind == 'i'): return int(v)
+		return float(v)
+	recs = []
+	for i in range(len(cols['time'])):
+		if(res != None): rec = cls(res=res)
+		else: rec = cls()
+		rec.time = dt.datetime.utcfromtimestamp(cols['time'][i])
+		for attr,kind,width in spec['fields']:
+			if(width > 1): setattr(rec,attr,[conv(kind,x) for x in cols[attr][i]])
+			else: setattr(rec,attr,conv(kind,cols[attr][i]))
+		recs.append(rec)
+	return recs
+
+def _fetchYear(spec, res, yr):
+	"""read one year of an index from its web or FTP server, as columns.  the reader parses straight to arrays, so no record objects are made"""
+	import datetime as dt
+	mod = __import__(spec['mod'],fromlist=[spec['fetch']])
+	fetch = getattr(mod,spec['fetch'])
+	sTime,eTime = dt.datetime(yr,1,1),dt.datetime(yr,12,31,23,59,59)
+	try:
+		if(res != None): arrs = fetch(sTime,eTime,res=res,asArrays=True)
+		else: arrs = fetch(sTime,eTime,asArrays=True)
+	except Exception,e:
+		print e
+		print 'problem fetching',spec['cls'],'data for',yr
+		return None
+	#the readers return None when they fail as well as when there is no
+	#data, so nothing is stored and the year is tried again next time
+	if(arrs == None): return None
+	return _arraysToColumns(spec,arrs)
+
+def _lock(name, res, exclusive):
+	"""lock an archive file against other processes, returning the lock file"""
+	import fcntl
+	if not os.path.exists(archiveDir):
+		try: os.makedirs(archiveDir)
+		except OSError: pass
+	lock = open(_fileName(name,res)+'.lock','w')
+	if(exclusive): fcntl.flock(lock,fcntl.LOCK_EX)
+	else: fcntl.flock(lock,fcntl.LOCK_SH)
+	return lock
+
+def _needsFetch(f, yr, eTime, now):
+	"""whether year yr of the open archive file f should be fetched to cover up to eTime (epoch seconds)"""
+	import datetime as dt
+	key = str(yr)
+	if(not key in f): return True
+	g = f[key]
+	checked = g.attrs['checked']
+	#fetched after the year ended, so it is complete
+	if(dt.datetime.utcfromtimestamp(checked).year > yr): return False
+	#already covers the request
+	if(len(g['time']) > 0 and g['time'][-1] >= eTime): return False
+	return now-checked > archiveRefresh
+
+def _refreshYear(f, spec, res, yr, now):
+	"""fetch year yr and add the records newer than its watermark to the open archive file f, returning the number added"""
+	import numpy as np
+	cols = _fetchYear(spec,res,yr)
+	if(cols == None): return 0
+	key = str(yr)
+	if(key in f):
+		old = dict((x,f[key][x][:]) for x in f[key].keys())
+		if(len(old['time']) > 0):
+			keep = cols['time'] > old['time'][-1]
+			cols = dict((x,np.concatenate((old[x],cols[x][keep]))) for x in cols.keys())
+		nNew = len(cols['time'])-len(old['time'])
+		del f[key]
+	else: nNew = len(cols['time'])
+	g = f.create_group(key)
+	for x,col in cols.iteritems():
+		if(len(col) > 0): g.create_dataset(x,data=col,chunks=True,compression='gzip',shuffle=True)
+		else: g.create_dataset(x,data=col)
+	g.attrs['checked'] = now
+	return nNew
+
+def archiveWatermark(name, res=None):
+	"""Returns the time of the newest record in the archive of an index.
+
+	**Args**:
+		* **name** (str): the index, one of 'omni', 'kp', 'dst', 'ae', 'symasy'
+		* [**res**] (int or None): the time resolution, for omni (5 or 1) and ae (60 or 1).  if this is None, the default resolution of the index is used.  default = None
+	**Returns**:
+		* **time** (`datetime <http://tinyurl.com/bl352yx>`_ or None): the time of the newest record, None if the archive is empty
+	**Example**:
+		::
+
+			wm = gme.ind.archiveWatermark('omni',res=1)
+
+	"""
+	import h5py, datetime as dt
+	spec,res = _spec(name,res)
+	fileName = _fileName(name,res)
+	if(not os.path.isfile(fileName)): return None
+	lock = _lock(name,res,False)
+	try:
+		with h5py.File(fileName,'r') as f:
+			for yr in sorted([int(x) for x in f.keys()],reverse=True):
+				t = f[str(yr)]['time']
+				if(len(t) > 0): return dt.datetime.utcfromtimestamp(t[-1])
+	finally: lock.close()
+	return None
+
+def updateArchive(name, eTime=None, res=None, sYear=None):
+	"""Brings the archive of an index up to date by fetching only the data newer than its watermark.  The years after the watermark are fetched in full and the year of the watermark is topped up.
+
+	**Args**:
+		* **name** (str): the index, one of 'omni', 'kp', 'dst', 'ae', 'symasy'
+		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): fetch up to this time.  if this is None, fetch up to now.  default = None
+		* [**res**] (int or None): the time resolution, for omni (5 or 1) and ae (60 or 1).  default = None
+		* [**sYear**] (int or None): the year to start from if the archive is empty.  if this is None, the first year the index is available.  default = None
+	**Returns**:
+		* **nNew** (int): the number of records added
+	**Example**:
+		::
+
+			gme.ind.updateArchive('dst',sYear=2000)
+
+	"""
+	import h5py, datetime as dt, time
+	spec,res = _spec(name,res)
+	if(eTime == None): eTime = dt.datetime.utcnow()
+	wm = archiveWatermark(name,res)
+	if(wm != None): sYear = wm.year
+	elif(sYear == None): sYear = spec['first']
+
+	nNew = 0
+	lock = _lock(name,res,True)
+	try:
+		with h5py.File(_fileName(name,res),'a') as f:
+			now = time.time()
+			for yr in range(sYear,eTime.year+1):
+				if(not _needsFetch(f,yr,_epoch(eTime),now)): continue
+				n = _refreshYear(f,spec,res,yr,now)
+				print name,yr,': added',n,'records'
+				nNew += n
+	finally: lock.close()
+	return nNew
+
+def readArchiveColumns(name, sTime, eTime=None, res=None, ranges=None, update=True):
+	"""Reads a time range of an index from the archive as columns, fetching any years that are missing from it first.
+
+	**Args**:
+		* **name** (str): the index, one of 'omni', 'kp', 'dst', 'ae', 'symasy'
+		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
+		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be 1 day after sTime.  default = None
+		* [**res**] (int or None): the time resolution, for omni (5 or 1) and ae (60 or 1).  default = None
+		* [**ranges**] (dict or None): only keep the records whose members are in these ranges, eg {'bz':[-10,0]}.  records where a member is None are dropped.  default = None
+		* [**update**] (bool): fetch data that is missing from the archive.  if this is False, only what is already archived is read.  default = True
+	**Returns**:
+		* **cols** (dict): a numpy array per member, plus 'time' in epoch seconds.  list members, eg kp, are 2d arrays with a row per record.
+	**Example**:
+		::
+
+			import datetime as dt
+			cols = gme.ind.readArchiveColumns('omni',dt.datetime(2011,1,1),dt.datetime(2011,2,1),res=1)
+
+	"""
+	import h5py, numpy as np, datetime as dt, time
+	spec,res = _spec(name,res)
+	assert(isinstance(sTime,dt.datetime)),'error, sTime must be a datetime object'
+	if(eTime == None): eTime = sTime+dt.timedelta(days=1)
+	assert(isinstance(eTime,dt.datetime)),'error, eTime must be a datetime object'
+	s,e = _epoch(sTime),_epoch(eTime)
+	fileName = _fileName(name,res)
+	years = range(sTime.year,eTime.year+1)
+
+	#fetch the years that are missing, checking again once we hold the
+	#write lock in case another process fetched them in the meantime
+	if(update):
+		now = time.time()
+		missing = years
+		if(os.path.isfile(fileName)):
+			lock = _lock(name,res,False)
+			try:
+				with h5py.File(fileName,'r') as f:
+					missing = [yr for yr in years if _needsFetch(f,yr,e,now)]
+			finally: lock.close()
+		if(len(missing) > 0):
+			lock = _lock(name,res,True)
+			try:
+				with h5py.File(fileName,'a') as f:
+					for yr in missing:
+						if(_needsFetch(f,yr,e,now)): _refreshYear(f,spec,res,yr,now)
+			finally: lock.close()
+
+	#binary search each year for the time range and read just that slice
+	parts = []
+	if(os.path.isfile(fileName)):
+		lock = _lock(name,res,False)
+		try:
+			with h5py.File(fileName,'r') as f:
+				for yr in years:
+					if(not str(yr) in f): continue
+					g = f[str(yr)]
+					t = g['time'][:]
+					i0,i1 = np.searchsorted(t,s,'left'),np.searchsorted(t,e,'right')
+					if(i1 <= i0): continue
+					parts.append(dict((x,g[x][i0:i1]) for x in g.keys()))
+		finally: lock.close()
+
+	cols = {'time':np.zeros(0,dtype=np.float64)}
+	for attr,kind,width in spec['fields']:
+		dtype = 'S2' if kind == 'S2' else np.float64
+		cols[attr] = np.zeros((0,width) if width > 1 else 0,dtype=dtype)
+	if(len(parts) > 0):
+		cols = dict((x,np.concatenate([p[x] for p in parts])) for x in cols.keys())
+
+	return _keepRanges(cols,ranges)
+
+def _kpNumbers(col):
+	"""the values of an array of kp strings, eg '3-', '3' and '3+' are 2.67, 3 and 3.33.  anything else, eg '?', is nan"""
+	import numpy as np
+	col = np.ascontiguousarray(col,dtype='S2')
+	c = col.view(np.uint8).reshape(col.shape+(2,))
+	num = c[...,0].astype(float)-ord('0')
+	num[(num < 0) | (num > 9)] = np.nan
+	return num+(c[...,1] == ord('+'))/3.-(c[...,1] == ord('-'))/3.
+
+def _keepRanges(cols, ranges):
+	"""keep the rows of cols whose members are in ranges"""
+	import numpy as np
+	if(ranges == None or len(cols['time']) == 0): return cols
+	mask = np.ones(len(cols['time']),dtype=bool)
+	for attr,rng in ranges.iteritems():
+		col = cols[attr]
+		#the only text members are kp values, which are compared as numbers
+		if(col.dtype.kind == 'S'): col = _kpNumbers(col)
+		#list members match if any of their values is in range
+		if(col.ndim > 1): col = np.fmax.reduce(col,axis=1)
+		with np.errstate(invalid='ignore'):
+			mask &= (col >= min(rng)) & (col <= max(rng))
+	return dict((x,col[mask]) for x,col in cols.iteritems())
+
+def readArchive(name, sTime, eTime=None, res=None, ranges=None, update=True, asArrays=False):
+	"""Reads a time range of an index from the archive as a list of record objects, like those returned by the index's web or FTP reader.  See :func:`readArchiveColumns`.
+
+	**Args**:
+		* **name** (str): the index, one of 'omni', 'kp', 'dst', 'ae', 'symasy'
+		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
+		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be 1 day after sTime.  default = None
+		* [**res**] (int or None): the time resolution, for omni (5 or 1) and ae (60 or 1).  default = None
+		* [**ranges**] (dict or None): only return the records whose members are in these ranges.  kp values are compared as numbers, eg '3+' is 3.33.  default = None
+		* [**update**] (bool): fetch data that is missing from the archive.  default = True
+		* [**asArrays**] (bool): return a :class:`gme.base.gmeBase.gmeArrays` instead of a list of objects.  default = False
+	**Returns**:
+		* **recList** (list or None): a list of record objects, eg :class:`gme.ind.omni.omniRec`, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  None if the archive has no data for the time range, and an empty list (whatever asArrays is) if it has but none of it is in ranges, so that callers know not to look for the data elsewhere
+	**Example**:
+		::
+
+			import datetime as dt
+			omniList = gme.ind.readArchive('omni',dt.datetime(2011,1,1),dt.datetime(2011,2,1))
+
+	"""
+	spec,res = _spec(name,res)
+	cols = readArchiveColumns(name,sTime,eTime=eTime,res=res,update=update)
+	if(len(cols['time']) == 0): return None
+	cols = _keepRanges(cols,ranges)
+	if(len(cols['time']) == 0): return []
+	if(asArrays): return _columnsToArrays(spec,res,cols)
+	return _columnsToRecs(spec,res,cols)
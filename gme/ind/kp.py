@@ -28,6 +28,7 @@
 **Functions**:
 	* :func:`gme.ind.kp.readKp`
 	* :func:`gme.ind.kp.readKpFtp`
+	* :func:`gme.ind.kp.parseKpLines`
 	* :func:`gme.ind.kp.mapKpMongo`
 """
 
@@ -136,7 +137,7 @@ class kpDay(gme.base.gmeBase.gmeData):
 			myStr += key+' = '+str(var)+'\n'
 		return myStr
 		
-def readKp(sTime=None,eTime=None,kpMin=None,apMin=None,kpSum=None,apMean=None,sunspot=None):
+def readKp(sTime=None,eTime=None,kpMin=None,apMin=None,kpSum=None,apMean=None,sunspot=None,asArrays=False):
 	"""This function reads kp data.  First, it will try to get it from the mongodb, and if it can't find it, it will look on the GFZ ftp server using :func:`gme.ind.kp.readKpFtp`
 	
 	**Args**: 
@@ -147,8 +148,9 @@ def readKp(sTime=None,eTime=None,kpMin=None,apMin=None,kpSum=None,apMean=None,su
 		* [**kpSum**] (list or None): this must be a 2 element list of integers.  if this is specified, only dates with kpSum values in the range [a,b] will be returned.  if this is None, it will be ignored.  default=None
 		* [**apMean**] (list or None): this must be a 2 element list of integers.  if this is specified, only dates with apMean values in the range [a,b] will be returned.  if this is None, it will be ignored.  default=None
 		* [**sunspot**] (list or None): this must be a 2 element list of integers.  if this is specified, only dates with sunspot values in the range [a,b] will be returned.  if this is None, it will be ignored.  default=None
+		* [**asArrays**] (bool): if this is True, the data are returned as a :class:`gme.base.gmeBase.gmeArrays`, with an array per parameter, instead of a list of objects.  kp and ap are 2d arrays with a row of 8 values per day.  default = False
 	**Returns**:
-		* **kpList** (list or None): if data is found, a list of :class:`gme.ind.kp.kpDay` objects matching the input parameters is returned.  If not data is found, None is returned.
+		* **kpList** (list or None): if data is found, a list of :class:`gme.ind.kp.kpDay` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If not data is found, None is returned.
 	**Example**:
 		::
 		
@@ -159,6 +161,7 @@ def readKp(sTime=None,eTime=None,kpMin=None,apMin=None,kpSum=None,apMean=None,su
 	"""
 	import datetime as dt
 	import pydarn.sdio.dbUtils as db
+	from gme.base.gmeBase import recsToArrays, concatArrays
 	
 	#check all the inputs for validity
 	assert(sTime == None or isinstance(sTime,dt.datetime)), \
@@ -202,6 +205,12 @@ def readKp(sTime=None,eTime=None,kpMin=None,apMin=None,kpSum=None,apMean=None,su
 	if(qryList != []): qry = kpData.find(qryDict)
 	else: qry = kpData.find()
 	if(qry.count() > 0):
+		#the kp values are stored coded as numbers, so they go through
+		#kpDay objects one at a time
+		if(asArrays):
+			kpArrs = recsToArrays(kpDay(dbDict=rec) for rec in qry.sort('time'))
+			print '\nreturning arrays of',len(kpArrs),'days of kp data'
+			return kpArrs
 		kpList = []
 		for rec in qry.sort('time'):
 			kpList.append(kpDay(dbDict=rec))
@@ -215,14 +224,39 @@ def readKp(sTime=None,eTime=None,kpMin=None,apMin=None,kpSum=None,apMean=None,su
 		if(sTime == None):
 			print 'start time for search set to 1980...'
 			sTime = dt.datetime(1980,1,1)
+		if(eTime == None): eTime = dt.datetime.utcnow()
+		
+		#read from the local archive, which fetches what it is missing
+		#from the ftp server
+		try:
+			from gme.ind.indArchive import readArchive
+			ranges = {}
+			if(kpMin != None): ranges['kp'] = [kpMin,float('inf')]
+			if(apMin != None): ranges['ap'] = [apMin,float('inf')]
+			if(kpSum != None): ranges['kpSum'] = kpSum
+			if(apMean != None): ranges['apMean'] = apMean
+			if(sunspot != None): ranges['sunspot'] = sunspot
+			kpList = readArchive('kp',sTime,eTime,ranges=ranges,asArrays=asArrays)
+			#the archive has the data, but none of it matched
+			if(kpList != None and len(kpList) == 0):
+				print '\nno kp data matched your conditions, returning None...'
+				return None
+			if(kpList != None):
+				print '\nreturning a list with',len(kpList),'days of kp data'
+				return kpList
+		except Exception,e:
+			print e
+			print 'problem reading the local archive'
 		
 		kpList = []
-		if(eTime == None): eTime = dt.now()
 		for yr in range(sTime.year,eTime.year+1):
-			tmpList = readKpFtp(dt.datetime(yr,1,1), eTime=dt.datetime(yr,12,31))
+			tmpList = readKpFtp(dt.datetime(yr,1,1), eTime=dt.datetime(yr,12,31), asArrays=asArrays)
 			if(tmpList == None): continue
-			for x in tmpList:
-				kpList.append(x)
+			if(asArrays): kpList.append(tmpList)
+			else:
+				for x in tmpList:
+					kpList.append(x)
+		if(asArrays and kpList != []): kpList = concatArrays(kpList)
 				
 		if(kpList != []):
 			print '\nreturning a list with',len(kpList),'days of kp data'
@@ -231,7 +265,7 @@ def readKp(sTime=None,eTime=None,kpMin=None,apMin=None,kpSum=None,apMean=None,su
 			print '\n no data found on FTP server, returning None...'
 			return None
 	
-def readKpFtp(sTime, eTime=None):
+def readKpFtp(sTime, eTime=None, asArrays=False):
 	"""This function reads kp data from the GFZ Potsdam FTP server via anonymous FTP connection.  This cannot read across year boundaries.
 	
 	.. warning::
@@ -240,8 +274,9 @@ def readKpFtp(sTime, eTime=None):
 	**Args**: 
 		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
 		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be the end of the year of sTime.  default=None
+		* [**asArrays**] (bool): if this is True, return a :class:`gme.base.gmeBase.gmeArrays` instead of a list of objects.  default = False
 	**Returns**:
-		* **kpList** (list or None): if data is found, a list of :class:`gme.ind.kp.kpDay` objects matching the input parameters is returned.  If not data is found, None is returned.  default=None
+		* **kpList** (list or None): if data is found, a list of :class:`gme.ind.kp.kpDay` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If not data is found, None is returned.  default=None
 	**Example**:
 		::
 		
@@ -291,15 +326,58 @@ def readKpFtp(sTime, eTime=None):
 		print 'couldnt retrieve kp file'
 	
 	#convert the ascii lines into a list of kpDay objects
-	myKp = []
+	lines = [l for l in lines if(l.strip() != '')]
 	if(len(lines) > 0):
-		for l in lines:
-			if(sTime <= dt.datetime(sTime.year,int(l[2:4]),int(l[4:6])) <= eTime):
-				myKp.append(kpDay(ftpLine=l,year=sTime.year))
-			
-		return myKp
+		import numpy as np
+		from gme.base.colParse import columnsToRecs, columnsToArrays
+		cols = parseKpLines(lines,sTime.year)
+		inRange = (cols['time'] >= np.datetime64(sTime)) & (cols['time'] <= np.datetime64(eTime))
+		if(asArrays): return columnsToArrays(cols,kpDay,['kp','ap','kpSum','apMean','sunspot'],mask=inRange)
+		return columnsToRecs(cols,kpDay,['kp','ap','kpSum','apMean','sunspot'],mask=inRange, \
+			ints=['kpSum','apMean','sunspot'])
 	else:
 		return None
+
+def parseKpLines(lines, yr):
+	"""This function parses the lines of a GFZ-Potsdam kp file all at once into numpy columns.  It gives the same values as :func:`kpDay.parseFtp`, except that a blank kpSum, apMean or sunspot is NaN.
+	
+	**Args**: 
+		* **lines** (list): the ASCII lines from the FTP server
+		* **yr** (int): the year which the data are from
+	**Returns**:
+		* **cols** (dict): the columns, with the keys time (datetime64), kp (Nx8 strings), ap (Nx8), kpSum, apMean and sunspot
+	**Example**:
+		::
+		
+			cols = gme.ind.parseKpLines(lines,2009)
+			
+	"""
+	import numpy as np
+	from gme.base.colParse import fixedColumns, makeTimes
+	
+	spec = [('month',(2,4),'i',None),('day',(4,6),'i',None),('kpSum',(28,31),'i',None), \
+		('apMean',(55,58),'i',None),('sunspot',(62,65),'i',None)]
+	for i in range(8):
+		spec += [('num%d' % i,(12+i*2,13+i*2),'S',None),('mod%d' % i,(13+i*2,14+i*2),'S',None), \
+			('ap%d' % i,(31+i*3,34+i*3),'i',None)]
+	raw = fixedColumns(lines,spec)
+	
+	cols = {'time':makeTimes(np.zeros(len(lines),dtype=np.int64)+yr,month=raw['month'],day=raw['day'])}
+	for x in ['kpSum','apMean','sunspot']: cols[x] = raw[x]
+	cols['ap'] = np.column_stack([raw['ap%d' % i] for i in range(8)])
+	
+	#build the kp strings, eg 3, 3+ or 4-
+	kp = []
+	for i in range(8):
+		num,mod = raw['num%d' % i],raw['mod%d' % i]
+		num = np.where(num == ' ',np.array('0'),num)
+		up = np.char.mod('%d',np.where(mod == '7',num.astype(np.int64)+1,0))
+		k = np.where(mod == '0',num,np.array('?',dtype='S3'))
+		k = np.where(mod == '7',np.char.add(up,'-'),k)
+		k = np.where(mod == '3',np.char.add(num,'+'),k)
+		kp.append(k)
+	cols['kp'] = np.column_stack(kp)
+	return cols
 	
 def mapKpMongo(sYear,eYear=None):
 	"""This function reads kp data from the GFZ Potsdam FTP server via anonymous FTP connection and maps it to the mongodb.  
@@ -341,21 +419,8 @@ def mapKpMongo(sYear,eYear=None):
 	for yr in range(sYear,eYear+1):
 		templist = readKpFtp(dt.datetime(yr,1,1), dt.datetime(yr+1,1,1))
 		if(templist == None): continue
-		for rec in templist:
-			#check if a duplicate record exists
-			qry = mongoData.find({'time':rec.time})
-			tempRec = rec.toDbDict()
-			cnt = qry.count()
-			#if this is a new record, insert it
-			if(cnt == 0): mongoData.insert(tempRec)
-			#if this is an existing record, update it
-			elif(cnt == 1):
-				print 'foundone!!'
-				dbDict = qry.next()
-				temp = dbDict['_id']
-				dbDict = tempRec
-				dbDict['_id'] = temp
-				mongoData.save(dbDict)
-			else:
-				print 'strange, there is more than 1 record for',rec.time
+		#upsert the records on their natural key in bulk
+		t0 = dt.datetime.now()
+		nDocs = db.bulkUpsert(mongoData,(rec.toDbDict() for rec in templist),['time'],replace=True)
+		db.printRate('kp '+str(yr),nDocs,t0)
 	
\ No newline at end of file
@@ -27,9 +27,18 @@
 **Functions**:
 	* :func:`readOmni`
 	* :func:`readOmniFtp`
+	* :func:`omniLineTime`
+	* :func:`parseOmniLines`
 	* :func:`mapOmniMongo`
 """
 import gme
+
+#the columns of the omni ascii files that are read, as (attribute, field index)
+omniCols = [('timeshift',9),('bMagAvg',13),('bx',14),('bye',15),('bze',16),('bym',17), \
+						('bzm',18),('flowSpeed',21),('vxe',22),('vye',23),('vze',24),('np',25), \
+						('temp',26),('pDyn',27),('e',28),('beta',29),('machNum',30),('ae',37), \
+						('al',38),('au',39),('symd',40),('symh',41),('asyd',42),('asyh',43)]
+
 class omniRec(gme.base.gmeBase.gmeData):
 	"""a class to represent a record of omni data.  Extends :class:`gmeBase.gmeData`.  Insight on the class members can be obtained from `the NASA SPDF site <ftp://spdf.gsfc.nasa.gov/pub/data/omni/high_res_omni/hroformat.txt>`_.  note that Omni data is available from 1995-present day (or whatever the latest NASA has uploaded is), in 1 and 5 minute resolution.
 	
@@ -101,10 +110,7 @@ class omniRec(gme.base.gmeBase.gmeData):
 		import datetime as dt
 		
 		#a dict to map from the column number in the line to attribute name
-		mappingdict = {9:'timeshift',13:'bMagAvg',14:'bx',15:'bye',16:'bze',17:'bym', \
-										18:'bzm',21:'flowSpeed',22:'vxe',23:'vye',24:'vze',25:'np', \
-										26:'temp',27:'pDyn',28:'e',29:'beta',30:'machNum',37:'ae', \
-										38:'al',39:'au',40:'symd',41:'symh',42:'asyd',43:'asyh'}
+		mappingdict = dict((i,name) for name,i in omniCols)
 										
 		#split the line into cols
 		cols = line.split()
@@ -177,7 +183,7 @@ class omniRec(gme.base.gmeBase.gmeData):
 		if(ftpLine != None): self.parseFtp(ftpLine)
 		if(dbDict != None): self.parseDb(dbDict)
 	
-def readOmni(sTime,eTime=None,res=5,bx=None,bye=None,bze=None,bym=None,bzm=None,pDyn=None,ae=None,symh=None):
+def readOmni(sTime,eTime=None,res=5,bx=None,bye=None,bze=None,bym=None,bzm=None,pDyn=None,ae=None,symh=None,asArrays=False):
 	"""This function reads omni data.  First, it will try to get it from the mongodb, and if it can't find it, it will look on the NASA SPDF FTP server using :func:`readOmniFtp`
 	
 	**Args**: 
@@ -193,8 +199,9 @@ def readOmni(sTime,eTime=None,res=5,bx=None,bye=None,bze=None,bym=None,bzm=None,
 		* [**pDyn**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with pDyn values in the range [a,b] will be returned.  default = None
 		* [**ae**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with ae values in the range [a,b] will be returned.  default = None
 		* [**symh**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with symh values in the range [a,b] will be returned.  default = None
+		* [**asArrays**] (bool): if this is True, the data are returned as a :class:`gme.base.gmeBase.gmeArrays`, with an array per parameter, instead of a list of objects.  default = False
 	**Returns**:
-		* **omniList** (list or None): if data is found, a list of :class:`omniRec` objects matching the input parameters is returned.  If no data is found, None is returned.
+		* **omniList** (list or None): if data is found, a list of :class:`omniRec` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If no data is found, None is returned.
 	**Example**:
 		::
 		
@@ -206,6 +213,7 @@ def readOmni(sTime,eTime=None,res=5,bx=None,bye=None,bze=None,bym=None,bzm=None,
 	
 	import datetime as dt
 	import pydarn.sdio.dbUtils as db
+	from gme.base.gmeBase import recsToArrays
 	
 	#check all the inputs for validity
 	assert(isinstance(sTime,dt.datetime)), \
@@ -240,6 +248,11 @@ def readOmni(sTime,eTime=None,res=5,bx=None,bye=None,bze=None,bym=None,bzm=None,
 	if(qryList != []): qry = omniData.find(qryDict)
 	else: qry = omniData.find()
 	if(qry.count() > 0):
+		#gather the documents straight into arrays, without making objects
+		if(asArrays):
+			omniArrs = recsToArrays(qry.sort('time'))
+			print '\nreturning arrays of',len(omniArrs),'records of omni data'
+			return omniArrs
 		omniList = []
 		for rec in qry.sort('time'):
 			omniList.append(omniRec(dbDict=rec))
@@ -248,10 +261,28 @@ def readOmni(sTime,eTime=None,res=5,bx=None,bye=None,bze=None,bym=None,bzm=None,
 	#if we didn't find anything on the mongodb
 	else:
 		print '\ncould not find requested data in the mongodb'
+		
+		#read from the local archive, which fetches what it is missing
+		#from the ftp server
+		try:
+			from gme.ind.indArchive import readArchive
+			ranges = dict((x,var[x]) for x in ['bx','bye','bze','bym','bzm','pDyn','ae','symh'] if var[x] != None)
+			omniList = readArchive('omni',sTime,eTime,res=res,ranges=ranges,asArrays=asArrays)
+			#the archive has the data, but none of it matched
+			if(omniList != None and len(omniList) == 0):
+				print '\nno omni data matched your conditions, returning None...'
+				return None
+			if(omniList != None):
+				print '\nreturning a list with',len(omniList),'recs of omni data'
+				return omniList
+		except Exception,e:
+			print e
+			print 'problem reading the local archive'
+		
 		print 'we will look on the ftp server, but your conditions will be (mostly) ignored'
 		
 		#read from ftp server
-		omniList = readOmniFtp(sTime, eTime)
+		omniList = readOmniFtp(sTime, eTime, res=res, asArrays=asArrays)
 		
 		if(omniList != None):
 			print '\nreturning a list with',len(omniList),'recs of omni data'
@@ -260,18 +291,22 @@ def readOmni(sTime,eTime=None,res=5,bx=None,bye=None,bze=None,bym=None,bzm=None,
 			print '\n no data found on FTP server, returning None...'
 			return None
 			
-def readOmniFtp(sTime,eTime=None,res=5):
+def readOmniFtp(sTime,eTime=None,res=5,asArrays=False,ftp=None):
 	"""This function reads omni data from the NASA SPDF server via anonymous FTP connection.
 	
 	.. warning::
 		You should not use this. Use the general function :func:`readOmni` instead.
 	
+	The yearly files are streamed with :func:`gme.base.ftpStream.retrRange`, starting near sTime and stopping after eTime, so a short time range transfers only a small part of a file.
+	
 	**Args**: 
 		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
 		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be equal to sTime.  default = None
 		* [**res**] (int): the time resolution of the data you want.  Must be either 1 or 5.  default=5
+		* [**asArrays**] (bool): if this is True, return a :class:`gme.base.gmeBase.gmeArrays` instead of a list of objects.  default = False
+		* [**ftp**] (`ftplib.FTP <http://docs.python.org/2/library/ftplib.html>`_ or None): a logged in connection to use instead of connecting to the SPDF server, eg to a local mirror.  default = None
 	**Returns**:
-		* **omniList** (list or None): if data is found, a list of :class:`omniRec` objects matching the input parameters is returned.  If no data is found, None is returned.
+		* **omniList** (list or None): if data is found, a list of :class:`omniRec` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If no data is found, None is returned.
 	**Example**:
 		::
 		
@@ -283,6 +318,9 @@ def readOmniFtp(sTime,eTime=None,res=5):
 	
 	from ftplib import FTP
 	import datetime as dt
+	import numpy as np
+	from gme.base.colParse import columnsToRecs, columnsToArrays
+	from gme.base.ftpStream import retrRange
 	
 	assert(isinstance(sTime,dt.datetime)),'error, sTime must be datetime'
 	if(eTime == None): eTime=sTime
@@ -290,17 +328,18 @@ def readOmniFtp(sTime,eTime=None,res=5):
 	assert(eTime >= sTime), 'error, end time greater than start time'
 	assert(res == 1 or res == 5), 'error, res must be 1 or 5'
 	
-	#connect to the server
-	try: ftp = FTP('spdf.gsfc.nasa.gov')	
-	except Exception,e:
-		print e
-		print 'problem connecting to SPDF server'
-		
-	#login as anonymous
-	try: l=ftp.login()
-	except Exception,e:
-		print e
-		print 'problem logging in to SPDF server'
+	if(ftp == None):
+		#connect to the server
+		try: ftp = FTP('spdf.gsfc.nasa.gov')	
+		except Exception,e:
+			print e
+			print 'problem connecting to SPDF server'
+			
+		#login as anonymous
+		try: l=ftp.login()
+		except Exception,e:
+			print e
+			print 'problem logging in to SPDF server'
 	
 	#go to the omni directory
 	try: ftp.cwd('/pub/data/omni/high_res_omni/')
@@ -310,29 +349,69 @@ def readOmniFtp(sTime,eTime=None,res=5):
 	
 	#list to hold the lines
 	lines = []
-	#get the omni data
+	#get the omni data in the time range
 	for yr in range(sTime.year,eTime.year+1):
 		if(res == 1): fname = 'omni_min'+str(yr)+'.asc'
 		else: fname = 'omni_5min'+str(yr)+'.asc'
 		print 'omni: RETR '+fname
-		try: ftp.retrlines('RETR '+fname,lines.append)
+		try:
+			head,yrLines = retrRange(ftp,fname,omniLineTime,sTime,eTime, \
+				fileStart=dt.datetime(yr,1,1),fileEnd=dt.datetime(yr+1,1,1))
+			lines.extend(yrLines)
 		except Exception,e:
 			print e
 			print 'error retrieving',fname
 	
 	#convert the ascii lines into a list of omniRec objects
-	myOmni = []
 	if(len(lines) > 0):
-		for l in lines:
-			linedate = dt.datetime(int(l[0:4]), 1, 1, int(l[8:11]), int(l[11:14])) + \
-									dt.timedelta(int(l[5:8]) - 1)
-			if(sTime <= linedate <= eTime):
-				myOmni.append(omniRec(ftpLine=l,res=res))
-			if(linedate > eTime): break
-		return myOmni
+		cols = parseOmniLines(lines)
+		inRange = (cols['time'] >= np.datetime64(sTime)) & (cols['time'] <= np.datetime64(eTime))
+		if(asArrays): return columnsToArrays(cols,lambda: omniRec(res=res),[x[0] for x in omniCols],mask=inRange)
+		return columnsToRecs(cols,lambda: omniRec(res=res),[x[0] for x in omniCols],mask=inRange)
 	else:
 		return None
 		
+def omniLineTime(line):
+	"""This function reads the time of a line of an omni ascii file, without parsing the rest of it.
+	
+	**Args**: 
+		* **line** (str): an ASCII line from the FTP server
+	**Returns**:
+		* **time** (`datetime <http://tinyurl.com/bl352yx>`_): the time of the record
+	**Example**:
+		::
+		
+			t = gme.ind.omniLineTime(line)
+		
+	"""
+	import datetime as dt
+	cols = line.split(None,4)
+	return dt.datetime(int(cols[0]),1,1)+dt.timedelta(days=int(cols[1])-1,hours=int(cols[2]),minutes=int(cols[3]))
+	
+def parseOmniLines(lines):
+	"""This function converts the lines of an omni ascii file from the NASA SPDF FTP site into numpy columns in one vectorized pass.  Values written as all 9s are missing and become NaN.
+	
+	.. note::
+		In general, users will not need to worry about this.
+	
+	**Args**: 
+		* **lines** (list): the ASCII lines from the FTP server
+	**Returns**:
+		* **cols** (dict): a datetime64 array 'time' and a float array for each attribute in omniCols
+	**Example**:
+		::
+		
+			cols = gme.ind.parseOmniLines(lines)
+		
+	"""
+	from gme.base.colParse import splitColumns, makeTimes
+	
+	spec = [('year',0,'i',None),('doy',1,'i',None),('hour',2,'i',None),('minute',3,'i',None)] + \
+					[(name,i,'f','nines') for name,i in omniCols]
+	cols = splitColumns(lines,spec)
+	cols['time'] = makeTimes(cols.pop('year'),doy=cols.pop('doy'),hour=cols.pop('hour'),minute=cols.pop('minute'))
+	return cols
+	
 def mapOmniMongo(sYear,eYear=None,res=5):
 	"""This function reads omni data from the NASA SPDF FTP server via anonymous FTP connection and maps it to the mongodb.  
 	
@@ -369,6 +448,7 @@ def mapOmniMongo(sYear,eYear=None,res=5):
 	
 	#set up all of the indices
 	mongoData.ensure_index('time')
+	mongoData.ensure_index([('time',1),('res',1)])
 	mongoData.ensure_index('res')
 	mongoData.ensure_index('bx')
 	mongoData.ensure_index('bye')
@@ -384,23 +464,9 @@ def mapOmniMongo(sYear,eYear=None,res=5):
 		for mon in range(1,13):
 			templist = readOmniFtp(dt.datetime(yr,mon,1),dt.datetime(yr,mon,1)+dt.timedelta(days=31),res=res)
 			if(templist == None): continue
-			for rec in templist:
-				#check if a duplicate record exists
-				qry = mongoData.find({'$and':[{'time':rec.time},{'res':rec.res}]})
-				print rec.time
-				tempRec = rec.toDbDict()
-				cnt = qry.count()
-				#if this is a new record, insert it
-				if(cnt == 0): mongoData.insert(tempRec)
-				#if this is an existing record, update it
-				elif(cnt == 1):
-					print 'foundone!!'
-					dbDict = qry.next()
-					temp = dbDict['_id']
-					dbDict = tempRec
-					dbDict['_id'] = temp
-					mongoData.save(dbDict)
-				else:
-					print 'strange, there is more than 1 record for',rec.time
+			#upsert the records on their natural key in bulk
+			t0 = dt.datetime.now()
+			nDocs = db.bulkUpsert(mongoData,(rec.toDbDict() for rec in templist),['time','res'],replace=True)
+			db.printRate('omni '+str(yr)+'/'+str(mon),nDocs,t0)
 	
 	
\ No newline at end of file
@@ -119,7 +119,7 @@ class symAsyRec(gme.base.gmeBase.gmeData):
 		if(webLine != None): self.parseWeb(webLine)
 		if(dbDict != None): self.parseDb(dbDict)
 		
-def readSymAsy(sTime=None,eTime=None,symh=None,symd=None,asyh=None,asyd=None):
+def readSymAsy(sTime=None,eTime=None,symh=None,symd=None,asyh=None,asyd=None,asArrays=False):
 	"""This function reads sym/asy data from the mongodb.
 	
 	**Args**: 
@@ -129,8 +129,9 @@ def readSymAsy(sTime=None,eTime=None,symh=None,symd=None,asyh=None,asyd=None):
 		* [**symd**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with symd values in the range [a,b] will be returned.  default = None
 		* [**asyh**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with asyh values in the range [a,b] will be returned.  default = None
 		* [**asyd**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with asyd values in the range [a,b] will be returned.  default = None
+		* [**asArrays**] (bool): if this is True, the data are returned as a :class:`gme.base.gmeBase.gmeArrays`, with an array per parameter, instead of a list of objects.  default = False
 	**Returns**:
-		* **symList** (list or None): if data is found, a list of :class:`gme.ind.symasy.symAsyRec` objects matching the input parameters is returned.  If no data is found, None is returned.
+		* **symList** (list or None): if data is found, a list of :class:`gme.ind.symasy.symAsyRec` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If no data is found, None is returned.
 	**Example**:
 		::
 		
@@ -141,6 +142,7 @@ def readSymAsy(sTime=None,eTime=None,symh=None,symd=None,asyh=None,asyd=None):
 	"""
 	import datetime as dt
 	import pydarn.sdio.dbUtils as db
+	from gme.base.gmeBase import recsToArrays
 	
 	#check all the inputs for validity
 	assert(sTime == None or isinstance(sTime,dt.datetime)), \
@@ -173,6 +175,11 @@ def readSymAsy(sTime=None,eTime=None,symh=None,symd=None,asyh=None,asyd=None):
 	if(qryList != []): qry = symData.find(qryDict)
 	else: qry = symData.find()
 	if(qry.count() > 0):
+		#gather the documents straight into arrays, without making objects
+		if(asArrays):
+			arrs = recsToArrays(qry.sort('time'))
+			print '\nreturning arrays of',len(arrs),'records of sym/asy data'
+			return arrs
 		symList = []
 		for rec in qry.sort('time'):
 			symList.append(symAsyRec(dbDict=rec))
@@ -181,9 +188,25 @@ def readSymAsy(sTime=None,eTime=None,symh=None,symd=None,asyh=None,asyd=None):
 	#if we didn't find anything on the mongodb
 	else:
 		print '\ncould not find requested data in the mongodb'
-		return None
+		if(sTime == None): return None
+		
+		#read from the local archive, which fetches what it is missing
+		#from the web
+		try:
+			from gme.ind.indArchive import readArchive
+			ranges = dict((x,var[x]) for x in ['symh','symd','asyh','asyd'] if var[x] != None)
+			symList = readArchive('symasy',sTime,eTime,ranges=ranges,asArrays=asArrays)
+		except Exception,e:
+			print e
+			print 'problem reading the local archive'
+			return None
+		if(symList != None and len(symList) == 0):
+			print '\nno sym/asy data matched your conditions, returning None...'
+			return None
+		if(symList != None): print '\nreturning a list with',len(symList),'records of sym/asy data'
+		return symList
 			
-def readSymAsyWeb(sTime,eTime=None):
+def readSymAsyWeb(sTime,eTime=None,asArrays=False):
 	"""This function reads sym/asy data from the WDC kyoto website
 	
 	.. warning::
@@ -192,6 +215,7 @@ def readSymAsyWeb(sTime,eTime=None):
 	**Args**: 
 		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
 		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be equal 1 day after sTime.  This must not be more than 366 days after sTime.  default = None
+		* [**asArrays**] (bool): if this is True, return a :class:`gme.base.gmeBase.gmeArrays` instead of a list of objects.  default = False
 	**Example**:
 		::
 		
@@ -204,6 +228,7 @@ def readSymAsyWeb(sTime,eTime=None):
 	
 	import datetime as dt
 	import mechanize
+	from gme.base.colParse import iagaColumns, columnsToRecs, columnsToArrays
 	
 	assert(isinstance(sTime,dt.datetime)),'error, sTime must be a datetime object'
 	if(eTime == None): eTime = sTime+dt.timedelta(days=1)
@@ -249,15 +274,15 @@ def readSymAsyWeb(sTime,eTime=None):
 	#get the data file
 	lines = response.readlines()
 
-	symList = []
-	for l in lines:
-		#check for headers
-		if(l[0] == ' ' or l[0:4] == 'DATE'): continue
-		cols=l.split()
-		try: symList.append(symAsyRec(webLine=l))
-		except Exception,e:
-			print e
-			print 'problem initializing symAsy object'
+	#parse all of the lines at once, and make the objects from the columns
+	try: cols = iagaColumns(lines,['asyd','asyh','symd','symh'])
+	except Exception,e:
+		print e
+		print 'problem parsing the sym/asy data'
+		return None
+	if(len(cols['time']) == 0): return None
+	if(asArrays): return columnsToArrays(cols,symAsyRec,['asyd','asyh','symd','symh'])
+	symList = columnsToRecs(cols,symAsyRec,['asyd','asyh','symd','symh'])
 		
 	if(symList != []): return symList
 	else: return None
@@ -305,24 +330,10 @@ def mapSymAsyMongo(sYear,eYear=None):
 		#1 day at a time, to not fill up RAM
 		templist = readSymAsyWeb(dt.datetime(yr,1,1),dt.datetime(yr,1,1)+dt.timedelta(days=366))
 		if(templist == None): continue
-		for rec in templist:
-			#check if a duplicate record exists
-			qry = mongoData.find({'time':rec.time})
-			print rec.time
-			tempRec = rec.toDbDict()
-			cnt = qry.count()
-			#if this is a new record, insert it
-			if(cnt == 0): mongoData.insert(tempRec)
-			#if this is an existing record, update it
-			elif(cnt == 1):
-				print 'foundone!!'
-				dbDict = qry.next()
-				temp = dbDict['_id']
-				dbDict = tempRec
-				dbDict['_id'] = temp
-				mongoData.save(dbDict)
-			else:
-				print 'strange, there is more than 1 Sym/Asy record for',rec.time
+		#upsert the records on their natural key in bulk
+		t0 = dt.datetime.now()
+		nDocs = db.bulkUpsert(mongoData,(rec.toDbDict() for rec in templist),['time'],replace=True)
+		db.printRate('symasy '+str(yr),nDocs,t0)
 		del templist
 	
 
@@ -47,7 +47,7 @@ def plotGMI(gmiList,parameter=None,sTime=None,eTime=None,ymin=None,ymax=None,NoX
 	PURPOSE: plots ground magnetic indicies, including AE,SYMH,ASYMH, and DST.
 
 	INPUTS:
-                gmiList: gmiList object returned from ae.readAe(), symAsy.readSymAsy(), or dst.readDst()
+                gmiList: gmiList object returned from ae.readAe(), symAsy.readSymAsy(), or dst.readDst(), either a list or the gmeArrays returned with asArrays=True
                 [parameter]: List of parameters to plot. Valid values are
                   aeList:     ['ae','al','au','ao'] (Defaults to 'ae')
                   symAsyList: ['symh','symd','asymh','asymd'] (Defaults to 'symh')
@@ -73,25 +73,19 @@ def plotGMI(gmiList,parameter=None,sTime=None,eTime=None,ymin=None,ymax=None,NoX
 
 	"""
         
-        times = [gmiList[x].time for x in range(len(gmiList))]
-        dataSet = (gmiList[0]).dataSet
+        from gme.base.gmeBase import gmeArrays, recsToArrays
+
+        #plot from arrays, gathering them once if we were given a list
+        if not isinstance(gmiList,gmeArrays): gmiList = recsToArrays(gmiList)
+        if sTime != None or eTime != None: gmiList = gmiList.sliceTime(sTime,eTime)
+        times = gmiList.time.astype('datetime64[us]').astype(object)
+        dataSet = gmiList.dataSet
+        data  = dict((x,gmiList[x]) for x in gmiList.names)
         if dataSet == 'AE':
-          ae    = [gmiList[x].ae   for x in range(len(gmiList))]
-          al    = [gmiList[x].al   for x in range(len(gmiList))]
-          au    = [gmiList[x].au   for x in range(len(gmiList))]
-          ao    = [gmiList[x].ao   for x in range(len(gmiList))]
-          data  = {'ae': ae,'al':al,'au':au,'ao':ao}
           if parameter == None: parameter = ['ae']
         elif dataSet == 'Sym/Asy':
-          symh  = [gmiList[x].symh for x in range(len(gmiList))]
-          symd  = [gmiList[x].symd for x in range(len(gmiList))]
-          asyh  = [gmiList[x].asyh for x in range(len(gmiList))]
-          asyd  = [gmiList[x].asyd for x in range(len(gmiList))]
-          data  = {'symh':symh, 'symd':symd, 'asyh':asyh, 'asyd': asyd}
           if parameter == None: parameter = ['symh']
         elif dataSet == 'Dst':
-          dst   = [gmiList[x].dst  for x in range(len(gmiList))]
-          data  = {'dst':dst}
           if parameter == None: parameter = ['dst']
 
         parameter = get_iterable(parameter)
@@ -12,6 +12,8 @@
 **Functions**:
 	* :func:`readPoes`
 	* :func:`readPoesFtp`
+	* :func:`poesLineTime`
+	* :func:`parsePoesLines`
 	* :func:`mapPoesMongo`
 	* :func:`overlayPoesTed`
 """
@@ -175,7 +177,7 @@ class poesRec(gme.base.gmeBase.gmeData):
 		if(ftpLine != None): self.parseFtp(ftpLine,header)
 		if(dbDict != None): self.parseDb(dbDict)
 		
-def readPoes(sTime,eTime=None,satnum=None,folat=None,folon=None,ted=None,echar=None,pchar=None):
+def readPoes(sTime,eTime=None,satnum=None,folat=None,folon=None,ted=None,echar=None,pchar=None,asArrays=False):
 	"""This function reads poes data.  First, it will try to get it from the mongodb, and if it can't find it, it will look on the NOAA NGDC FTP server using :func:`readPoesFtp`.  The data are 16-second averages
 
 	**Args**: 
@@ -188,9 +190,10 @@ def readPoes(sTime,eTime=None,satnum=None,folat=None,folon=None,ted=None,echar=N
 		* [**ted**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with bze values in the range [a,b] will be returned.  default = None
 		* [**echar**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with bym values in the range [a,b] will be returned.  default = None
 		* [**pchar**] (list or None): if this is not None, it must be a 2-element list of numbers, [a,b].  In this case, only data with bzm values in the range [a,b] will be returned.  default = None
+		* [**asArrays**] (bool): if this is True, the data are returned as a :class:`gme.base.gmeBase.gmeArrays`, with an array per parameter, instead of a list of objects.  default = False
 		
 	**Returns**:
-		* **poesList** (list or None): if data is found, a list of :class:`poesRec` objects matching the input parameters is returned.  If no data is found, None is returned.
+		* **poesList** (list or None): if data is found, a list of :class:`poesRec` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If no data is found, None is returned.
 	**Example**:
 		::
 		
@@ -202,6 +205,7 @@ def readPoes(sTime,eTime=None,satnum=None,folat=None,folon=None,ted=None,echar=N
 	
 	import datetime as dt
 	import pydarn.sdio.dbUtils as db
+	from gme.base.gmeBase import recsToArrays
 	
 	#check all the inputs for validity
 	assert(isinstance(sTime,dt.datetime)), \
@@ -236,6 +240,11 @@ def readPoes(sTime,eTime=None,satnum=None,folat=None,folon=None,ted=None,echar=N
 	if(qryList != []): qry = poesData.find(qryDict)
 	else: qry = poesData.find()
 	if(qry.count() > 0):
+		#gather the documents straight into arrays, without making objects
+		if(asArrays):
+			poesArrs = recsToArrays(qry.sort('time'))
+			print '\nreturning arrays of',len(poesArrs),'records of poes data'
+			return poesArrs
 		poesList = []
 		for rec in qry.sort('time'):
 			poesList.append(poesRec(dbDict=rec))
@@ -257,7 +266,7 @@ def readPoes(sTime,eTime=None,satnum=None,folat=None,folon=None,ted=None,echar=N
 			#print '\n no data found on FTP server, returning None...'
 			#return None
 			
-def readPoesFtp(sTime,eTime=None):
+def readPoesFtp(sTime,eTime=None,asArrays=False,ftp=None):
 	"""This function reads poes data from the NOAA NGDC server via anonymous FTP connection.
 	
 	.. warning::
@@ -266,8 +275,10 @@ def readPoesFtp(sTime,eTime=None):
 	**Args**: 
 		* **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the earliest time you want data for
 		* [**eTime**] (`datetime <http://tinyurl.com/bl352yx>`_ or None): the latest time you want data for.  if this is None, eTime will be equal 1 day after sTime.  default = None
+		* [**asArrays**] (bool): if this is True, return a :class:`gme.base.gmeBase.gmeArrays`, with a satnum array and sorted by time, instead of a list of objects.  default = False
+		* [**ftp**] (`ftplib.FTP <http://docs.python.org/2/library/ftplib.html>`_ or None): a logged in connection to use instead of connecting to the NOAA server, eg to a local mirror.  default = None
 	**Returns**:
-		* **poesList** (list or None): if data is found, a list of :class:`poesRec` objects matching the input parameters is returned.  If no data is found, None is returned.
+		* **poesList** (list or None): if data is found, a list of :class:`poesRec` objects matching the input parameters is returned, or a :class:`gme.base.gmeBase.gmeArrays` if asArrays is True.  If no data is found, None is returned.
 	**Example**:
 		::
 		
@@ -279,25 +290,30 @@ def readPoesFtp(sTime,eTime=None):
 	
 	from ftplib import FTP
 	import datetime as dt
+	import numpy as np
+	from gme.base.colParse import columnsToRecs, columnsToArrays
+	from gme.base.gmeBase import concatArrays
+	from gme.base.ftpStream import retrRange
 	
 	assert(isinstance(sTime,dt.datetime)),'error, sTime must be datetime'
 	if(eTime == None): eTime=sTime+dt.timedelta(days=1)
 	assert(isinstance(eTime,dt.datetime)),'error, eTime must be datetime'
 	assert(eTime >= sTime), 'error, end time greater than start time'
 	
-	#connect to the server
-	try: ftp = FTP('satdat.ngdc.noaa.gov')	
-	except Exception,e:
-		print e
-		print 'problem connecting to NOAA server'
-		return None
-		
-	#login as anonymous
-	try: l=ftp.login()
-	except Exception,e:
-		print e
-		print 'problem logging in to NOAA server'
-		return None
+	if(ftp == None):
+		#connect to the server
+		try: ftp = FTP('satdat.ngdc.noaa.gov')	
+		except Exception,e:
+			print e
+			print 'problem connecting to NOAA server'
+			return None
+			
+		#login as anonymous
+		try: l=ftp.login()
+		except Exception,e:
+			print e
+			print 'problem logging in to NOAA server'
+			return None
 		
 	myPoes = []
 	#get the poes data
@@ -322,25 +338,83 @@ def readPoesFtp(sTime,eTime=None):
 			print 'poes: RETR '+fname
 			#list to hold the lines
 			lines = []
-			#get the data
-			try: ftp.retrlines('RETR '+fname,lines.append)
+			#get the data in the time range, with the header line
+			try:
+				head,lines = retrRange(ftp,fname,poesLineTime,sTime,eTime,fileStart=myTime, \
+					fileEnd=myTime+dt.timedelta(days=1),header=1)
+				lines = head+lines
 			except Exception,e:
 				print e
 				print 'error retrieving',fname
 				
 			#convert the ascii lines into a list of poesRec objects
-			#skip first (header) line
-			for line in lines[1:]:
-				cols = line.split()
-				t = dt.datetime(int(cols[0]), int(cols[1]), int(cols[2]), int(cols[3]),int(cols[4]))
-				if(sTime <= t <= eTime):
-					myPoes.append(poesRec(ftpLine=line,satnum=int(satnum),header=lines[0]))
+			if(len(lines) < 2): continue
+			try: cols = parsePoesLines(lines)
+			except Exception,e:
+				print e
+				print 'problem parsing',fname
+				continue
+			inRange = (cols['time'] >= np.datetime64(sTime)) & (cols['time'] <= np.datetime64(eTime))
+			names = [x for x in cols.iterkeys() if x != 'time']
+			if(asArrays):
+				cols['satnum'] = np.zeros(len(cols['time']),dtype=np.int64)+int(satnum)
+				myPoes.append(columnsToArrays(cols,poesRec,names+['satnum'],mask=inRange))
+			else:
+				myPoes.extend(columnsToRecs(cols,lambda: poesRec(satnum=int(satnum)),names,mask=inRange))
 				
 		#increment myTime
 		myTime += dt.timedelta(days=1)
 	
+	#the files are per satellite, so put the records from all of them in
+	#time order
+	if(asArrays):
+		myPoes = concatArrays(myPoes)
+		if(myPoes == None or len(myPoes) == 0): return None
+		return myPoes[np.argsort(myPoes.time,kind='mergesort')]
 	if(len(myPoes) > 0): return myPoes
 	else: return None
+
+def poesLineTime(line):
+	"""This function reads the time of a line of a NOAA NGDC poes file, without parsing the rest of it.
+	
+	**Args**: 
+		* **line** (str): an ASCII data line from the FTP server
+	**Returns**:
+		* **time** (`datetime <http://tinyurl.com/bl352yx>`_): the time of the record
+	**Example**:
+		::
+		
+			t = gme.sat.poesLineTime(line)
+		
+	"""
+	import datetime as dt
+	cols = line.split(None,6)
+	return dt.datetime(int(cols[0]),int(cols[1]),int(cols[2]),int(cols[3]),int(cols[4]))+dt.timedelta(seconds=float(cols[5]))
+
+def parsePoesLines(lines):
+	"""This function parses the lines of a NOAA NGDC poes file all at once into numpy columns.  The first line is the header, which names the columns.  Values of -999 are NaN.
+	
+	**Args**: 
+		* **lines** (list): the ASCII lines from the FTP server, including the header
+	**Returns**:
+		* **cols** (dict): the columns, with a datetime64 time and a float array for each :class:`poesRec` member in the file
+	**Example**:
+		::
+		
+			cols = gme.sat.parsePoesLines(lines)
+		
+	"""
+	from gme.base.colParse import splitColumns, makeTimes
+	
+	head = lines[0].split()
+	names = [x for x in poesRec().__dict__.iterkeys() if x not in ['dataSet','info','satnum','time'] and x in head]
+	spec = [(x,i,'f',None) for x,i in zip(['year','month','day','hour','minute','second'],range(6))]
+	spec += [(x,head.index(x),'f',-999.) for x in names]
+	lines = [l for l in lines[1:] if(l.strip() != '')]
+	cols = splitColumns(lines,spec)
+	cols['time'] = makeTimes(cols.pop('year'),month=cols.pop('month'),day=cols.pop('day'), \
+		hour=cols.pop('hour'),minute=cols.pop('minute'),second=cols.pop('second'))
+	return cols
 	
 
 def mapPoesMongo(sYear,eYear=None):
@@ -376,6 +450,7 @@ def mapPoesMongo(sYear,eYear=None):
 	
 	#set up all of the indices
 	mongoData.ensure_index('time')
+	mongoData.ensure_index([('time',1),('satnum',1)])
 	mongoData.ensure_index('satnum')
 	mongoData.ensure_index('folat')
 	mongoData.ensure_index('folon')
@@ -389,24 +464,10 @@ def mapPoesMongo(sYear,eYear=None):
 		#10 day at a time, to not fill up RAM
 		templist = readPoesFtp(myTime,myTime+dt.timedelta(days=10))
 		if(templist == None): continue
-		for rec in templist:
-			#check if a duplicate record exists
-			qry = mongoData.find({'$and':[{'time':rec.time},{'satnum':rec.satnum}]})
-			print rec.time, rec.satnum
-			tempRec = rec.toDbDict()
-			cnt = qry.count()
-			#if this is a new record, insert it
-			if(cnt == 0): mongoData.insert(tempRec)
-			#if this is an existing record, update it
-			elif(cnt == 1):
-				print 'foundone!!'
-				dbDict = qry.next()
-				temp = dbDict['_id']
-				dbDict = tempRec
-				dbDict['_id'] = temp
-				mongoData.save(dbDict)
-			else:
-				print 'strange, there is more than 1 record for',rec.time
+		#upsert the records on their natural key in bulk
+		t0 = dt.datetime.now()
+		nDocs = db.bulkUpsert(mongoData,(rec.toDbDict() for rec in templist),['time','satnum'],replace=True)
+		db.printRate('poes '+str(myTime.date()),nDocs,t0)
 		del templist
 		myTime += dt.timedelta(days=10)
 		
@@ -4,8 +4,22 @@
 *********************
 **Module**: models.aacgm
 *********************
+
+**Modules**:
+    * :mod:`models.aacgm.aacgmArrays`: conversions of whole numpy arrays
+    * :mod:`models.aacgm.aacgmGrid`: fast conversions by interpolation
 """
 try:
     from aacgmlib import *
 except Exception, e:
     print __file__+' -> aacgmlib: ', e
+
+try:
+    from aacgmArrays import *
+except Exception, e:
+    print __file__+' -> aacgmArrays: ', e
+
+try:
+    from aacgmGrid import *
+except Exception, e:
+    print __file__+' -> aacgmGrid: ', e
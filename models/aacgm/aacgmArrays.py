@@ -0,0 +1,98 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""
+*********************
+**Module**: models.aacgm.aacgmArrays
+*********************
+AACGM conversions of whole numpy arrays. The arrays are handed to the C
+library through the buffer protocol, so float64 arrays that are already
+contiguous are read in place, and the results are written straight into
+new arrays, without building a python float per point. The GIL is released
+while converting, so other threads keep running.
+
+The inputs are broadcast against each other like numpy arithmetic, and the
+outputs have the broadcast shape.
+
+**Functions**:
+    * :func:`aacgmConvArray`: convert arrays to/from AACGM coordinates
+    * :func:`mltFromEpochArray`: calculate MLT for arrays of times and mag lons
+"""
+
+# *************************************************************
+def _fullArray(x, shape):
+    """x as a contiguous float64 array of the given shape, copied only if it is not one already"""
+    import numpy as np
+
+    x = np.asarray(x, dtype=np.float64)
+    if x.shape != shape: x = np.broadcast_to(x, shape)
+    return np.ascontiguousarray(x)
+
+
+# *************************************************************
+def _oneOrFull(x, shape):
+    """x as a contiguous float64 array, of 1 element if it is a single value so that the C code reuses it"""
+    import numpy as np
+
+    x = np.asarray(x, dtype=np.float64)
+    if x.size == 1: return x.reshape(1)
+    return _fullArray(x, shape)
+
+
+# *************************************************************
+def aacgmConvArray(lat, lon, height, flg, mode='exact'):
+    """Convert arrays of positions to or from AACGM coordinates
+
+    **Args**:
+        * **lat**: latitudes [degree] (scalar, list or ndarray)
+        * **lon**: longitudes [degree] (scalar, list or ndarray)
+        * **height**: altitudes [km] (scalar, list or ndarray)
+        * **flg**: 0 for geographic to AACGM, 1 for AACGM to geographic
+        * **[mode]**: 'exact' to evaluate AACGM at every point, or 'fast' to interpolate in a precomputed grid,
+          see :mod:`models.aacgm.aacgmGrid`. default = 'exact'
+    **Returns**:
+        * **lat**: converted latitudes [degree] (ndarray)
+        * **lon**: converted longitudes [degree] (ndarray)
+        * **r**: geocentric distance [Re] (ndarray)
+
+        Points that cannot be converted (eg near the magnetic equator) are NaN.
+    **Example**:
+        ::
+
+            mlat, mlon, r = aacgmConvArray(myFov.latCenter, myFov.lonCenter, 300., 0)
+    """
+    import numpy as np
+    from aacgmlib import aacgmConvBuf
+
+    assert mode in ['exact', 'fast'], "aacgmConvArray: mode must be 'exact' or 'fast'"
+    if mode == 'fast':
+        from aacgmGrid import aacgmConvFast
+        return aacgmConvFast(lat, lon, height, flg)
+
+    shape = np.broadcast(np.asarray(lat), np.asarray(lon), np.asarray(height)).shape
+    outLat, outLon, r = np.empty(shape), np.empty(shape), np.empty(shape)
+    aacgmConvBuf(_fullArray(lat, shape), _fullArray(lon, shape), _oneOrFull(height, shape), \
+        outLat, outLon, r, flg)
+    return outLat, outLon, r
+
+
+# *************************************************************
+def mltFromEpochArray(epoch, mLon):
+    """Calculate magnetic local time for arrays of times and magnetic longitudes
+
+    **Args**:
+        * **epoch**: times [seconds since 1970-01-01] (scalar, list or ndarray)
+        * **mLon**: AACGM longitudes [degree] (scalar, list or ndarray)
+    **Returns**:
+        * **mlt**: magnetic local times [hour] (ndarray)
+    **Example**:
+        ::
+
+            mlt = mltFromEpochArray(utils.timeUtils.datetimeToEpoch(myBeam.time), mlons)
+    """
+    import numpy as np
+    from aacgmlib import mltFromEpochBuf
+
+    shape = np.broadcast(np.asarray(epoch), np.asarray(mLon)).shape
+    mlt = np.empty(shape)
+    mltFromEpochBuf(_oneOrFull(epoch, shape), _oneOrFull(mLon, shape), mlt)
+    return mlt
@@ -0,0 +1,363 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""
+*********************
+**Module**: models.aacgm.aacgmGrid
+*********************
+A fast, approximate path for bulk AACGM conversions, for when millions of
+points have to be converted. The exact routine is run once per altitude and
+direction on a grid of gridStep degrees in latitude and longitude, and
+points are then converted by bilinear interpolation between the grid nodes.
+The positions are interpolated as unit vectors, so there is no seam at the
+date line or at the poles.
+
+When a grid is built, the interpolation is checked against the exact
+routine at the center and the edge midpoints of every grid cell, which is
+where bilinear interpolation is least accurate. A cell that misses by more
+than gridMaxErr degrees (great circle), or that touches a point the exact
+routine cannot convert (near the magnetic equator), is flagged, and the
+points that fall in it are converted exactly instead. With the defaults,
+fast conversions are within 0.01 degree (about 1 km) of the exact ones at
+every checked point. :func:`validateGrid` measures the error at random
+points.
+
+The grids are kept in memory, and saved as .npz files in gridCacheDir if it
+is set. The file names include a fingerprint of the exact conversion of a few
+fixed points, so a grid is rebuilt if the library's AACGM coefficients change.
+
+**Classes**:
+    * :class:`aacgmGrid`: an interpolation grid for one altitude and direction
+
+**Functions**:
+    * :func:`aacgmConvFast`: convert arrays by interpolation
+    * :func:`getGrid`: get the grid of an altitude and direction
+    * :func:`clearGridCache`: empty the in-memory grid cache
+    * :func:`validateGrid`: report the error of a grid against the exact routine
+"""
+
+# Grid spacing [degree]
+gridStep = 0.5
+# Largest interpolation error allowed in a grid cell [degree]
+gridMaxErr = 0.01
+# Directory where grids are saved (None to keep them in memory only)
+gridCacheDir = None
+
+# The in-memory cache, by (height, flg, step)
+_gridCache = {}
+
+# The points converted to fingerprint the AACGM coefficients
+_printLats = [45., 60., -70., 80.]
+_printLons = [0., 100., 200., 300.]
+
+
+# *************************************************************
+class aacgmGrid(object):
+    """An interpolation grid of AACGM conversions for one altitude and direction
+
+    **Members**:
+        * **height** (float): altitude [km]
+        * **flg** (int): 0 for geographic to AACGM, 1 for AACGM to geographic
+        * **step** (float): grid spacing [degree]
+        * **xyz** (ndarray(nLat,nLon+1,3)): converted positions of the nodes, as unit vectors
+        * **r** (ndarray(nLat,nLon+1)): geocentric distance of the nodes [Re]
+        * **bad** (ndarray(nLat-1,nLon)): cells converted exactly instead of interpolated
+        * **maxErr** (float): largest error at the checked points of the cells that are used [degree]
+
+    The nodes are at latitudes -90 to 90 and longitudes 0 to 360, both every step degrees.
+    """
+
+    def __init__(self, height, flg, step):
+        """Builds a grid with the exact routine
+
+        **Args**:
+            * **height** (float): altitude [km]
+            * **flg** (int): 0 for geographic to AACGM, 1 for AACGM to geographic
+            * **step** (float): grid spacing [degree], must divide 180
+        """
+        import numpy as np
+        from aacgmArrays import aacgmConvArray
+
+        nLat, nLon = int(round(180./step))+1, int(round(360./step))
+        assert abs((nLat-1)*step-180.) < 1e-9, 'aacgmGrid: step must divide 180'
+        self.height, self.flg, self.step = float(height), int(flg), float(step)
+
+        # Convert a grid of half the spacing: the even points are the nodes, and the
+        # others are the centers and edge midpoints of the cells, to check the interpolation
+        lat = np.linspace(-90., 90., 2*nLat-1)
+        lon = np.linspace(0., 360., 2*nLon+1)
+        fLat, fLon, fR = aacgmConvArray(lat[:,np.newaxis], lon[np.newaxis,:], height, flg)
+        fine = _toXyz(fLat, fLon)
+        self.xyz = fine[::2,::2]
+        self.r = fR[::2,::2]
+
+        # Interpolation error at the center and edge midpoints of each cell
+        n = self.xyz
+        probes = [ \
+            (fine[1::2,1::2], n[:-1,:-1]+n[:-1,1:]+n[1:,:-1]+n[1:,1:]), \
+            (fine[:-1:2,1::2], n[:-1,:-1]+n[:-1,1:]), \
+            (fine[2::2,1::2], n[1:,:-1]+n[1:,1:]), \
+            (fine[1::2,:-1:2], n[:-1,:-1]+n[1:,:-1]), \
+            (fine[1::2,2::2], n[:-1,1:]+n[1:,1:])]
+        cellErr = np.zeros((nLat-1, nLon))
+        with np.errstate(invalid='ignore'):
+            for exact, interp in probes:
+                err = _angle(exact, _normalize(interp))
+                cellErr = np.fmax(cellErr, np.where(np.isnan(err), np.inf, err))
+        # Cells that touch a node that cannot be converted
+        nodeBad = np.isnan(n).any(axis=-1)
+        cellErr[nodeBad[:-1,:-1] | nodeBad[:-1,1:] | nodeBad[1:,:-1] | nodeBad[1:,1:]] = np.inf
+
+        self.bad = ~(cellErr <= gridMaxErr)
+        self.maxErr = cellErr[~self.bad].max() if (~self.bad).any() else np.nan
+
+    def __str__(self):
+        return 'height: {} km, flg: {}, step: {} deg, cells interpolated: {:.1f}%, max error: {:.2e} deg'.format( \
+            self.height, self.flg, self.step, 100.*(1.-self.bad.mean()), self.maxErr)
+
+    def convert(self, lat, lon):
+        """Converts positions by interpolation
+
+        **Belongs to**: :class:`aacgmGrid`
+
+        **Args**:
+            * **lat**: latitudes [degree] (ndarray)
+            * **lon**: longitudes [degree] (ndarray of the same shape)
+        **Returns**:
+            * **lat**: converted latitudes [degree] (ndarray)
+            * **lon**: converted longitudes [degree] (ndarray)
+            * **r**: geocentric distance [Re] (ndarray)
+            * **bad**: True where the point is in a flagged cell, or is not finite (ndarray)
+        """
+        import numpy as np
+
+        nRows, nCols = self.bad.shape
+        shape = np.shape(lat)
+        lat, lon = np.asarray(lat, dtype=np.float64).ravel(), np.asarray(lon, dtype=np.float64).ravel()
+        # Fractional row and column of each point in the grid
+        with np.errstate(invalid='ignore'):
+            fi = (lat + 90.)/self.step
+            fj = np.mod(lon, 360.)/self.step
+            bad = ~((fi >= 0) & (fi <= nRows) & np.isfinite(fj))
+        fi[bad], fj[bad] = 0., 0.
+        i = np.minimum(fi.astype(int), nRows-1)
+        j = np.minimum(fj.astype(int), nCols-1)
+        fi -= i
+        fj -= j
+        bad |= np.take(self.bad.ravel(), i*nCols + j)
+
+        # Interpolate along the longitude then the latitude, on the flattened node arrays
+        k = i*(nCols+1) + j
+        kUp = k + nCols + 1
+        out = []
+        for node in [self.xyz[...,0], self.xyz[...,1], self.xyz[...,2], self.r]:
+            node = node.ravel()
+            lo = np.take(node, k)
+            lo += fj*(np.take(node, k+1) - lo)
+            hi = np.take(node, kUp)
+            hi += fj*(np.take(node, kUp+1) - hi)
+            lo += fi*(hi - lo)
+            out.append(lo)
+        x, y, z, r = out
+        # The interpolated vectors are a little shorter than unit length, which does not change their direction
+        outLat = np.degrees(np.arctan2(z, np.hypot(x, y)))
+        outLon = np.degrees(np.arctan2(y, x))
+        return outLat.reshape(shape), outLon.reshape(shape), r.reshape(shape), bad.reshape(shape)
+
+
+# *************************************************************
+def _toXyz(lat, lon):
+    """unit vectors of positions, stacked on the last axis"""
+    import numpy as np
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat)*np.cos(lon), np.cos(lat)*np.sin(lon), np.sin(lat)], axis=-1)
+
+
+# *************************************************************
+def _fromXyz(xyz):
+    """latitudes and longitudes [degree] of unit vectors"""
+    import numpy as np
+    return np.degrees(np.arcsin(np.clip(xyz[...,2], -1., 1.))), np.degrees(np.arctan2(xyz[...,1], xyz[...,0]))
+
+
+# *************************************************************
+def _normalize(xyz):
+    """vectors scaled to unit length"""
+    import numpy as np
+    return xyz/np.sqrt((xyz**2).sum(axis=-1))[...,np.newaxis]
+
+
+# *************************************************************
+def _angle(a, b):
+    """great circle angle between unit vectors [degree], accurate for small angles"""
+    import numpy as np
+    return np.degrees(2.*np.arcsin(np.clip(np.sqrt(((a-b)**2).sum(axis=-1))/2., 0., 1.)))
+
+
+# *************************************************************
+def _fingerprint(height, flg):
+    """a short hash of the exact conversion of a few fixed points"""
+    import hashlib
+    import numpy as np
+    from aacgmArrays import aacgmConvArray
+
+    out = aacgmConvArray(_printLats, _printLons, height, flg)
+    return hashlib.sha1(np.round(np.array(out), 6).tobytes()).hexdigest()[:12]
+
+
+# *************************************************************
+def getGrid(height, flg, step=None):
+    """Gets the interpolation grid of an altitude and direction, building it if it is not cached
+
+    **Args**:
+        * **height** (float): altitude [km]
+        * **flg** (int): 0 for geographic to AACGM, 1 for AACGM to geographic
+        * **[step]** (float): grid spacing [degree]. default = gridStep
+    **Returns**:
+        * **grid** (:class:`aacgmGrid`)
+    **Example**:
+        ::
+
+            print getGrid(300., 0)
+    """
+    import os
+    import numpy as np
+
+    if step == None: step = gridStep
+    key = (float(height), int(flg), float(step))
+    if key in _gridCache: return _gridCache[key]
+
+    grid, fname = None, None
+    if gridCacheDir:
+        fname = os.path.join(gridCacheDir, 'aacgmGrid_{:g}km_{}_{:g}deg_{}.npz'.format( \
+            height, flg, step, _fingerprint(height, flg)))
+        if os.path.exists(fname):
+            try:
+                with np.load(fname) as data:
+                    grid = aacgmGrid.__new__(aacgmGrid)
+                    grid.height, grid.flg, grid.step = key
+                    for name in ['xyz', 'r', 'bad']: setattr(grid, name, data[name])
+                    grid.maxErr = float(data['maxErr'])
+            except Exception, e:
+                print 'getGrid: could not read {}: {}'.format(fname, e)
+                grid = None
+    if grid is None:
+        grid = aacgmGrid(height, flg, step)
+        if fname: _saveGrid(grid, fname)
+    _gridCache[key] = grid
+    return grid
+
+
+# *************************************************************
+def _saveGrid(grid, fname):
+    """writes a grid to a temporary file and renames it, so that other processes never see a partial file"""
+    import os, tempfile
+    import numpy as np
+
+    tmp = None
+    try:
+        if not os.path.isdir(os.path.dirname(fname)): os.makedirs(os.path.dirname(fname))
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(fname))
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, xyz=grid.xyz, r=grid.r, bad=grid.bad, maxErr=grid.maxErr)
+        os.rename(tmp, fname)
+    except Exception, e:
+        print 'getGrid: could not save {}: {}'.format(fname, e)
+        if tmp and os.path.exists(tmp): os.remove(tmp)
+
+
+# *************************************************************
+def clearGridCache():
+    """Empties the in-memory grid cache. The files in gridCacheDir are left alone."""
+    _gridCache.clear()
+
+
+# *************************************************************
+def aacgmConvFast(lat, lon, height, flg):
+    """Convert arrays of positions to or from AACGM coordinates by interpolating in a precomputed grid.
+    The arguments and results are those of :func:`aacgmConvArray`. Points in grid cells where the
+    interpolation is not accurate enough are converted with the exact routine, so the results are within
+    gridMaxErr degrees of it. A grid is built per distinct height, so the height should take few values.
+
+    **Args**:
+        * **lat**: latitudes [degree] (scalar, list or ndarray)
+        * **lon**: longitudes [degree] (scalar, list or ndarray)
+        * **height**: altitudes [km] (scalar, list or ndarray)
+        * **flg**: 0 for geographic to AACGM, 1 for AACGM to geographic
+    **Returns**:
+        * **lat**: converted latitudes [degree] (ndarray)
+        * **lon**: converted longitudes [degree] (ndarray)
+        * **r**: geocentric distance [Re] (ndarray)
+    **Example**:
+        ::
+
+            mlat, mlon, r = aacgmConvFast(lats, lons, 300., 0)
+    """
+    import numpy as np
+    from aacgmArrays import aacgmConvArray
+
+    height = np.asarray(height, dtype=np.float64)
+    lat, lon, heights = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in [lat, lon, height]])
+    if height.size == 1 and np.isfinite(height).all():
+        # One grid for all the points
+        outLat, outLon, r, exact = getGrid(height.ravel()[0], flg).convert(lat, lon)
+    else:
+        outLat, outLon, r = np.empty(lat.shape), np.empty(lat.shape), np.empty(lat.shape)
+        exact = ~np.isfinite(heights)
+        for h in np.unique(height[np.isfinite(height)]):
+            sel = heights == h
+            outLat[sel], outLon[sel], r[sel], exact[sel] = getGrid(h, flg).convert(lat[sel], lon[sel])
+    if exact.any():
+        outLat[exact], outLon[exact], r[exact] = aacgmConvArray(lat[exact], lon[exact], heights[exact], flg)
+    return outLat, outLon, r
+
+
+# *************************************************************
+def validateGrid(height=300., flg=0, nPts=200000, seed=0):
+    """Reports the error of fast conversions against the exact routine, at random points spread evenly over
+    the sphere, overall and per 10 degree latitude band.
+
+    **Args**:
+        * **[height]** (float): altitude [km]. default = 300
+        * **[flg]** (int): 0 for geographic to AACGM, 1 for AACGM to geographic. default = 0
+        * **[nPts]** (int): number of random points. default = 200000
+        * **[seed]** (int): seed of the random points. default = 0
+    **Returns**:
+        * **report** (dict): with the keys
+            * **grid** (str): a description of the grid, with its error at the checked points
+            * **maxErr** (float): largest error [degree]
+            * **p999Err** (float): 99.9th percentile of the error [degree]
+            * **exactFrac** (float): fraction of the points converted exactly
+            * **bands** (list): (band start latitude, max error, fraction exact) per latitude band
+    **Example**:
+        ::
+
+            report = validateGrid(300., 0)
+    """
+    import numpy as np
+    from aacgmArrays import aacgmConvArray
+
+    rs = np.random.RandomState(seed)
+    lat = np.degrees(np.arcsin(rs.uniform(-1., 1., nPts)))
+    lon = rs.uniform(0., 360., nPts)
+    grid = getGrid(height, flg)
+
+    eLat, eLon, _ = aacgmConvArray(lat, lon, height, flg)
+    fLat, fLon, _ = aacgmConvFast(lat, lon, height, flg)
+    _, _, _, exact = grid.convert(lat, lon)
+    # Points the exact routine cannot convert are left out
+    ok = np.isfinite(eLat)
+    err = _angle(_toXyz(eLat[ok], eLon[ok]), _toXyz(fLat[ok], fLon[ok]))
+    lat, exact = lat[ok], exact[ok]
+
+    report = {'grid': str(grid), 'maxErr': err.max(), 'p999Err': np.percentile(err, 99.9), \
+        'exactFrac': exact.mean(), 'bands': []}
+    print 'grid: '+report['grid']
+    print '{:>10s} {:>10s} {:>10s}'.format('lat band', 'max err', 'exact')
+    for b in range(-90, 90, 10):
+        sel = (lat >= b) & (lat < b+10)
+        if not sel.any(): continue
+        report['bands'].append((b, err[sel].max(), exact[sel].mean()))
+        print '{:>10d} {:>10.2e} {:>9.1f}%'.format(b, err[sel].max(), 100.*exact[sel].mean())
+    print 'max error {:.2e} deg, 99.9% below {:.2e} deg, {:.1f}% of points exact'.format( \
+        report['maxErr'], report['p999Err'], 100.*report['exactFrac'])
+    return report
@@ -82,6 +82,91 @@ aacgm_arr_wrap(PyObject *self, PyObject *args)
 	
 }
  
+/* get a C contiguous float64 buffer of an object (eg a numpy array)
+without copying it.  returns the number of
+elements, or -1 with an exception set */
+static Py_ssize_t
+getDoubleBuffer(PyObject *obj, Py_buffer *view, int writable, const char *name)
+{
+	const char *fmt;
+	int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+	
+	if(writable) flags |= PyBUF_WRITABLE;
+	if(PyObject_GetBuffer(obj, view, flags) < 0) return -1;
+	/* a format of "d", with an optional native/little endian byte order character */
+	fmt = view->format;
+	if(fmt != NULL && (fmt[0] == '@' || fmt[0] == '=' || fmt[0] == '<')) fmt++;
+	if(view->itemsize != sizeof(double) || (fmt != NULL && strcmp(fmt, "d") != 0))
+	{
+		PyErr_Format(PyExc_TypeError, "%s must be a contiguous float64 array", name);
+		PyBuffer_Release(view);
+		return -1;
+	}
+	return view->len/view->itemsize;
+}
+
+static PyObject *
+aacgm_buf_wrap(PyObject *self, PyObject *args)
+{
+	
+	PyObject *latObj, *lonObj, *heightObj, *outLatObj, *outLonObj, *outRObj;
+	Py_buffer bufs[6];
+	double *inlat, *inlon, *height, *outLat, *outLon, *r;
+	int flg, nBufs = 0;
+	Py_ssize_t nElem, nHeight, i, nBad = 0;
+	
+	if(!PyArg_ParseTuple(args, "OOOOOOi", &latObj,&lonObj,&heightObj,&outLatObj,&outLonObj,&outRObj,&flg))
+		return NULL;
+	
+	/* the inputs are read and the outputs written in place, so every one
+	must have nElem elements, except the height, which can have 1 */
+	if((nElem = getDoubleBuffer(latObj, &bufs[nBufs], 0, "lat")) < 0) goto fail;
+	nBufs++;
+	if(getDoubleBuffer(lonObj, &bufs[nBufs], 0, "lon") != nElem) goto sizeFail;
+	nBufs++;
+	nHeight = getDoubleBuffer(heightObj, &bufs[nBufs], 0, "height");
+	if(nHeight != nElem && nHeight != 1) goto sizeFail;
+	nBufs++;
+	if(getDoubleBuffer(outLatObj, &bufs[nBufs], 1, "outLat") != nElem) goto sizeFail;
+	nBufs++;
+	if(getDoubleBuffer(outLonObj, &bufs[nBufs], 1, "outLon") != nElem) goto sizeFail;
+	nBufs++;
+	if(getDoubleBuffer(outRObj, &bufs[nBufs], 1, "outR") != nElem) goto sizeFail;
+	nBufs++;
+	
+	inlat = (double *)bufs[0].buf;
+	inlon = (double *)bufs[1].buf;
+	height = (double *)bufs[2].buf;
+	outLat = (double *)bufs[3].buf;
+	outLon = (double *)bufs[4].buf;
+	r = (double *)bufs[5].buf;
+	
+	/* no python objects are touched while converting, so other threads can run */
+	Py_BEGIN_ALLOW_THREADS
+	for (i=0; i<nElem; i++) {
+		if(AACGMConvert(inlat[i], fmod(inlon[i], 360.), height[nHeight == 1 ? 0 : i], 
+				&outLat[i], &outLon[i], &r[i], flg) != 0) {
+			/* this point cannot be converted, eg near the magnetic equator */
+			outLat[i] = outLon[i] = r[i] = NAN;
+			nBad++;
+		}
+	}
+	Py_END_ALLOW_THREADS
+	
+	for (i=0; i<nBufs; i++) PyBuffer_Release(&bufs[i]);
+	return PyInt_FromSsize_t(nBad);
+	
+sizeFail:
+	/* a buffer of the wrong size is still held, unless getting it failed */
+	if(!PyErr_Occurred()) {
+		PyBuffer_Release(&bufs[nBufs]);
+		PyErr_SetString(PyExc_ValueError, "aacgmConvBuf: the arrays must all have the same number of elements");
+	}
+fail:
+	for (i=0; i<nBufs; i++) PyBuffer_Release(&bufs[i]);
+	return NULL;
+}
+
 static PyObject *
 MLTConvertYMDHMS_wrap(PyObject *self, PyObject *args)
 {
@@ -113,6 +198,48 @@ MLTConvertEpoch_wrap(PyObject *self, PyObject *args)
 	
 }
 
+static PyObject *
+MLTConvertEpochBuf_wrap(PyObject *self, PyObject *args)
+{
+	PyObject *epochObj, *mLonObj, *outObj;
+	Py_buffer bufs[3];
+	double *epoch, *mLon, *mlt;
+	int nBufs = 0;
+	Py_ssize_t nEpoch, nLon, nElem, i;
+	
+	if(!PyArg_ParseTuple(args, "OOO", &epochObj,&mLonObj,&outObj))
+		return NULL;
+	
+	/* the epochs and the mag lons either have nElem elements or 1, which is used for all */
+	if((nEpoch = getDoubleBuffer(epochObj, &bufs[nBufs], 0, "epoch")) < 0) goto fail;
+	nBufs++;
+	if((nLon = getDoubleBuffer(mLonObj, &bufs[nBufs], 0, "mLon")) < 0) goto fail;
+	nBufs++;
+	if((nElem = getDoubleBuffer(outObj, &bufs[nBufs], 1, "out")) < 0) goto fail;
+	nBufs++;
+	if((nEpoch != nElem && nEpoch != 1) || (nLon != nElem && nLon != 1))
+	{
+		PyErr_SetString(PyExc_ValueError, "mltFromEpochBuf: epoch and mLon must have 1 element or as many as out");
+		goto fail;
+	}
+	
+	epoch = (double *)bufs[0].buf;
+	mLon = (double *)bufs[1].buf;
+	mlt = (double *)bufs[2].buf;
+	
+	Py_BEGIN_ALLOW_THREADS
+	for (i=0; i<nElem; i++)
+		mlt[i] = MLTConvertEpoch(epoch[nEpoch == 1 ? 0 : i], mLon[nLon == 1 ? 0 : i]);
+	Py_END_ALLOW_THREADS
+	
+	for (i=0; i<nBufs; i++) PyBuffer_Release(&bufs[i]);
+	Py_RETURN_NONE;
+	
+fail:
+	for (i=0; i<nBufs; i++) PyBuffer_Release(&bufs[i]);
+	return NULL;
+}
+
 static PyObject *
 MLTConvertYrsec_wrap(PyObject *self, PyObject *args)
 {
@@ -212,7 +339,9 @@ static PyMethodDef aacgmMethods[] =
 {
 	{"aacgmConv",  aacgm_wrap, METH_VARARGS, "convert to aacgm coords\nformat: lat, lon, alt = aacgmConv(inLat, inLon, height, flg)\nheight in km; flg=0: geo to aacgm; flg=1: aacgm to geo"},
 	{"aacgmConvArr",  aacgm_arr_wrap, METH_VARARGS, "convert to aacgm coords when inputs are lists\nformat: lat, lon, alt = aacgmConvArr(inLat, inLon, height, flg)\nflg=0: geo to aacgm, flg=1: aacgm to geo"},
+	{"aacgmConvBuf",  aacgm_buf_wrap, METH_VARARGS, "convert to aacgm coords in place when inputs are contiguous float64 arrays\nformat: nBad = aacgmConvBuf(inLat, inLon, height, outLat, outLon, outR, flg)\nheight can have 1 element; points that cannot be converted are set to NaN and counted in nBad\nflg=0: geo to aacgm, flg=1: aacgm to geo"},
  	{"mltFromEpoch",  MLTConvertEpoch_wrap, METH_VARARGS, "calculate mlt from epoch time and mag lon\nformat:mlt=mltFromEpoch(epoch,mLon)"},
+	{"mltFromEpochBuf",  MLTConvertEpochBuf_wrap, METH_VARARGS, "calculate mlt in place when inputs are contiguous float64 arrays\nformat:mltFromEpochBuf(epoch,mLon,outMlt)\nepoch and mLon can have 1 element"},
 	{"mltFromYmdhms",  MLTConvertYMDHMS_wrap, METH_VARARGS, "calculate mlt from y,mn,d,h,m,s and mag lon\nformat:mlt=mltFromYmdhms(yr,mo,dy,hr,mt,sc,mLon)"},
  	{"mltFromYrsec", MLTConvertYrsec_wrap , METH_VARARGS, "calculate mlt from yr seconds and mag lon\nformat:mlt=mltFromEpoch(year,yrsec,mLon)"},
 // 	{"rPosAzm",  rposazm_wrap, METH_VARARGS, "wraper for rpos, MAY NOT be right\nformat:pos=rPosAzm(bm,rng,stid,eTime,frang,rsep,rx,height,magflg)"},
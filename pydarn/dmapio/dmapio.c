@@ -28,11 +28,13 @@
 #include <unistd.h>
 #include <string.h>
 #include <fcntl.h>
+#include <math.h>
 #include "rtypes.h"
 #include "rtime.h"
 #include "rconvert.h"
 #include "dmap.h"
 #include "structmember.h"
+#include <numpy/arrayobject.h>
 #include "rprm.h"
 #include "fitdata.h"
 #include "fitwrite.h"
@@ -422,34 +424,402 @@ write_fit_rec(PyObject *self, PyObject *args)
   }
 }
 
+/*the handful of scalars needed to index or filter a record without
+  decoding its arrays*/
+struct dmapRecHdr
+{
+  double time;
+  int stid;
+  int bmnum;
+  int channel;
+  int cp;
+};
+
+/*size in bytes of one value of a fixed-size dmap type, 0 otherwise*/
+static int
+dmap_type_size(int type)
+{
+  switch(type)
+  {
+    case DATACHAR: return 1;
+    case DATASHORT: return 2;
+    case DATAINT: return 4;
+    case DATAFLOAT: return 4;
+    case DATADOUBLE: return 8;
+    default: return 0;
+  }
+}
+
+/*read the next raw record (header included) from fd into a malloc'd
+  buffer.  returns NULL at end of file or on a bad record*/
+static unsigned char *
+dmap_read_raw(int fd, int32 *size)
+{
+  unsigned char hdr[8], *buf;
+  int32 code;
+  int got, n;
+
+  for(got=0;got<8;got+=n)
+    if((n = read(fd, hdr+got, 8-got)) <= 0)
+      return NULL;
+  ConvertToInt(hdr, &code);
+  ConvertToInt(hdr+4, size);
+  if(*size <= 8)
+    return NULL;
+
+  buf = malloc(*size);
+  if(buf == NULL)
+    return NULL;
+  memcpy(buf, hdr, 8);
+  for(got=8;got<*size;got+=n)
+    if((n = read(fd, buf+got, *size-got)) <= 0)
+    {
+      free(buf);
+      return NULL;
+    }
+  return buf;
+}
+
+/*walk the scalar block of a raw record and pull out the time and
+  the beam identifiers.  the arrays are never touched.
+  returns -1 if the record is malformed*/
+static int
+dmap_scan_scalars(unsigned char *buf, int32 size, struct dmapRecHdr *hdr)
+{
+  int32 snum, anum, i32;
+  int16 i16;
+  int c, off, n, type, yr=1970, mo=1, dy=1, hr=0, mt=0, sc=0, us=0, val;
+  char *name;
+
+  hdr->stid = hdr->bmnum = hdr->channel = hdr->cp = -1;
+  if(size < 16)
+    return -1;
+  ConvertToInt(buf+8, &snum);
+  ConvertToInt(buf+12, &anum);
+  off = 16;
+  for(c=0;c<snum;c++)
+  {
+    name = (char *)buf+off;
+    n = strnlen(name, size-off);
+    off += n+1;
+    if(off >= size)
+      return -1;
+    type = buf[off++];
+    if(type == DATASTRING)
+    {
+      off += strnlen((char *)buf+off, size-off)+1;
+      continue;
+    }
+    n = dmap_type_size(type);
+    if(n == 0 || off+n > size)
+      return -1;
+    if(type == DATASHORT)
+    {
+      ConvertToShort(buf+off, &i16);
+      val = i16;
+    }
+    else if(type == DATAINT)
+    {
+      ConvertToInt(buf+off, &i32);
+      val = i32;
+    }
+    else
+      val = (type == DATACHAR) ? (char)buf[off] : 0;
+    off += n;
+
+    if (strcmp(name,"time.yr")==0) yr = val;
+    else if (strcmp(name,"time.mo")==0) mo = val;
+    else if (strcmp(name,"time.dy")==0) dy = val;
+    else if (strcmp(name,"time.hr")==0) hr = val;
+    else if (strcmp(name,"time.mt")==0) mt = val;
+    else if (strcmp(name,"time.sc")==0) sc = val;
+    else if (strcmp(name,"time.us")==0) us = (int)(((int)(val*1e-3))*1e3);
+    else if (strcmp(name,"stid")==0) hdr->stid = val;
+    else if (strcmp(name,"bmnum")==0) hdr->bmnum = val;
+    else if (strcmp(name,"channel")==0) hdr->channel = val;
+    else if (strcmp(name,"cp")==0) hdr->cp = val;
+  }
+  hdr->time = TimeYMDHMSToEpoch(yr,mo,dy,hr,mt,(double)sc+us/1.e6);
+  return 0;
+}
+
+/*the records a reader wants, checked against the scalars of each raw
+  record before its arrays are decoded.  -1 matches anything, and a
+  channel of 1 matches both channel 0 and 1, as both mean 'a'*/
+struct dmapFilter
+{
+  double sTime;
+  double eTime;
+  int stid;
+  int channel;
+  int bmnum;
+  int cp;
+};
+
+/*returns 1 if a record matches the filter, 0 if it should be skipped
+  and -1 if it is past the end time, ie there is nothing left to read.
+  records with stid 0 match any station*/
+static int
+dmap_filter_match(struct dmapFilter *flt, struct dmapRecHdr *hdr)
+{
+  int channel;
+
+  if(hdr->time > flt->eTime)
+    return -1;
+  if(hdr->time < flt->sTime)
+    return 0;
+  if(flt->stid != -1 && hdr->stid != 0 && hdr->stid != flt->stid)
+    return 0;
+  channel = (hdr->channel < 2) ? 1 : hdr->channel;
+  if(flt->channel != -1 && channel != flt->channel)
+    return 0;
+  if(flt->bmnum != -1 && hdr->bmnum != flt->bmnum)
+    return 0;
+  if(flt->cp != -1 && hdr->cp != flt->cp)
+    return 0;
+  return 1;
+}
+
+/*a source of raw dmap records: either a real file, which is read
+  through its descriptor with the GIL released, or any python object
+  with a read method, such as a bz2 or gzip stream*/
+struct dmapSource
+{
+  PyObject *f;
+  int fd;
+};
+
+static int
+dmap_source_init(struct dmapSource *src, PyObject *f)
+{
+  src->f = f;
+  src->fd = -1;
+  if(PyFile_Check(f))
+    src->fd = fileno(PyFile_AsFile(f));
+  else if(!PyObject_HasAttrString(f, "read"))
+  {
+    PyErr_SetString(PyExc_TypeError, "expected a file or an object with a read method");
+    return -1;
+  }
+  return 0;
+}
+
+/*read up to n bytes from a python stream into buf, stopping early
+  only at the end of the stream.  returns the number of bytes read,
+  or -1 with an exception set*/
+static int
+dmap_py_read(PyObject *f, unsigned char *buf, int n)
+{
+  int got = 0;
+  Py_ssize_t len;
+  PyObject *str;
+
+  while(got < n)
+  {
+    str = PyObject_CallMethod(f, "read", "i", n-got);
+    if(str == NULL)
+      return -1;
+    if(!PyString_Check(str))
+    {
+      Py_CLEAR(str);
+      PyErr_SetString(PyExc_TypeError, "read() did not return a string");
+      return -1;
+    }
+    len = PyString_GET_SIZE(str);
+    if(len > 0)
+      memcpy(buf+got, PyString_AS_STRING(str), len);
+    Py_CLEAR(str);
+    if(len == 0)
+      break;
+    got += len;
+  }
+  return got;
+}
+
+/*read the next raw record from a source.  must be called with the
+  GIL held.  returns NULL at the end of the data, or NULL with an
+  exception set if the stream raised*/
+static unsigned char *
+dmap_source_read(struct dmapSource *src, int32 *size)
+{
+  unsigned char hdr[8], *buf;
+  int32 code;
+  int n;
+
+  if(src->fd >= 0)
+  {
+    PyFile_IncUseCount((PyFileObject *)src->f);
+    Py_BEGIN_ALLOW_THREADS
+    buf = dmap_read_raw(src->fd, size);
+    Py_END_ALLOW_THREADS
+    PyFile_DecUseCount((PyFileObject *)src->f);
+    return buf;
+  }
+
+  n = dmap_py_read(src->f, hdr, 8);
+  if(n < 8)
+    return NULL;
+  ConvertToInt(hdr, &code);
+  ConvertToInt(hdr+4, size);
+  if(*size <= 8)
+    return NULL;
+  buf = malloc(*size);
+  if(buf == NULL)
+  {
+    PyErr_NoMemory();
+    return NULL;
+  }
+  memcpy(buf, hdr, 8);
+  n = dmap_py_read(src->f, buf+8, *size-8);
+  if(n < *size-8)
+  {
+    free(buf);
+    return NULL;
+  }
+  return buf;
+}
+
+/*discard n bytes from a source, returns -1 with an exception set
+  on error*/
+static int
+dmap_source_skip(struct dmapSource *src, long n)
+{
+  unsigned char tmp[65536];
+  int got;
+
+  while(n > 0)
+  {
+    got = dmap_py_read(src->f, tmp, (n < 65536) ? n : 65536);
+    if(got < 0)
+      return -1;
+    if(got == 0)
+      break;
+    n -= got;
+  }
+  return 0;
+}
+
+/*map a dmap data type onto the equivalent numpy type number,
+  returns -1 for types without a fixed-size numpy equivalent*/
+static int
+dmap_npy_type(int type)
+{
+  switch(type)
+  {
+    case DATACHAR: return NPY_INT8;
+    case DATASHORT: return NPY_INT16;
+    case DATAINT: return NPY_INT32;
+    case DATAFLOAT: return NPY_FLOAT32;
+    case DATADOUBLE: return NPY_FLOAT64;
+    default: return -1;
+  }
+}
+
+/*copy a dmap array straight into a typed ndarray.  dmap stores the
+  fastest varying dimension first, so the shape is reversed to give a
+  C-ordered array, eg acfd comes out as (nrang, mplgs, 2).
+  returns NULL (without an exception set) if the type is not numeric*/
 static PyObject *
-read_dmap_rec(PyObject *self, PyObject *args)
+dmap_array_to_ndarray(struct DataMapArray *a)
+{
+  npy_intp dims[NPY_MAXDIMS];
+  int i, typenum;
+  PyObject *arr;
+
+  typenum = dmap_npy_type(a->type);
+  if(typenum < 0 || a->dim < 1 || a->dim > NPY_MAXDIMS)
+    return NULL;
+
+  for(i=0;i<a->dim;i++)
+    dims[i] = a->rng[a->dim-1-i];
+  /*the last row of the lag table is a terminator, the list
+    reader drops it so we do the same*/
+  if((strcmp(a->name,"ltab")==0) && (a->dim==2) && (dims[0] > 0))
+    dims[0]--;
+
+  arr = PyArray_SimpleNew(a->dim, dims, typenum);
+  if(arr == NULL)
+    return NULL;
+  memcpy(PyArray_DATA((PyArrayObject *)arr), a->data.vptr,
+          PyArray_NBYTES((PyArrayObject *)arr));
+  return arr;
+}
+
+static PyObject *
+read_dmap_rec(PyObject *self, PyObject *args, PyObject *kwds)
 {
   PyObject* f;
-  if(!PyArg_ParseTuple(args, "O", &f))
+  PyObject *arrayNames = NULL;
+  int arrays = 0;
+  struct dmapFilter flt = {-HUGE_VAL, HUGE_VAL, -1, -1, -1, -1};
+  static char *kwlist[] = {"f", "arrays", "sTime", "eTime", "stid",
+                            "channel", "bmnum", "cp", NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "O|Oddiiii", kwlist, &f, &arrayNames,
+                                  &flt.sTime, &flt.eTime, &flt.stid,
+                                  &flt.channel, &flt.bmnum, &flt.cp))
     return NULL;
+  /*arrays is either a flag for every array, or a list or tuple
+    of the names of the arrays to return as ndarrays*/
+  if(arrayNames != NULL && (PyList_Check(arrayNames) || PyTuple_Check(arrayNames)))
+    arrays = 1;
   else
   {
-    PyObject *beamData = PyDict_New();
+    if(arrayNames != NULL && (arrays = PyObject_IsTrue(arrayNames)) < 0)
+      return NULL;
+    arrayNames = NULL;
+  }
+  {
+    PyObject *beamData;
     int c,yr,mo,dy,hr,mt,sc,us,i,j,k,nrang;
+    int32 size;
     double epoch;
+    unsigned char *buf;
+    struct dmapSource src;
+    struct dmapRecHdr hdr;
     struct DataMap *ptr;
     struct DataMapScalar *s;
     struct DataMapArray *a;
-    FILE * fp = PyFile_AsFile(f);
+    int filtering, match;
+
+    if(dmap_source_init(&src, f))
+      return NULL;
+    filtering = (flt.sTime != -HUGE_VAL || flt.eTime != HUGE_VAL ||
+                  flt.stid != -1 || flt.channel != -1 ||
+                  flt.bmnum != -1 || flt.cp != -1);
     
     nrang=0;
+    /*skip the records which don't match the filter without decoding
+      their arrays.  a malformed scalar block is passed on to the
+      decoder, which will reject it*/
+    while(1)
+    {
+      buf = dmap_source_read(&src, &size);
+      if(buf == NULL)
+      {
+        if(PyErr_Occurred())
+          return NULL;
+        Py_RETURN_NONE;
+      }
+      if(!filtering || dmap_scan_scalars(buf, size, &hdr))
+        break;
+      match = dmap_filter_match(&flt, &hdr);
+      if(match > 0)
+        break;
+      free(buf);
+      if(match < 0)
+        Py_RETURN_NONE;
+    }
     Py_BEGIN_ALLOW_THREADS
-    PyFile_IncUseCount(f);
-    ptr = DataMapRead(fileno(fp));
-    PyFile_DecUseCount(f);
+    ptr = DataMapDecodeBuffer(buf, size);
+    free(buf);
     Py_END_ALLOW_THREADS
     
     if(ptr == NULL)
-      return Py_None;
+      Py_RETURN_NONE;
     
     else
     {
+      beamData = PyDict_New();
       /*first, parse all of the scalars in the file*/
       for (c=0;c<ptr->snum;c++) 
       {
@@ -517,7 +887,28 @@ read_dmap_rec(PyObject *self, PyObject *args)
       {
         a=ptr->arr[c];
         PyObject *myStr = Py_BuildValue("s", a->name);
-        if ((strcmp(a->name,"ltab")==0) && (a->type==DATASHORT) && (a->dim==2))
+        PyObject *myArr = NULL;
+        int asArray = arrays;
+        if(asArray && arrayNames != NULL)
+          asArray = PySequence_Contains(arrayNames, myStr);
+        if(asArray)
+        {
+          if(asArray > 0)
+            myArr = dmap_array_to_ndarray(a);
+          if(myArr == NULL && PyErr_Occurred())
+          {
+            Py_CLEAR(myStr);
+            Py_CLEAR(beamData);
+            DataMapFree(ptr);
+            return NULL;
+          }
+        }
+        if(myArr != NULL)
+        {
+          PyDict_SetItem(beamData,myStr,myArr);
+          Py_CLEAR(myArr);
+        }
+        else if ((strcmp(a->name,"ltab")==0) && (a->type==DATASHORT) && (a->dim==2))
         {
           PyObject *myList = PyList_New(0);
           for(i=0;i<a->rng[1]-1;i++)
@@ -614,10 +1005,468 @@ read_dmap_rec(PyObject *self, PyObject *args)
   }
 }
 
+/*columns returned by read_dmap_file.  scalars get one value per
+  record, vectors are ragged per-gate fields that share a single
+  offsets array built from the length of slist*/
+struct dmapColSpec
+{
+  char *dmapName;
+  char *pyName;
+  int npyType;
+  double fill;
+};
+
+static struct dmapColSpec dmapScalarCols[] =
+{
+  {"stid", "stid", NPY_INT16, -1},
+  {"bmnum", "bmnum", NPY_INT16, -1},
+  {"channel", "channel", NPY_INT16, -1},
+  {"cp", "cp", NPY_INT16, -1},
+  {"scan", "scan", NPY_INT16, -1},
+  {"nrang", "nrang", NPY_INT16, -1},
+  {"frang", "frang", NPY_INT16, -1},
+  {"rsep", "rsep", NPY_INT16, -1},
+  {"tfreq", "tfreq", NPY_INT16, -1},
+  {"nave", "nave", NPY_INT16, -1},
+  {"noise.sky", "noisesky", NPY_FLOAT32, NAN},
+  {"noise.search", "noisesearch", NPY_FLOAT32, NAN},
+  {"noise.mean", "noisemean", NPY_FLOAT32, NAN},
+  {NULL, NULL, 0, 0}
+};
+
+static struct dmapColSpec dmapVectorCols[] =
+{
+  {"slist", "slist", NPY_INT16, -1},
+  {"v", "v", NPY_FLOAT32, NAN},
+  {"p_l", "p_l", NPY_FLOAT32, NAN},
+  {"w_l", "w_l", NPY_FLOAT32, NAN},
+  {"gflg", "gflg", NPY_INT8, -1},
+  {"elv", "elv", NPY_FLOAT32, NAN},
+  {"phi0", "phi0", NPY_FLOAT32, NAN},
+  {NULL, NULL, 0, 0}
+};
+
+/*a growable buffer of doubles, used to accumulate columns while the
+  GIL is released*/
+struct dmapBuf
+{
+  double *data;
+  npy_intp n;
+  npy_intp size;
+};
+
+static int
+dmap_buf_append(struct dmapBuf *b, double val)
+{
+  if(b->n == b->size)
+  {
+    npy_intp size = (b->size == 0) ? 1024 : b->size*2;
+    double *data = realloc(b->data, size*sizeof(double));
+    if(data == NULL)
+      return -1;
+    b->data = data;
+    b->size = size;
+  }
+  b->data[b->n++] = val;
+  return 0;
+}
+
+/*read element i of a dmap array (or the value of a scalar when
+  i == 0) as a double*/
+static double
+dmap_value(int type, void *data, int i, double fill)
+{
+  switch(type)
+  {
+    case DATACHAR: return (double)((char *)data)[i];
+    case DATASHORT: return (double)((int16 *)data)[i];
+    case DATAINT: return (double)((int32 *)data)[i];
+    case DATAFLOAT: return (double)((float *)data)[i];
+    case DATADOUBLE: return ((double *)data)[i];
+    default: return fill;
+  }
+}
+
+/*epoch time of a decoded record*/
+static double
+dmap_rec_epoch(struct DataMap *ptr)
+{
+  int c,yr=1970,mo=1,dy=1,hr=0,mt=0,sc=0,us=0;
+  struct DataMapScalar *s;
+  for(c=0;c<ptr->snum;c++)
+  {
+    s=ptr->scl[c];
+    if ((strcmp(s->name,"time.yr")==0) && (s->type==DATASHORT))
+      yr=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.mo")==0) && (s->type==DATASHORT))
+      mo=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.dy")==0) && (s->type==DATASHORT))
+      dy=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.hr")==0) && (s->type==DATASHORT))
+      hr=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.mt")==0) && (s->type==DATASHORT))
+      mt=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.sc")==0) && (s->type==DATASHORT))
+      sc=*(s->data.sptr);
+    else if ((strcmp(s->name,"time.us")==0) && (s->type==DATAINT))
+      us=(int)(((int)(*(s->data.iptr)*1e-3))*1e3);
+  }
+  return TimeYMDHMSToEpoch(yr,mo,dy,hr,mt,(double)sc+us/1.e6);
+}
+
+/*append one decoded record to the column buffers. 
+  returns -1 on allocation failure*/
+static int
+dmap_rec_to_cols(struct DataMap *ptr, struct dmapBuf *time,
+                  struct dmapBuf *scl, struct dmapBuf *vec,
+                  struct dmapBuf *offsets)
+{
+  int c,i,k,npnts;
+  struct DataMapArray *a, *found;
+
+  if(dmap_buf_append(time, dmap_rec_epoch(ptr)))
+    return -1;
+
+  for(k=0;dmapScalarCols[k].dmapName!=NULL;k++)
+  {
+    double val = dmapScalarCols[k].fill;
+    for(c=0;c<ptr->snum;c++)
+      if(strcmp(ptr->scl[c]->name,dmapScalarCols[k].dmapName)==0)
+      {
+        val = dmap_value(ptr->scl[c]->type, ptr->scl[c]->data.vptr, 0,
+                          dmapScalarCols[k].fill);
+        break;
+      }
+    if(dmap_buf_append(&scl[k], val))
+      return -1;
+  }
+
+  /*the number of points in this record is set by slist, every other
+    per-gate field is padded or truncated to match it*/
+  npnts = 0;
+  for(c=0;c<ptr->anum;c++)
+    if(strcmp(ptr->arr[c]->name,"slist")==0 && ptr->arr[c]->dim==1)
+    {
+      npnts = ptr->arr[c]->rng[0];
+      break;
+    }
+
+  for(k=0;dmapVectorCols[k].dmapName!=NULL;k++)
+  {
+    found = NULL;
+    for(c=0;c<ptr->anum;c++)
+    {
+      a=ptr->arr[c];
+      if(strcmp(a->name,dmapVectorCols[k].dmapName)==0 && a->dim==1)
+      {
+        found = a;
+        break;
+      }
+    }
+    for(i=0;i<npnts;i++)
+    {
+      double val = dmapVectorCols[k].fill;
+      if(found != NULL && i < found->rng[0])
+        val = dmap_value(found->type, found->data.vptr, i,
+                          dmapVectorCols[k].fill);
+      if(dmap_buf_append(&vec[k], val))
+        return -1;
+    }
+  }
+
+  if(dmap_buf_append(offsets, offsets->data[offsets->n-1]+npnts))
+    return -1;
+  return 0;
+}
+
+/*turn a column buffer into an ndarray of the requested type and add
+  it to dict under name.  returns -1 with an exception set on error*/
+static int
+dmap_buf_to_dict(PyObject *dict, char *name, struct dmapBuf *b, int npyType)
+{
+  npy_intp dims[1];
+  PyObject *dbl, *arr;
+
+  dims[0] = b->n;
+  dbl = PyArray_SimpleNew(1, dims, NPY_FLOAT64);
+  if(dbl == NULL)
+    return -1;
+  if(b->n > 0)
+    memcpy(PyArray_DATA((PyArrayObject *)dbl), b->data, b->n*sizeof(double));
+  arr = PyArray_Cast((PyArrayObject *)dbl, npyType);
+  Py_CLEAR(dbl);
+  if(arr == NULL)
+    return -1;
+  PyDict_SetItemString(dict, name, arr);
+  Py_CLEAR(arr);
+  return 0;
+}
+
+/*filter, decode and append one raw record to the column buffers,
+  freeing it.  needs no GIL.  returns 1 if the record was added, 0 if
+  it was skipped, -1 if it is past the end time and -2 if it could not
+  be decoded, or could not be stored (with *err set)*/
+static int
+dmap_file_add(unsigned char *buf, int32 size, struct dmapFilter *flt,
+              int filtering, struct dmapBuf *time, struct dmapBuf *scl,
+              struct dmapBuf *vec, struct dmapBuf *offsets, int *err)
+{
+  struct dmapRecHdr hdr;
+  struct DataMap *ptr;
+  int match = 1;
+
+  /*a malformed scalar block is passed on to the decoder, which will
+    reject it*/
+  if(filtering && dmap_scan_scalars(buf, size, &hdr) == 0)
+    match = dmap_filter_match(flt, &hdr);
+  if(match <= 0)
+  {
+    free(buf);
+    return match;
+  }
+  ptr = DataMapDecodeBuffer(buf, size);
+  free(buf);
+  if(ptr == NULL)
+    return -2;
+  *err = dmap_rec_to_cols(ptr, time, scl, vec, offsets);
+  DataMapFree(ptr);
+  return (*err) ? -2 : 1;
+}
+
+static PyObject *
+read_dmap_file(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  PyObject *f;
+  long offset = 0, length = -1, nmax = -1;
+  struct dmapFilter flt = {-HUGE_VAL, HUGE_VAL, -1, -1, -1, -1};
+  static char *kwlist[] = {"f", "offset", "length", "n", "sTime", "eTime",
+                            "stid", "channel", "bmnum", "cp", NULL};
+  if(!PyArg_ParseTupleAndKeywords(args, kwds, "O|lllddiiii", kwlist, &f,
+                                  &offset, &length, &nmax, &flt.sTime,
+                                  &flt.eTime, &flt.stid, &flt.channel,
+                                  &flt.bmnum, &flt.cp))
+    return NULL;
+  else
+  {
+    struct dmapBuf time, offsets, *scl, *vec;
+    struct dmapSource src;
+    int k, nscl, nvec, filtering, status = 0, err = 0;
+    long nrec = 0;
+    int32 size;
+    off_t pos, end;
+    unsigned char *buf;
+    PyObject *cols;
+
+    if(dmap_source_init(&src, f))
+      return NULL;
+    filtering = (flt.sTime != -HUGE_VAL || flt.eTime != HUGE_VAL ||
+                  flt.stid != -1 || flt.channel != -1 ||
+                  flt.bmnum != -1 || flt.cp != -1);
+
+    for(nscl=0;dmapScalarCols[nscl].dmapName!=NULL;nscl++);
+    for(nvec=0;dmapVectorCols[nvec].dmapName!=NULL;nvec++);
+    memset(&time, 0, sizeof(time));
+    memset(&offsets, 0, sizeof(offsets));
+    scl = calloc(nscl, sizeof(struct dmapBuf));
+    vec = calloc(nvec, sizeof(struct dmapBuf));
+    if(scl == NULL || vec == NULL || dmap_buf_append(&offsets, 0))
+    {
+      free(scl);
+      free(vec);
+      free(offsets.data);
+      return PyErr_NoMemory();
+    }
+
+    /*files seek to offset, streams skip offset bytes from where
+      they are.  a negative offset starts from where either one is*/
+    if(offset < 0)
+      pos = (src.fd >= 0) ? lseek(src.fd, 0, SEEK_CUR) : 0;
+    else if(src.fd >= 0)
+      pos = lseek(src.fd, (off_t)offset, SEEK_SET);
+    else
+      pos = dmap_source_skip(&src, offset) ? -1 : offset;
+    end = (pos >= 0 && length >= 0) ? pos+length : -1;
+
+    /*decode every matching record in the byte range, up to nmax of
+      them.  a file is read and decoded with the GIL released for the
+      whole loop, a python stream needs it to read each record*/
+    if(pos >= 0 && src.fd >= 0)
+    {
+      PyFile_IncUseCount((PyFileObject *)f);
+      Py_BEGIN_ALLOW_THREADS
+      while(status >= 0 && (nmax < 0 || nrec < nmax) && (end < 0 || pos < end))
+      {
+        buf = dmap_read_raw(src.fd, &size);
+        if(buf == NULL)
+          break;
+        status = dmap_file_add(buf, size, &flt, filtering, &time, scl, vec,
+                                &offsets, &err);
+        nrec += (status > 0);
+        pos += size;
+      }
+      Py_END_ALLOW_THREADS
+      PyFile_DecUseCount((PyFileObject *)f);
+    }
+    else
+    {
+      while(pos >= 0 && status >= 0 && (nmax < 0 || nrec < nmax) && (end < 0 || pos < end))
+      {
+        buf = dmap_source_read(&src, &size);
+        if(buf == NULL)
+          break;
+        Py_BEGIN_ALLOW_THREADS
+        status = dmap_file_add(buf, size, &flt, filtering, &time, scl, vec,
+                                &offsets, &err);
+        Py_END_ALLOW_THREADS
+        nrec += (status > 0);
+        pos += size;
+      }
+    }
+
+    /*a record that can't be decoded is an error, rather than the end
+      of the data, so that the records after it are not silently lost.
+      pos is already past it*/
+    cols = NULL;
+    if(PyErr_Occurred())
+      ;
+    else if(err)
+      PyErr_NoMemory();
+    else if(pos < 0)
+      PyErr_SetFromErrno(PyExc_IOError);
+    else if(status == -2)
+      PyErr_Format(PyExc_IOError, "could not decode the dmap record at byte %ld",
+                    (long)(pos-size));
+    else
+    {
+      cols = PyDict_New();
+      if(dmap_buf_to_dict(cols, "time", &time, NPY_FLOAT64) ||
+          dmap_buf_to_dict(cols, "offsets", &offsets, NPY_INT64))
+        Py_CLEAR(cols);
+      for(k=0;cols!=NULL && k<nscl;k++)
+        if(dmap_buf_to_dict(cols, dmapScalarCols[k].pyName, &scl[k],
+                              dmapScalarCols[k].npyType))
+          Py_CLEAR(cols);
+      for(k=0;cols!=NULL && k<nvec;k++)
+        if(dmap_buf_to_dict(cols, dmapVectorCols[k].pyName, &vec[k],
+                              dmapVectorCols[k].npyType))
+          Py_CLEAR(cols);
+    }
+
+    free(time.data);
+    free(offsets.data);
+    for(k=0;k<nscl;k++)
+      free(scl[k].data);
+    for(k=0;k<nvec;k++)
+      free(vec[k].data);
+    free(scl);
+    free(vec);
+    return cols;
+  }
+}
+
+static PyObject *
+read_dmap_index(PyObject *self, PyObject *args)
+{
+  PyObject *f;
+  if(!PyArg_ParseTuple(args, "O", &f))
+    return NULL;
+  else
+  {
+    struct dmapBuf offset, time, stid, bmnum, channel, cp;
+    struct dmapRecHdr hdr;
+    struct dmapSource src;
+    unsigned char *buf;
+    int32 size;
+    int err = 0;
+    off_t pos;
+    PyObject *idx;
+
+    if(dmap_source_init(&src, f))
+      return NULL;
+    memset(&offset, 0, sizeof(offset));
+    memset(&time, 0, sizeof(time));
+    memset(&stid, 0, sizeof(stid));
+    memset(&bmnum, 0, sizeof(bmnum));
+    memset(&channel, 0, sizeof(channel));
+    memset(&cp, 0, sizeof(cp));
+
+    /*offsets are counted from the current position, which for a
+      file is its absolute position and for a stream is taken as 0*/
+    pos = (src.fd >= 0) ? lseek(src.fd, 0, SEEK_CUR) : 0;
+    while(pos >= 0 && (buf = dmap_source_read(&src, &size)) != NULL)
+    {
+      if(dmap_scan_scalars(buf, size, &hdr) == 0)
+        err = dmap_buf_append(&offset, (double)pos) ||
+              dmap_buf_append(&time, hdr.time) ||
+              dmap_buf_append(&stid, hdr.stid) ||
+              dmap_buf_append(&bmnum, hdr.bmnum) ||
+              dmap_buf_append(&channel, hdr.channel) ||
+              dmap_buf_append(&cp, hdr.cp);
+      free(buf);
+      if(err)
+        break;
+      pos += size;
+    }
+
+    idx = NULL;
+    if(PyErr_Occurred())
+      ;
+    else if(err)
+      PyErr_NoMemory();
+    else if(pos < 0)
+      PyErr_SetFromErrno(PyExc_IOError);
+    else
+    {
+      idx = PyDict_New();
+      if(dmap_buf_to_dict(idx, "offset", &offset, NPY_INT64) ||
+          dmap_buf_to_dict(idx, "time", &time, NPY_FLOAT64) ||
+          dmap_buf_to_dict(idx, "stid", &stid, NPY_INT16) ||
+          dmap_buf_to_dict(idx, "bmnum", &bmnum, NPY_INT16) ||
+          dmap_buf_to_dict(idx, "channel", &channel, NPY_INT16) ||
+          dmap_buf_to_dict(idx, "cp", &cp, NPY_INT16))
+        Py_CLEAR(idx);
+    }
+    free(offset.data);
+    free(time.data);
+    free(stid.data);
+    free(bmnum.data);
+    free(channel.data);
+    free(cp.data);
+    return idx;
+  }
+}
 
 static PyMethodDef dmapioMethods[] = 
 {
-  {"readDmapRec",  read_dmap_rec, METH_VARARGS, "read a dmap record"},
+  {"readDmapRec",  (PyCFunction)read_dmap_rec, METH_VARARGS | METH_KEYWORDS,
+    "read a dmap record\nformat: rec = readDmapRec(f, [arrays=False])\n"
+    "f is a file or any object with a read method, eg a bz2/gzip stream\n"
+    "arrays=True returns each array as a typed numpy ndarray instead of a list,\n"
+    "a list or tuple of names returns only those arrays as ndarrays\n"
+    "sTime, eTime (epoch seconds), stid, channel, bmnum and cp skip the\n"
+    "records which don't match without decoding them, -1 matches anything.\n"
+    "channel is 1 for 'a', 2 for 'b', etc.  None is returned at the first\n"
+    "record after eTime"},
+  {"readDmapFile",  (PyCFunction)read_dmap_file, METH_VARARGS | METH_KEYWORDS,
+    "decode a whole dmap file (or a byte range of one) into columns\n"
+    "format: cols = readDmapFile(f, [offset=0], [length=-1], [n=-1])\n"
+    "f is a file or a stream, for streams offset counts from the\n"
+    "current position.  offset=-1 starts from the current position of\n"
+    "either, and n stops after n records, leaving f just past the last\n"
+    "one read so that the next call carries on from there.  a file is\n"
+    "read and decoded without holding the GIL\n"
+    "sTime, eTime, stid, channel, bmnum and cp filter the records as in\n"
+    "readDmapRec, reading stops at the first record after eTime\n"
+    "a record that can't be decoded raises IOError\n"
+    "cols is a dict of numpy arrays, one value per record for the scalars\n"
+    "and flat per-gate values for the vectors, where record i owns\n"
+    "cols['slist'][cols['offsets'][i]:cols['offsets'][i+1]]"},
+  {"readDmapIndex",  read_dmap_index, METH_VARARGS,
+    "index the records of a dmap file without decoding their arrays\n"
+    "format: idx = readDmapIndex(f)\n"
+    "f is a file or a stream, indexed from its current position\n"
+    "idx is a dict of numpy arrays holding the byte offset, epoch time,\n"
+    "stid, bmnum, channel and cp of every record"},
   {"writeFitRec",  write_fit_rec, METH_VARARGS, "write a fitacf record"},
   {NULL, NULL, 0, NULL}        /* Sentinel */
 };
@@ -626,4 +1475,5 @@ PyMODINIT_FUNC
 initdmapio(void)
 {
   (void) Py_InitModule("dmapio", dmapioMethods);
+  import_array();
 }
\ No newline at end of file
@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from distutils.core import setup, Extension
-import os
+import os, numpy
 
 rst = os.environ['RSTPATH']
 setup (name = "dmapio",
@@ -37,6 +37,7 @@ setup (name = "dmapio",
                                      rst+"/include/analysis",
                                      rst+"/include/base",
                                      rst+"/include/general",
+                                     numpy.get_include(),
                                      ],
                                 library_dirs = [rst+"/lib/"],
 				libraries=["m","z","rtime.1","dmap.1", "rcnv.1", "radar.1", "fit.1", "rscan.1", "cfit.1"]),]
@@ -139,6 +139,7 @@ def fitPrintRec(sTime, eTime, rad, outfile, fileType='fitex', summ=0):
   """
 
   import pydarn, utils, models
+  import numpy
   
   myPtr = pydarn.sdio.radDataOpen(sTime,rad,eTime=eTime,fileType=fileType)
   if(myPtr == None): return None
@@ -149,7 +150,7 @@ def fitPrintRec(sTime, eTime, rad, outfile, fileType='fitex', summ=0):
   
   radar = pydarn.radar.network().getRadarByCode(rad)
   site = radar.getSiteByDate(myData.time)
-  myFov = pydarn.radar.radFov.fov(site=site,rsep=myData.prm.rsep,ngates=myData.prm.nrang, model=None, altitude=300.)
+  myFov = pydarn.radar.radFov.getFov(site=site,rsep=myData.prm.rsep,ngates=myData.prm.nrang, model=None, altitude=300.)
   
   
   f = open(outfile, 'w')
@@ -185,25 +186,18 @@ def fitPrintRec(sTime, eTime, rad, outfile, fileType='fitex', summ=0):
       ('gate','pwr_lag0','pwr_l','vel','gscat','vel_err','width_l','geo_lat','geo_lon','geo_azm',
         'mag_lat','mag_lon','mag_azm'))
       
-      for i in range(len(myData.fit.slist)):
-
-        d = utils.geoPack.calcDistPnt(myFov.latFull[myData.bmnum][myData.fit.slist[i]],
-                                      myFov.lonFull[myData.bmnum][myData.fit.slist[i]], 300,
-                                      distLat=myFov.latFull[myData.bmnum][myData.fit.slist[i]+1], \
-                                      distLon=myFov.lonFull[myData.bmnum][myData.fit.slist[i]+1 ],distAlt=300)
-
-        gazm = d['az']
-
-        mlat,mlon,a = models.aacgm.aacgmConv(myFov.latFull[myData.bmnum][myData.fit.slist[i]],
-                                                myFov.lonFull[myData.bmnum][myData.fit.slist[i]],300,0)
+      #the geographic and magnetic positions and azimuths of all the gates at once
+      slist = numpy.array(myData.fit.slist,dtype=int)
+      lat,lon = myFov.latFull[myData.bmnum][slist],myFov.lonFull[myData.bmnum][slist]
+      lat2,lon2 = myFov.latFull[myData.bmnum][slist+1],myFov.lonFull[myData.bmnum][slist+1]
+      gazms = utils.geoPack.calcDistPnt(lat,lon,300,distLat=lat2,distLon=lon2,distAlt=300)['az']
+      mlats,mlons,a = models.aacgm.aacgmConvArray(lat,lon,300.,0)
+      mlats2,mlons2,b = models.aacgm.aacgmConvArray(lat2,lon2,300.,0)
+      mazms = utils.geoPack.calcDistPnt(mlats,mlons,300,distLat=mlats2,distLon=mlons2,distAlt=300)['az']
 
-        mlat2,mlon2,b = models.aacgm.aacgmConv(myFov.latFull[myData.bmnum][myData.fit.slist[i]+1],
-                                                myFov.lonFull[myData.bmnum][myData.fit.slist[i]+1],300,0)
-
-
-        d = utils.geoPack.calcDistPnt(mlat,mlon,300,distLat=mlat2,distLon=mlon2,distAlt=300)
+      for i in range(len(myData.fit.slist)):
 
-        mazm = d['az']
+        gazm,mlat,mlon,mazm = gazms[i],mlats[i],mlons[i],mazms[i]
 
         f.write('{0:4d}  {1:>8.1f} / {2:<5.1f} {3:>8.1f}  {4:>5d} {5:>8.1f} {6:>8.1f} {7:>8.2f} {8:>8.2f} {9:>8.2f} {10:>8.2f} {11:>8.2f} {12:>8.2f}\n'.format \
                   (myData.fit.slist[i],myData.fit.pwr0[i],myData.fit.p_l[i],\
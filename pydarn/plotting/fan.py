@@ -128,30 +128,22 @@ def plotFan(sTime,rad,eTime=None,interval=60,fileType='fitex',param='velocity',f
   cmap,norm,bounds = utils.plotUtils.genCmap(param,scale,colors=colors,gflg=gflg)
   
   
-  #open the data files
-  myFiles = []
-  for r in rad:
-    f = radDataOpen(sTime,r,eTime+datetime.timedelta(seconds=interval),fileType=fileType,filtered=filtered,channel=channel)
-    if(f != None): myFiles.append(f)
-
-  assert(myFiles != []),'error, no data available for this period'
+  #open the data files, each radar is read in its own worker process
+  #and the beams come back merged in time order
+  myPtr = pydarn.sdio.mergedRadDataPtr(sTime,rad,eTime=eTime+datetime.timedelta(seconds=interval), \
+                                        fileType=fileType,filtered=filtered,channel=channel)
+  allBeams = [b for b in myPtr.firstBeams() if b != None]
+  if(allBeams == []): myPtr.close()
+  assert(allBeams != []),'error, no data available for this period'
 
   xmin,ymin,xmax,ymax = 1e16,1e16,-1e16,-1e16
 
-  allBeams = [''] * len(myFiles)
   sites,fovs,oldCpids,lonFull,latFull=[],[],[],[],[]
-  #go through all open files
-  for i in range(len(myFiles)):
-    #read until we reach start time
-    allBeams[i] = radDataReadRec(myFiles[i])
-    while(allBeams[i].time < sTime and allBeams[i] != None):
-      allBeams[i] = radDataReadRec(myFiles[i])
-      
-    #check that the file has data in the target interval
-    if(allBeams[i] == None): 
-      myFiles[i].close()
-      myFiles[i] = None
-      continue
+  #which radar each station id belongs to
+  radInds = {}
+  #go through the first beam of each radar
+  for i in range(len(allBeams)):
+    radInds[allBeams[i].stid] = i
   
     #get to field of view coords in order to determine map limits
     t=allBeams[i].time
@@ -164,7 +156,7 @@ def plotFan(sTime,rad,eTime=None,interval=60,fileType='fitex',param='velocity',f
       x = aacgm.aacgmConv(site.geolat,site.geolon,0.,0)
       latFull.append(x[0])
       lonFull.append(x[1])
-    myFov = pydarn.radar.radFov.fov(site=site,rsep=allBeams[i].prm.rsep,\
+    myFov = pydarn.radar.radFov.getFov(site=site,rsep=allBeams[i].prm.rsep,\
             ngates=allBeams[i].prm.nrang+1,nbeams=site.maxbeam,coords=coords)
     fovs.append(myFov)
     for b in range(0,site.maxbeam+1):
@@ -241,6 +233,8 @@ def plotFan(sTime,rad,eTime=None,interval=60,fileType='fitex',param='velocity',f
   first = True
   pnum,stot = 0,dt.timedelta(seconds=0)
   axes = AxesSequence()
+  myBeams = iter(myPtr)
+  myBeam = next(myBeams,None)
   #now, loop through desired time interval
   while(cTime <= eTime):
     tz = dt.datetime.now()
@@ -248,17 +242,17 @@ def plotFan(sTime,rad,eTime=None,interval=60,fileType='fitex',param='velocity',f
     bndTime = cTime + datetime.timedelta(seconds=interval)
     
     ft = 'None'
-    #go though all files
-    for i in range(len(myFiles)):
-      scans = [[] for j in range(len(myFiles))]
+    scans = [[] for j in range(len(allBeams))]
+    #sort the beams in the time window by radar
+    while(myBeam != None and myBeam.time < bndTime):
+      if(radInds.has_key(myBeam.stid)): scans[radInds[myBeam.stid]].append(myBeam)
+      #read the next record
+      myBeam = next(myBeams,None)
+    #go though all radars
+    for i in range(len(allBeams)):
       #check that we have good data at this time
-      if(myFiles[i] == None or allBeams[i] == None): continue
-      ft = allBeams[i].fType
-      #until we reach the end of the time window
-      while(allBeams[i] != None and allBeams[i].time < bndTime):
-        scans[i].append(allBeams[i])
-        #read the next record
-        allBeams[i] = radDataReadRec(myFiles[i])
+      if(scans[i] == []): continue
+      ft = scans[i][0].fType
       intensities, pcoll = overlayFan(scans[i],myMap,myFig,param,coords,gsct=gsct,site=sites[i],fov=fovs[i],\
                                         fill=fill,velscl=velscl,dist=dist,cmap=cmap,norm=norm)
                                         
@@ -351,6 +345,7 @@ def plotFan(sTime,rad,eTime=None,interval=60,fileType='fitex',param='velocity',f
     myFig = pickle.load(open('map.pickle','rb'))
     print 'plot loop',dt.datetime.now()-tz
     
+  myPtr.close()
   
   if(output != 'gui'): print 'file[s] is[are] at: '+d+'/'+sTime.strftime("%Y%m%d")+'.fan.%n.pdf'
   else: axes.show()
@@ -443,7 +438,7 @@ def overlayFan(myData,myMap,myFig,param,coords='geo',gsct=0,site=None,\
   if(site == None):
     site = pydarn.radar.network().getRadarById(myData[0].stid).getSiteByDate(myData[0].time)
   if(fov == None):
-    fov = pydarn.radar.radFov.fov(site=site,rsep=myData[0].prm.rsep,\
+    fov = pydarn.radar.radFov.getFov(site=site,rsep=myData[0].prm.rsep,\
     ngates=myData.prm.nrang+1,nbeams= site.maxbeam,coords=coords) 
   
   verts = []
@@ -159,7 +159,7 @@ def overlayFov(Basemap, codes=None, ids=None, names=None,
 	written by Sebastien, 2012-09
 	"""
 	from pydarn.radar import network
-	from pydarn.radar.radFov import fov
+	from pydarn.radar.radFov import getFov
 	from datetime import datetime as dt
 	from datetime import timedelta
 	import matplotlib.cm as cm
@@ -210,9 +210,9 @@ def overlayFov(Basemap, codes=None, ids=None, names=None,
 			# Set number of gates to be plotted
 			eGate = site.maxgate-1 if not maxGate else maxGate
 			if not hasattr(Basemap, 'coords'): 
-				radFov = fov(site=site, ngates=eGate+1)
+				radFov = getFov(site=site, ngates=eGate+1)
 			else:
-				radFov = fov(site=site, ngates=eGate+1, coords=Basemap.coords)
+				radFov = getFov(site=site, ngates=eGate+1, coords=Basemap.coords)
 		else:
 			radFov = fovObj
 			eGate = len(fovObj.gates)
@@ -160,7 +160,9 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
   if myFile == None:
     print 'error, no files available for the requested time/radar/filetype combination'
     return None
-  myBeam = radDataReadRec(myFile)
+  #read the beams in blocks, rather than one record at a time
+  beams = iter(myFile)
+  myBeam = next(beams,None)
   if myBeam == None:
     print 'error, no data available for the requested time/radar/filetype combination'
     return None
@@ -213,7 +215,7 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
       if('phi0' in params): phi0.append(myBeam.fit.phi0)
       gsflg.append(myBeam.fit.gflg)
       
-    myBeam = radDataReadRec(myFile)
+    myBeam = next(beams,None)
     
   
   rtiFig = plot.figure()
@@ -268,7 +270,7 @@ def plotRti(sTime,rad,eTime=None,bmnum=7,fileType='fitex',params=['velocity','po
     elif(coords == 'rng'): y = numpy.linspace(frang[0],rmax*rsep[0],rmax+1)
     else:
       site = pydarn.radar.network().getRadarByCode(rad).getSiteByDate(times[0])
-      myFov = pydarn.radar.radFov.fov(site=site, ngates=rmax,nbeams=site.maxbeam,rsep=rsep[0],coords=coords)
+      myFov = pydarn.radar.radFov.getFov(site=site, ngates=rmax,nbeams=site.maxbeam,rsep=rsep[0],coords=coords)
       y =  myFov.latFull[bmnum]
       
     X, Y = numpy.meshgrid(x[:tcnt], y)
@@ -403,7 +405,7 @@ def drawAxes(myFig,times,rad,cpid,bmnum,nrang,frang,rsep,bottom,yrng=-1,coords='
         oldCpid = cpid[i]
         if(coords == 'geo' or coords == 'mag'):
           site = pydarn.radar.network().getRadarByCode(rad).getSiteByDate(times[i])
-          myFov = pydarn.radar.radFov.fov(site=site, ngates=nrang[i],nbeams=site.maxbeam,rsep=rsep[i],coords=coords)
+          myFov = pydarn.radar.radFov.getFov(site=site, ngates=nrang[i],nbeams=site.maxbeam,rsep=rsep[i],coords=coords)
           if(myFov.latFull[bmnum].max() > ymax): ymax = myFov.latFull[bmnum].max()
           if(myFov.latFull[bmnum].min() < ymin): ymin = myFov.latFull[bmnum].min()
         else:
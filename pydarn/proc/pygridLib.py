@@ -240,7 +240,9 @@ def makePygrid(sTime,rad,eTime=None,fileType='fitex',interval=60,vb=0,filtered=T
 
   
   oldCpid = -999999999999999
-  myBeam = radDataReadRec(myFile)
+  #read the beams in blocks, rather than one record at a time
+  beams = iter(myFile)
+  myBeam = next(beams,None)
   if myBeam == None:
     print 'no data available'
     return None
@@ -273,22 +275,18 @@ def makePygrid(sTime,rad,eTime=None,fileType='fitex',interval=60,vb=0,filtered=T
         #get possibly new ngates
         ngates = max([site.maxgate,myBeam.prm.nrang])
         #gereate a new FOV
-        myFov = pydarn.radar.radFov.fov(site=site,rsep=myBeam.prm.rsep,\
+        myFov = pydarn.radar.radFov.getFov(site=site,rsep=myBeam.prm.rsep,\
           ngates=ngates+1,nbeams=site.maxbeam)
-        myFova = pydarn.radar.radFov.fov(site=site,rsep=myBeam.prm.rsep,\
+        myFova = pydarn.radar.radFov.getFov(site=site,rsep=myBeam.prm.rsep,\
           ngates=ngates+1, model=None, altitude=300.)
 
+        #convert all the RB cells at once
+        mlat,mlon,_ = aacgm.aacgmConvArray(myFov.latCenter,myFov.lonCenter,300.,0)
+        mlata,mlona,_ = aacgm.aacgmConvArray(myFova.latCenter,myFova.lonCenter,300.,0)
+        azm = greatCircleAzm(mlata[:,:-1],mlona[:,:-1],mlata[:,1:],mlona[:,1:])
         #create a 2D list to hold coords of RB cells
-        coordsList = [[None]*ngates for _ in range(site.maxbeam)]
-        #generate new coordsList
-        for ii in range(site.maxbeam):
-          for jj in range(ngates):
-            arr1=aacgm.aacgmConv(myFov.latCenter[ii][jj],myFov.lonCenter[ii][jj],300,0)
-            arr2=aacgm.aacgmConv(myFov.latCenter[ii][jj+1],myFov.lonCenter[ii][jj+1],300,0)
-            arr3=aacgm.aacgmConv(myFova.latCenter[ii][jj],myFova.lonCenter[ii][jj],300,0)
-            arr4=aacgm.aacgmConv(myFova.latCenter[ii][jj+1],myFova.lonCenter[ii][jj+1],300,0)
-            azm = greatCircleAzm(arr3[0],arr3[1],arr4[0],arr4[1])
-            coordsList[ii][jj] = [arr1[0],arr1[1],azm]
+        coordsList = [[[mlat[ii,jj],mlon[ii,jj],azm[ii,jj]] for jj in range(ngates)] \
+          for ii in range(site.maxbeam)]
         oldCpid = myBeam.cp
         
       #are we in the target time interval?
@@ -297,7 +295,7 @@ def makePygrid(sTime,rad,eTime=None,fileType='fitex',interval=60,vb=0,filtered=T
         g.enterData(myBeam,coordsList)
         
       #read the next record
-      myBeam = radDataReadRec(myFile)
+      myBeam = next(beams,None)
       
       if(myBeam == None): break
 
@@ -703,37 +701,39 @@ class pygrid(object):
     """
     import math,models.aacgm as aacgm,time
     
+    #the good ionospheric scatter points on this beam
+    good = [i for i in range(len(myData.fit.slist)) if(myData.fit.gflg[i] == 0 or \
+      myData.fit.gflg[i] == 2 and myData.fit.v[i] != 0.0)]
+    if(len(good) == 0): return
+    #convert the coords of all of them to mlt at once
+    mlts = aacgm.mltFromEpochArray(datetimeToEpoch(myData.time), \
+      [coordsList[myData.bmnum][myData.fit.slist[i]][1] for i in good])
+    
     #go through all scatter points on this beam
-    for i in range(len(myData.fit.slist)):
+    for i,mlt1 in zip(good,mlts):
       
-      #check for good ionospheric scatter
-      if(myData.fit.gflg[i] == 0 or myData.fit.gflg[i] == 2 and myData.fit.v[i] != 0.0):
-        
-        #range gate number
-        rng = myData.fit.slist[i]
-        #get coords of r-b cell
-        myPos = coordsList[myData.bmnum][rng]
-        #latitudinal index
-        latInd = int(math.floor(myPos[0]/self.delLat))
-        
-        #convert coords to mlt
-        mlt1 = aacgm.mltFromEpoch(datetimeToEpoch(myData.time),myPos[1])
-        
-        #print myData['fit']['v'][i],myPos[2]
-        #compensate for neg. direction is away from radar
-        if(myData.fit.v[i] > 0.): azm = (myPos[2]+180+360)%360
-        else: azm = (myPos[2]+360)%360
-        #print abs(myData['fit']['v'][i]),azm
-        #print ""
-        #longitudinal index
-        lonInd = int(math.floor(mlt1/self.lats[latInd].delMlt))
-        
-        #create a pygridVec object and append it to the list of pygridCells
-        self.lats[latInd].cells[lonInd].allVecs.append(pygridVec(abs(myData.fit.v[i]),myData.fit.w_l[i],\
-        myData.fit.p_l[i],myData.stid,myData.time,myData.bmnum,rng,azm))
-        
-        #increment number of vectors in grid cell and pygrid object
-        self.lats[latInd].cells[lonInd].nVecs += 1
-        self.nVecs += 1
+      #range gate number
+      rng = myData.fit.slist[i]
+      #get coords of r-b cell
+      myPos = coordsList[myData.bmnum][rng]
+      #latitudinal index
+      latInd = int(math.floor(myPos[0]/self.delLat))
+      
+      #print myData['fit']['v'][i],myPos[2]
+      #compensate for neg. direction is away from radar
+      if(myData.fit.v[i] > 0.): azm = (myPos[2]+180+360)%360
+      else: azm = (myPos[2]+360)%360
+      #print abs(myData['fit']['v'][i]),azm
+      #print ""
+      #longitudinal index
+      lonInd = int(math.floor(mlt1/self.lats[latInd].delMlt))
+      
+      #create a pygridVec object and append it to the list of pygridCells
+      self.lats[latInd].cells[lonInd].allVecs.append(pygridVec(abs(myData.fit.v[i]),myData.fit.w_l[i],\
+      myData.fit.p_l[i],myData.stid,myData.time,myData.bmnum,rng,azm))
+      
+      #increment number of vectors in grid cell and pygrid object
+      self.lats[latInd].cells[lonInd].nVecs += 1
+      self.nVecs += 1
       
       
@@ -10,14 +10,30 @@ This module handles generating field-of-view projctions
 	* :class:`fov`: field of view position
 
 **Functions**:
+	* :func:`getFov`: Get a fov object from the cache, or calculate it
+	* :func:`clearFovCache`: Empty the in-memory fov cache
 	* :func:`slantRange`: Calculate slant range
 	* :func:`calcAzOffBore`: Calculate off-array-normal azimuth
 	* :func:`calcFieldPnt`: Calculate field point projection
 
 Based on Mike Ruohoniemi's GEOPACK
 Based on R.J. Barnes radar.pro
+
+The fov objects returned by :func:`getFov` are kept in an in-memory cache of 
+the fovCacheSize most recently used ones, keyed on the site parameters and 
+the fov inputs. If fovCacheDir is set, they are also saved there as .npz files, 
+so that other processes and later sessions can load them instead of 
+recalculating them. The cached objects are shared, so their arrays are read-only.
 """
 
+# Number of fov objects kept in memory by getFov
+fovCacheSize = 64
+# Directory where getFov saves fov objects for other processes (None to keep them in memory only)
+fovCacheDir = None
+
+# The in-memory cache, in order of last use
+_fovCache = None
+
 # *************************************************************
 class fov(object):
 	""" This class calculates and stores field-of-view coordinates. 
@@ -56,11 +72,10 @@ class fov(object):
 			elevation=None, altitude=300., \
 			model='IS', coords='geo'):
 		# Get fov
-		from numpy import ndarray, array, arange, zeros
-		import models.aacgm as aacgm
+		import numpy as np
 		
 		# Test that we have enough input arguments to work with
-		if not site and None in [nbeams, ngates, bmsep, recrise, siteLat, siteLon, siteBore, siteAlt]:
+		if not site and any([x is None for x in [nbeams, ngates, bmsep, recrise, siteLat, siteLon, siteBore, siteAlt]]):
 			print 'calcFov: must provide either a site object or [nbeams, ngates, bmsep, recrise, siteLat, siteLon, siteBore, siteAlt].'
 			return
 			
@@ -69,7 +84,7 @@ class fov(object):
 			if not nbeams: nbeams = site.maxbeam
 			if not ngates: ngates = site.maxgate
 			if not bmsep: bmsep = site.bmsep
-			if not recrise: recrise = site.recrise
+			if recrise is None: recrise = site.recrise
 			if not siteLat: siteLat = site.geolat
 			if not siteLon: siteLon = site.geolon
 			if not siteAlt: siteAlt = site.alt
@@ -77,134 +92,46 @@ class fov(object):
 			
 		# Some type checking. Look out for arrays
 		# If frang, rsep or recrise are arrays, then they should be of shape (nbeams,)
-		# Set a flag if any of frang, rsep or recrise is an array
-		isParamArray = False
-		if isinstance(frang, ndarray):
-			isParamArray = True
-			if len(frang) != nbeams: 
-				print 'getFov: frang must be of a scalar or ndarray(nbeams). Using first element: {}'.format(frang[0])
-				frang = frang[0] * ones(nbeams+1)
-			# Array is adjusted to add on extra beam edge by copying the last element
-			else: frang = np.append(frang, frang[-1])
-		else: frang = array([frang])
-		if isinstance(rsep, ndarray):
-			isParamArray = True
-			if len(rsep) != nbeams: 
-				print 'getFov: rsep must be of a scalar or ndarray(nbeams). Using first element: {}'.format(rsep[0])
-				rsep = rsep[0] * ones(nbeams+1)
-			# Array is adjusted to add on extra beam edge by copying the last element
-			else: rsep = np.append(rsep, rsep[-1])
-		else: rsep = array([rsep])
-		if isinstance(recrise, ndarray):
-			isParamArray = True
-			if len(recrise) != nbeams: 
-				print 'getFov: recrise must be of a scalar or ndarray(nbeams). Using first element: {}'.format(recrise[0])
-				recrise = recrise[0] * ones(nbeams+1)
-			# Array is adjusted to add on extra beam edge by copying the last element
-			else: recrise = np.append(recrise, recrise[-1])
-		else: recrise = array([recrise])
+		# They are made into columns of shape (nbeams+1,1) or (1,1), so that they broadcast against the gates
+		frang = _beamParam(frang, nbeams, 'frang')
+		rsep = _beamParam(rsep, nbeams, 'rsep')
+		recrise = _beamParam(recrise, nbeams, 'recrise')
 		
 		# If altitude or elevation are arrays, then they should be of shape (nbeams,ngates)
-		if isinstance(altitude, ndarray):
-			if altitude.ndim == 1:
-				if altitude.size != ngates:
-					print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude[0])
-					altitude = altitude[0] * ones((nbeams+1, ngates+1))
-				# Array is adjusted to add on extra beam/gate edge by copying the last element and replicating the whole array as many times as beams
-				else: altitude = np.resize( np.append(altitude, altitude[-1]), (nbeams+1,ngates+1) )
-			elif altitude.ndim == 2:
-				if altitude.shape != (nbeams, ngates):
-					print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude[0])
-					altitude = altitude[0] * ones((nbeams+1, ngates+1))
-				# Array is adjusted to add on extra beam/gate edge by copying the last row and column
-				else: 
-					altitude = np.append(altitude, altitude[-1,:].reshaphe(1,ngates), axis=0)
-					altitude = np.append(altitude, altitude[:,-1].reshaphe(nbeams,1), axis=1)
-			else:
-				print 'getFov: altitude must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(altitude[0])
-				altitude = altitude[0] * ones((nbeams+1, ngates+1))
-		if isinstance(elevation, ndarray):
-			if elevation.ndim == 1:
-				if elevation.size != ngates:
-					print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation[0])
-					elevation = elevation[0] * ones((nbeams+1, ngates+1))
-				# Array is adjusted to add on extra beam/gate edge by copying the last element and replicating the whole array as many times as beams
-				else: elevation = np.resize( np.append(elevation, elevation[-1]), (nbeams+1,ngates+1) )
-			elif elevation.ndim == 2:
-				if elevation.shape != (nbeams, ngates):
-					print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation[0])
-					elevation = elevation[0] * ones((nbeams+1, ngates+1))
-				# Array is adjusted to add on extra beam/gate edge by copying the last row and column
-				else: 
-					elevation = np.append(elevation, elevation[-1,:].reshaphe(1,ngates), axis=0)
-					elevation = np.append(elevation, elevation[:,-1].reshaphe(nbeams,1), axis=1)
-			else:
-				print 'getFov: elevation must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(elevation[0])
-				elevation = elevation[0] * ones((nbeams+1, ngates+1))
+		# They are made into arrays of shape (nbeams+1,ngates+1)
+		if isinstance(altitude, np.ndarray): altitude = _cellParam(altitude, nbeams, ngates, 'altitude')
+		if isinstance(elevation, np.ndarray): elevation = _cellParam(elevation, nbeams, ngates, 'elevation')
 		
 		# Generate beam/gate arrays
-		beams = arange(nbeams+1)
-		gates = arange(ngates+1)
-		
-		# Create output arrays
-		slantRangeFull = zeros((nbeams+1, ngates+1), dtype='float')
-		latFull = zeros((nbeams+1, ngates+1), dtype='float')
-		lonFull = zeros((nbeams+1, ngates+1), dtype='float')
-		slantRangeCenter = zeros((nbeams+1, ngates+1), dtype='float')
-		latCenter = zeros((nbeams+1, ngates+1), dtype='float')
-		lonCenter = zeros((nbeams+1, ngates+1), dtype='float')
+		beams = np.arange(nbeams+1)
+		gates = np.arange(ngates+1)
 		
 		# Calculate deviation from boresight for center of beam
 		bOffCenter = bmsep * (beams - nbeams/2.0)
 		# Calculate deviation from boresight for edge of beam
 		bOffEdge = bmsep * (beams - nbeams/2.0 - 0.5)
 		
-		# Iterates through beams
-		for ib in beams:
-			# if none of frang, rsep or recrise are arrays, then only execute this for the first loop, otherwise, repeat for every beam
-			if (~isParamArray and ib == 0) or isParamArray:
-				# Calculate center slant range
-				sRangCenter = slantRange(frang[ib], rsep[ib], recrise[ib], gates, center=True)
-				# Calculate edges slant range
-				sRangEdge = slantRange(frang[ib], rsep[ib], recrise[ib], gates, center=False)
-			# Save into output arrays
-			slantRangeCenter[ib, :-1] = sRangCenter[:-1]
-			slantRangeFull[ib,:] = sRangEdge
-			
-			# Calculate coordinates for Edge and Center of the current beam
-			for ig in gates:
-				# This is a bit redundant, but I could not think of any other way to deal with the array-or-not-array issue
-				if not isinstance(altitude, ndarray) and not isinstance(elevation, ndarray):
-					tElev = elevation
-					tAlt = altitude
-				elif isinstance(altitude, ndarray) and not isinstance(elevation, ndarray):
-					tElev = elevation
-					tAlt = altitude[ib,ig]
-				elif isinstance(elevation, ndarray) and not isinstance(altitude, ndarray):
-					tElev = elevation[ib,ig]
-					tAlt = altitude
-				else:
-					tElev = elevation[ib,ig]
-					tAlt = altitude[ib,ig]
-				# Then calculate projections
-				latC, lonC = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffCenter[ib], sRangCenter[ig], \
-							elevation=tElev, altitude=tAlt, model=model)
-				latE, lonE = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffEdge[ib], sRangEdge[ig], \
-							elevation=tElev, altitude=tAlt, model=model)
-							
-				if(coords == 'mag'):
-					latC, lonC, _ = aacgm.aacgmlib.aacgmConv(latC,lonC,0.,0)
-					latE, lonE, _ = aacgm.aacgmlib.aacgmConv(latE,lonE,0.,0)
-					
-				# Save into output arrays
-				latCenter[ib, ig] = latC
-				lonCenter[ib, ig] = lonC
-				latFull[ib, ig] = latE
-				lonFull[ib, ig] = lonE
+		# Calculate center and edges slant range of every beam and gate
+		slantRangeCenter = slantRange(frang, rsep, recrise, gates, center=True) * np.ones((nbeams+1, 1))
+		slantRangeFull = slantRange(frang, rsep, recrise, gates, center=False) * np.ones((nbeams+1, 1))
+		
+		# Then calculate projections of all the cells at once.
+		# The centers use the altitude/elevation of their lower-left corner, as each cell always has
+		tAlt, tElev = altitude, elevation
+		if isinstance(altitude, np.ndarray): tAlt = altitude[:-1,:-1]
+		if isinstance(elevation, np.ndarray): tElev = elevation[:-1,:-1]
+		latCenter, lonCenter = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffCenter[:-1,np.newaxis], \
+						slantRangeCenter[:-1,:-1], elevation=tElev, altitude=tAlt, model=model)
+		latFull, lonFull = calcFieldPnt(siteLat, siteLon, siteAlt*1e-3, siteBore, bOffEdge[:,np.newaxis], \
+						slantRangeFull, elevation=elevation, altitude=altitude, model=model)
+		
+		if(coords == 'mag'):
+			latCenter, lonCenter = _toMag(latCenter, lonCenter)
+			latFull, lonFull = _toMag(latFull, lonFull)
 		
 		# Output is...
-		self.latCenter= latCenter[:-1,:-1]
-		self.lonCenter = lonCenter[:-1,:-1]
+		self.latCenter= latCenter
+		self.lonCenter = lonCenter
 		self.slantRCenter = slantRangeCenter[:-1,:-1]
 		self.latFull = latFull
 		self.lonFull = lonFull
@@ -237,6 +164,187 @@ class fov(object):
 		return outstring
 
 
+# *************************************************************
+# *************************************************************
+def getFov(frang=180.0, rsep=45.0, site=None, \
+		nbeams=None, ngates=None, bmsep=None, recrise=None, \
+		siteLat=None, siteLon=None, siteBore=None, siteAlt=None, \
+		elevation=None, altitude=300., \
+		model='IS', coords='geo'):
+	"""
+Get a fov object for the given inputs, calculating it only if it is not cached 
+already. The inputs are the same as for :class:`fov`. The object is looked up 
+in memory first, then in fovCacheDir if that is set. A newly calculated object 
+is added to both.
+
+The returned object may be shared with other callers, so its arrays are read-only. 
+Copy them before modifying them.
+
+**INPUTS**:
+	* see :class:`fov`
+
+**OUTPUT**:
+	* **fov**: a :class:`fov` object
+
+**EXAMPLE**:
+	::
+
+		site = pydarn.radar.network().getRadarByCode('bks').getSiteByDate(dt.datetime(2012,1,1))
+		myFov = pydarn.radar.radFov.getFov(site=site, rsep=45., ngates=76)
+
+	"""
+	import os, collections
+	global _fovCache
+	
+	args = {'frang': frang, 'rsep': rsep, 'nbeams': nbeams, 'ngates': ngates, 'bmsep': bmsep, \
+			'recrise': recrise, 'siteLat': siteLat, 'siteLon': siteLon, 'siteBore': siteBore, \
+			'siteAlt': siteAlt, 'elevation': elevation, 'altitude': altitude, 'model': model, 'coords': coords}
+	# The site parameters that fov may use
+	if site:
+		for name in ['maxbeam', 'maxgate', 'bmsep', 'recrise', 'geolat', 'geolon', 'alt', 'boresite']:
+			args['site.'+name] = getattr(site, name)
+	key, fname = _fovKey(args)
+	
+	if _fovCache is None: _fovCache = collections.OrderedDict()
+	# Found in memory: move it to the most recently used end
+	if key in _fovCache:
+		obj = _fovCache.pop(key)
+		_fovCache[key] = obj
+		return obj
+	
+	# Then look on disk
+	obj = None
+	if fovCacheDir: obj = _loadFov(os.path.join(fovCacheDir, fname), key)
+	if obj is None:
+		obj = fov(frang=frang, rsep=rsep, site=site, nbeams=nbeams, ngates=ngates, bmsep=bmsep, \
+				recrise=recrise, siteLat=siteLat, siteLon=siteLon, siteBore=siteBore, siteAlt=siteAlt, \
+				elevation=elevation, altitude=altitude, model=model, coords=coords)
+		# fov could not be calculated, so there is nothing to cache
+		if not hasattr(obj, 'latFull'): return obj
+		if fovCacheDir: _saveFov(obj, fovCacheDir, fname, key)
+	
+	for name in _fovArrays: getattr(obj, name).flags.writeable = False
+	_fovCache[key] = obj
+	while len(_fovCache) > fovCacheSize: _fovCache.popitem(last=False)
+	return obj
+
+
+# *************************************************************
+def clearFovCache():
+	"""
+Empty the in-memory fov cache. The files in fovCacheDir are left alone, delete them 
+to clear the on-disk cache.
+	"""
+	global _fovCache
+	_fovCache = None
+
+
+# The array members of a fov object, as saved on disk
+_fovArrays = ['latCenter', 'lonCenter', 'slantRCenter', 'latFull', 'lonFull', 'slantRFull', 'beams', 'gates']
+
+
+# *************************************************************
+def _fovKey(args):
+	"""Makes a hashable key from the inputs of a fov, and the name of its cache file"""
+	import hashlib
+	import numpy as np
+	
+	parts = []
+	for name in sorted(args):
+		v = args[name]
+		if isinstance(v, np.ndarray):
+			v = (v.dtype.str, v.shape, hashlib.sha1(np.ascontiguousarray(v)).hexdigest())
+		elif isinstance(v, (list, tuple)):
+			v = tuple(np.asarray(v, dtype='float').ravel())
+		# 180 and 180.0 (or a numpy float read from hdf5) give the same fov
+		elif isinstance(v, (int, long, float, np.number)) and not isinstance(v, bool):
+			v = float(v)
+		parts.append((name, v))
+	key = tuple(parts)
+	return key, hashlib.sha1(repr(key)).hexdigest() + '.npz'
+
+
+# *************************************************************
+def _loadFov(path, key):
+	"""Reads a fov object from a cache file, or returns None if it is missing or not for this key"""
+	import os
+	import numpy as np
+	
+	if not os.path.exists(path): return None
+	try:
+		with np.load(path) as data:
+			if str(data['key']) != repr(key): return None
+			obj = fov.__new__(fov)
+			for name in _fovArrays: setattr(obj, name, data[name])
+			obj.coords = str(data['coords'])
+	except Exception, e:
+		print 'getFov: could not read {}: {}'.format(path, e)
+		return None
+	return obj
+
+
+# *************************************************************
+def _saveFov(obj, dirName, fname, key):
+	"""Writes a fov object to a cache file. It is written to a temporary file first 
+and renamed, so that other processes never see a partial file"""
+	import os, tempfile
+	import numpy as np
+	
+	tmp = None
+	try:
+		if not os.path.isdir(dirName): os.makedirs(dirName)
+		fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=dirName)
+		with os.fdopen(fd, 'wb') as f:
+			np.savez(f, key=np.array(repr(key)), coords=np.array(obj.coords), \
+					**dict((name, getattr(obj, name)) for name in _fovArrays))
+		os.rename(tmp, os.path.join(dirName, fname))
+	except Exception, e:
+		print 'getFov: could not save to {}: {}'.format(dirName, e)
+		if tmp and os.path.exists(tmp): os.remove(tmp)
+
+
+# *************************************************************
+# *************************************************************
+def _beamParam(param, nbeams, name):
+	"""Makes a frang, rsep or recrise input into a column of shape (nbeams+1,1), or (1,1) for a scalar"""
+	import numpy as np
+	
+	if not isinstance(param, np.ndarray): return np.array([[param]], dtype='float')
+	if len(param) != nbeams: 
+		print 'getFov: {} must be of a scalar or ndarray(nbeams). Using first element: {}'.format(name, param[0])
+		param = param[0] * np.ones(nbeams+1)
+	# Array is adjusted to add on extra beam edge by copying the last element
+	else: param = np.append(param, param[-1])
+	return param[:,np.newaxis].astype('float')
+
+
+# *************************************************************
+def _cellParam(param, nbeams, ngates, name):
+	"""Makes an altitude or elevation array into an array of shape (nbeams+1,ngates+1)"""
+	import numpy as np
+	
+	if param.ndim == 1 and param.size == ngates:
+		# Array is adjusted to add on extra beam/gate edge by copying the last element and replicating the whole array as many times as beams
+		return np.resize( np.append(param, param[-1]), (nbeams+1,ngates+1) ).astype('float')
+	elif param.ndim == 2 and param.shape == (nbeams, ngates):
+		# Array is adjusted to add on extra beam/gate edge by copying the last row and column
+		param = np.append(param, param[-1,:].reshape(1,ngates), axis=0)
+		param = np.append(param, param[:,-1].reshape(nbeams+1,1), axis=1)
+		return param.astype('float')
+	print 'getFov: {} must be of a scalar or ndarray(ngates) or ndarray(nbeans,ngates). Using first element: {}'.format(name, param.flat[0])
+	return param.flat[0] * np.ones((nbeams+1, ngates+1))
+
+
+# *************************************************************
+def _toMag(lat, lon):
+	"""Converts arrays of geographic positions to AACGM, keeping their shape"""
+	import numpy as np
+	import models.aacgm as aacgm
+	
+	mLat, mLon, _ = aacgm.aacgmConvArray(lat, lon, 0., 0)
+	return mLat, mLon
+
+
 # *************************************************************
 # *************************************************************
 def calcFieldPnt(tGeoLat, tGeoLon, tAlt, boreSight, boreOffset, slantRange, \
@@ -248,15 +356,21 @@ field point slant range and altitude. Either the elevation or the altitude must
 be provided. If none is provided, the altitude is set to 300 km and the elevation 
 evaluated to accomodate altitude and range.
 
+boreOffset, slantRange, elevation and altitude can be ndarrays, in which case 
+they are broadcast against each other and all the field points are calculated 
+at once. For the 'IS' and 'GS' models, the elevation is iterated until the altitude 
+converges, for all the points together, each one dropping out once its altitude 
+is within 0.5 km. The results match those of one point at a time to better than 1e-9 degree.
+
 **INPUTS**:
 	* **tGeoLat**: transmitter latitude [degree, N]
 	* **tGeoLon**: transmitter longitude [degree, E]
 	* **tAlt**: transmitter altitude [km]
 	* **boreSight**: boresight azimuth [degree, E]
-	* **boreOffset**: offset from boresight [degree]
-	* **slantRange**: slant range [km]
-	* **elevation**: elevation angle [degree] (estimated if None)
-	* **altitude**: altitude [km] (default 300 km)
+	* **boreOffset**: offset from boresight [degree] (scalar or ndarray)
+	* **slantRange**: slant range [km] (scalar or ndarray)
+	* **elevation**: elevation angle [degree] (estimated if None) (scalar or ndarray)
+	* **altitude**: altitude [km] (default 300 km) (scalar or ndarray)
 	* **model**: 
 		* **'IS'**: for ionopsheric scatter projection model
 		* **'GS'**: for ground scatter projection model
@@ -264,78 +378,104 @@ evaluated to accomodate altitude and range.
 		* ... more to come
 	* **coords**: 'geo' (more to come)
 
+**OUTPUT**:
+	* **lat**: field point latitude [degree] (scalar, or ndarray of the broadcast shape)
+	* **lon**: field point longitude [degree] (scalar, or ndarray of the broadcast shape)
+
 	"""
-	from math import radians, degrees, sin, cos, asin, atan, sqrt, pi
+	import numpy as np
 	from utils import Re, geoPack
 	
 	# Make sure we have enough input stuff
 	# if (not model) and (not elevation or not altitude): model = 'IS'
 	
+	# Broadcast the inputs against each other
+	inputs = [boreOffset, slantRange]
+	if elevation is not None: inputs.append(elevation)
+	if altitude is not None: inputs.append(altitude)
+	inputs = np.broadcast_arrays(*[np.asarray(x, dtype='float') for x in inputs])
+	shape = inputs[0].shape
+	boreOffset, slantRange = inputs[0].ravel(), inputs[1].ravel()
+	if elevation is not None: elevation = inputs[2].ravel()
+	if altitude is not None: altitude = inputs[-1].ravel()
+	
 	# Now let's get to work
 	# Classic Ionospheric/Ground scatter projection model
 	if model in ['IS','GS']:
 		# Make sure you have altitude, because these 2 projection models rely on it
-		if not elevation and not altitude:
+		if elevation is None and altitude is None:
 			# Set default altitude to 300 km
-			altitude = 300.0
-		elif elevation and not altitude:
+			altitude = 300.0 * np.ones(slantRange.size)
+		elif altitude is None:
 			# If you have elevation but not altitude, then you calculate altitude, and elevation will be adjusted anyway
-			altitude = sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re
+			altitude = np.sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * np.sin( np.radians(elevation) ) ) - Re
 		
 		# Now you should have altitude (and maybe elevation too, but it won't be used in the rest of the algorithm)
 		# Adjust altitude so that it makes sense with common scatter distribution
-		xAlt = altitude
-		if model == 'IS':
-			if altitude > 150. and slantRange <= 600: 
-				xAlt = 115.
-			elif altitude > 150. and slantRange > 600. and  slantRange <= 800.:
-				xAlt = 115. + ( slantRange - 600. ) / 200. * ( altitude - 115. )
-		elif model == 'GS':
-			if altitude > 150. and slantRange <= 300: 
-				xAlt = 115.
-			elif altitude > 150. and slantRange > 300. and  slantRange <= 500.:
-				xAlt = 115. + ( slantRange - 300. ) / 200. * ( altitude - 115. )
-		if slantRange < 150.: xAlt = slantRange / 150. * 115.
+		if model == 'IS': rMin = 600.
+		else: rMin = 300.
+		xAlt = altitude.copy()
+		high = altitude > 150.
+		xAlt[high & (slantRange <= rMin)] = 115.
+		ramp = high & (slantRange > rMin) & (slantRange <= rMin + 200.)
+		xAlt[ramp] = 115. + ( slantRange[ramp] - rMin ) / 200. * ( altitude[ramp] - 115. )
+		near = slantRange < 150.
+		xAlt[near] = slantRange[near] / 150. * 115.
 		
 		# To start, set Earth radius below field point to Earth radius at radar
 		(lat,lon,tRe) = geoPack.geodToGeoc(tGeoLat, tGeoLon,into='geoc')
-		RePos = tRe
+		RePos = tRe * np.ones(slantRange.size)
 		
-		# Iterate until the altitude corresponding to the calculated elevation matches the desired altitude
-		n = 0L # safety counter
-		while True:
+		# Iterate until the altitude corresponding to the calculated elevation matches the desired altitude.
+		# Only the points that have not converged yet are recalculated
+		latOut = np.empty(slantRange.size)
+		lonOut = np.empty(slantRange.size)
+		todo = np.arange(slantRange.size)
+		n = 0 # safety counter
+		while todo.size > 0:
+			sr = slantRange[todo]
 			# pointing elevation (spherical Earth value) [degree]
-			tel = degrees( asin( ((RePos+xAlt)**2 - (tRe+tAlt)**2 - slantRange**2) / (2. * (tRe+tAlt) * slantRange) ) )
+			with np.errstate(invalid='ignore'):
+				tel = np.degrees( np.arcsin( ((RePos[todo]+xAlt[todo])**2 - (tRe+tAlt)**2 - sr**2) / (2. * (tRe+tAlt) * sr) ) )
 			
 			# estimate off-array-normal azimuth (because it varies slightly with elevation) [degree]
-			bOff = calcAzOffBore(tel, boreOffset)
+			bOff = calcAzOffBore(tel, boreOffset[todo])
 			
 			# pointing azimuth
 			taz = boreSight + bOff
 			
 			# calculate position of field point
-			dictOut = geoPack.calcDistPnt(tGeoLat, tGeoLon, tAlt, dist=slantRange, el=tel, az=taz)
+			dictOut = geoPack.calcDistPnt(tGeoLat, tGeoLon, tAlt, dist=sr, el=tel, az=taz)
+			latOut[todo] = dictOut['distLat']
+			lonOut[todo] = dictOut['distLon']
 			
 			# Update Earth radius 
-			RePos = dictOut['distRe']
+			RePos[todo] = dictOut['distRe']
 			
-			# stop if the altitude is what we want it to be (or close enough)
-			n += 1L
-			if abs(xAlt - dictOut['distAlt']) <= 0.5 or n > 2:
-				return dictOut['distLat'], dictOut['distLon']
-				break
+			# stop once the altitude is what we want it to be (or close enough)
+			n += 1
+			if n > 2: break
+			todo = todo[~(np.abs(xAlt[todo] - dictOut['distAlt']) <= 0.5)]
 	
 	# No projection model (i.e., the elevation or altitude is so good that it gives you the proper projection by simple geometric considerations)
 	elif not model:
 		# Using no models simply means tracing based on trustworthy elevation or altitude
-		if not altitude:
-			altitude = sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * sin( radians(elevation) ) ) - Re
-		if not elevation:
-			if(slantRange < altitude): altitude = slantRange - 10
-			elevation = degrees( asin( ((Re+altitude)**2 - (Re+tAlt)**2 - slantRange**2) / (2. * (Re+tAlt) * slantRange) ) )
+		if altitude is None:
+			altitude = np.sqrt( Re**2 + slantRange**2 + 2. * slantRange * Re * np.sin( np.radians(elevation) ) ) - Re
+		if elevation is None:
+			altitude = np.where(slantRange < altitude, slantRange - 10, altitude)
+			with np.errstate(invalid='ignore'):
+				elevation = np.degrees( np.arcsin( ((Re+altitude)**2 - (Re+tAlt)**2 - slantRange**2) / (2. * (Re+tAlt) * slantRange) ) )
 		# The tracing is done by calcDistPnt
 		dict = geoPack.calcDistPnt(tGeoLat, tGeoLon, tAlt, dist=slantRange, el=elevation, az=boreSight+boreOffset)
-		return dict['distLat'], dict['distLon']
+		latOut, lonOut = dict['distLat'], dict['distLon']
+	
+	else:
+		print 'calcFieldPnt: {} is not a valid model.'.format(model)
+		return
+	
+	# Scalar inputs give scalar outputs
+	return latOut.reshape(shape)[()], lonOut.reshape(shape)[()]
 	
 
 # *************************************************************
@@ -377,22 +517,21 @@ See Milan et al. [1997] for more details on how this works.
 **INPUTS**:
 	* **elevation**: elevation angle [degree]
 	* **boreOffset0**: zero-elevation off-boresight azimuth [degree]
+	(either can be an ndarray, they are broadcast against each other)
 
 **OUTPUT**:
 	* **boreOffset**: off-boresight azimuth [degree]
 
 	"""
-	from math import radians, degrees, cos, sin, atan, pi, sqrt
+	import numpy as np
 	
-	if ( cos(radians(boreOffset0))**2 - sin(radians(elevation))**2 ) < 0:
-		if boreOffset0 >= 0: boreOffset = pi/2.
-		else: boreOffset = -pi/2.
-	else:
-		tan_bOff = sqrt( sin(radians(boreOffset0))**2 / ( cos(radians(boreOffset0))**2 - sin(radians(elevation))**2 ) )
-		if boreOffset0 >= 0: boreOffset = atan( tan_bOff )
-		else: boreOffset = -atan( tan_bOff )
+	elevation = np.asarray(elevation, dtype='float')
+	boreOffset0 = np.asarray(boreOffset0, dtype='float')
+	den = np.cos(np.radians(boreOffset0))**2 - np.sin(np.radians(elevation))**2
+	with np.errstate(invalid='ignore', divide='ignore'):
+		tan_bOff = np.sqrt( np.sin(np.radians(boreOffset0))**2 / den )
+	# Past the horizon of the array the offset is a right angle
+	boreOffset = np.where(den < 0, np.pi/2., np.arctan( tan_bOff ))
+	boreOffset = np.where(boreOffset0 >= 0, boreOffset, -boreOffset)
 		
-	return degrees(boreOffset)
-
-	
-
+	return np.degrees(boreOffset)[()]
@@ -243,7 +243,7 @@ class network(object):
         """
         from datetime import datetime as dt
         from utils import geoPack as geo
-        from numpy import sin, cos, arccos, dot, cross, sign
+        from numpy import sin, cos, arccos, dot, cross, sign, array
         from math import radians, degrees
         
         if not datetime: datetime = dt.utcnow()
@@ -252,6 +252,8 @@ class network(object):
         out = {'radars': [], 
                 'dist': [], 
                 'beam': []}
+        # Find the radars active at the date, in the same hemisphere
+        rads, sites = [], []
         for iRad in xrange( self.nradar ):
             site = self.radars[iRad].getSiteByDate(datetime)
             # Skip if radar inactive at date
@@ -259,15 +261,21 @@ class network(object):
             if not (self.radars[iRad].stTime <= datetime <= self.radars[iRad].edTime): continue
             # Skip if radar in other hemisphere
             if site.geolat*lat < 0.: continue
-            distPnt = geo.calcDistPnt(site.geolat, site.geolon, site.alt, 
-                            distLat=lat, distLon=lon, distAlt=300.)
+            rads.append(self.radars[iRad])
+            sites.append(site)
+        if not sites: return found
+        # Then the distance and azimuth of the point from all of them at once
+        distPnt = geo.calcDistPnt(array([s.geolat for s in sites]), array([s.geolon for s in sites]), 
+                        array([s.alt for s in sites]), distLat=lat, distLon=lon, distAlt=300.)
+        for iRad in xrange( len(sites) ):
+            site = sites[iRad]
             # Skip if radar too far
-            if distPnt['dist'] > distMax: continue
+            if distPnt['dist'][iRad] > distMax: continue
             # minAz = (site.boresite % 360.)-abs(site.bmsep)*site.maxbeam/2
             # maxAz = (site.boresite % 360.)+abs(site.bmsep)*site.maxbeam/2
             extFov = abs(site.bmsep)*site.maxbeam/2
             ptBo = [cos(radians(site.boresite)), sin(radians(site.boresite))]
-            ptAz = [cos(radians(distPnt['az'])), sin(radians(distPnt['az']))]
+            ptAz = [cos(radians(distPnt['az'][iRad])), sin(radians(distPnt['az'][iRad]))]
             deltAz = degrees( arccos( dot(ptBo, ptAz) ) )
             # Skip if out of azimuth range
             if not abs(deltAz) <= extFov: continue
@@ -277,8 +285,8 @@ class network(object):
                 beam = int( site.maxbeam/2 - round( deltAz/site.bmsep ) )
             # Update output
             found = True
-            out['radars'].append(self.radars[iRad])
-            out['dist'].append(distPnt['dist'])
+            out['radars'].append(rads[iRad])
+            out['dist'].append(distPnt['dist'][iRad])
             out['beam'].append(beam)
 
         if found: return out
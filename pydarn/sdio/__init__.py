@@ -11,10 +11,18 @@ This includes the following module(s):
 		defines the fundamental radar data types
 	radDataRead
 		contains the functions necessary for reading radar data
+	dmapIndex
+		record-offset indices for seeking within dmap files
+	radDataMerge
+		reads several radars concurrently as one time-ordered stream
+	fileCache
+		a size-bounded local cache for downloaded and filtered files
 	pygridIo
 		library for reading and writing pygrid files
 	dbUtils
 		general utilities for database maintenance
+	dbIndex
+		index management and query benchmarks for the radData collection
 	dbRead
 		library for reading records from the database
 
@@ -31,6 +39,24 @@ try:
 	from radDataRead import *
 except: print 'problem importing radDataRead'
 	
+try:
+	import dmapIndex
+	from dmapIndex import *
+except Exception,e: 
+	print 'problem importing dmapIndex: ', e
+
+try:
+	import radDataMerge
+	from radDataMerge import *
+except Exception,e: 
+	print 'problem importing radDataMerge: ', e
+
+try:
+	import fileCache
+	from fileCache import *
+except Exception,e: 
+	print 'problem importing fileCache: ', e
+
 try:
 	import pygridIo
 	from pygridIo import *
@@ -47,4 +73,10 @@ try:
 	import dbUtils
 	from dbUtils import *
 except Exception,e: 
-	print 'problem importing dbUtils: ', e
\ No newline at end of file
+	print 'problem importing dbUtils: ', e
+
+try:
+	import dbIndex
+	from dbIndex import *
+except Exception,e: 
+	print 'problem importing dbIndex: ', e
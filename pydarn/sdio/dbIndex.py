@@ -0,0 +1,211 @@
+"""
+.. module:: dbIndex
+   :synopsis: index management and query benchmarks for the radData collection
+
+*********************
+**Module**: pydarn.sdio.dbIndex
+*********************
+The indices of the radData beams collection are defined here, one
+compound index per query shape that :func:`dbUtils.readFromDb` emits.
+Each one has the equality fields first and time last, so a query can
+use the index for the time range and for the sort by time:
+
+  * radar queries, stid + time range [+ channel + cp]: (stid, time)
+  * single beam queries, stid + bmnum + time range [+ channel + cp]: (stid, bmnum, time)
+  * all radar queries, time range [+ bmnum + channel + cp], and the upserts
+    of :func:`dbUtils.mapDbFit`: (time, stid, bmnum, channel, cp)
+
+The file type flag is left out of the keys, since nearly every beam has
+fitex data and it would not narrow the scan.
+
+The indices can be migrated from the command line with::
+
+  python -m pydarn.sdio.dbIndex migrate
+  python -m pydarn.sdio.dbIndex bench 20110101 33
+
+**Functions**:
+  * :func:`ensureRadDataIndices`
+  * :func:`migrateRadDataIndices`
+  * :func:`explainQuery`
+  * :func:`benchmarkQueries`
+"""
+
+from pydarn.sdio.radDataTypes import cipher
+
+#the indices of the beams collection, as (name, keys)
+radDataIndices = [ \
+  ('stid_time', [(cipher['stid'],1),(cipher['time'],1)]), \
+  ('stid_bmnum_time', [(cipher['stid'],1),(cipher['bmnum'],1),(cipher['time'],1)]), \
+  ('time_key', [(cipher['time'],1),(cipher['stid'],1),(cipher['bmnum'],1), \
+                (cipher['channel'],1),(cipher['cp'],1)]), \
+]
+
+#the single field indices that mapDbFit used to make, which are dropped
+#by migrateRadDataIndices
+legacyIndices = [cipher[x]+'_1' for x in \
+  ['time','bmnum','channel','stid','cp','exflg','acflg','lmflg','iqflg','rawflg']]
+
+def _writeConn(beams):
+  """a write connection to the beams collection, unless one was given"""
+  import os
+  if(beams != None): return beams
+  from pydarn.sdio.dbUtils import getDataConn
+  return getDataConn(username=os.environ['DBWRITEUSER'],password=os.environ['DBWRITEPASS'])
+
+def ensureRadDataIndices(beams=None):
+  """Makes any of the radDataIndices that the beams collection does not have yet.  An index with the same keys under another name counts as present.
+
+  .. note::
+    this is a write operation, so you must have DBWRITEUSER and DBWRITEPASS defined
+
+  **Args**:
+    * **[beams]**: a connection to the beams collection.  if this is None, a write connection is made.  default = None
+  **Returns**:
+    * **made** (list): the names of the indices that were made
+  **Example**:
+    ::
+
+      ensureRadDataIndices()
+  """
+  beams = _writeConn(beams)
+  have = [tuple(v['key']) for v in beams.index_information().itervalues()]
+  made = []
+  for name,keys in radDataIndices:
+    if(tuple(keys) in have): continue
+    beams.create_index(keys,name=name,background=True)
+    made.append(name)
+  return made
+
+def migrateRadDataIndices(beams=None, dropLegacy=True, dryRun=False):
+  """Brings the indices of the beams collection up to date: makes the missing radDataIndices and drops the legacy single field ones.  The new indices are made before anything is dropped, so queries keep an index throughout.
+
+  .. note::
+    this is a write operation, so you must have DBWRITEUSER and DBWRITEPASS defined
+
+  **Args**:
+    * **[beams]**: a connection to the beams collection.  if this is None, a write connection is made.  default = None
+    * **[dropLegacy]** (bool): drop the indices in legacyIndices.  default = True
+    * **[dryRun]** (bool): only print what would be done.  default = False
+  **Returns**:
+    * **actions** (list): the actions taken, as ('create'|'drop', name)
+  **Example**:
+    ::
+
+      migrateRadDataIndices(dryRun=True)
+  """
+  beams = _writeConn(beams)
+  info = beams.index_information()
+  have = [tuple(v['key']) for v in info.itervalues()]
+
+  actions = []
+  for name,keys in radDataIndices:
+    if(tuple(keys) not in have): actions.append(('create',name))
+  if(dropLegacy):
+    for name in legacyIndices:
+      if(info.has_key(name)): actions.append(('drop',name))
+
+  for action,name in actions:
+    print action,name
+    if(dryRun): continue
+    if(action == 'create'):
+      beams.create_index(dict(radDataIndices)[name],name=name,background=True)
+    else:
+      beams.drop_index(name)
+  return actions
+
+def _indexNames(stage):
+  """the names of the indices used by a query plan stage and its inputs"""
+  names = []
+  if(stage.has_key('indexName')): names.append(stage['indexName'])
+  for sub in [stage.get('inputStage')]+stage.get('inputStages',[]):
+    if(sub != None): names.extend(_indexNames(sub))
+  return names
+
+def explainQuery(beams=None, **qryArgs):
+  """Runs a query the way :func:`dbUtils.readFromDb` would and reports how the server executed it.
+
+  **Args**:
+    * **[beams]**: a connection to the beams collection.  if this is None, a read connection is made.  default = None
+    * **qryArgs**: the arguments of readFromDb, eg sTime, eTime, stid, channel, bmnum, cp, fileType
+  **Returns**:
+    * **stats** (dict): with the keys
+      * **index** (str): the index used, or 'COLLSCAN'
+      * **nReturned** (int): the number of documents returned
+      * **keysExamined** (int): the number of index keys examined
+      * **docsExamined** (int): the number of documents examined
+      * **millis** (int): the execution time on the server in ms
+  **Example**:
+    ::
+
+      stats = explainQuery(sTime=dt.datetime(2011,1,1),stid=33,bmnum=7)
+  """
+  from pydarn.sdio.dbUtils import dbQuery, getDataConn
+  if(beams == None): beams = getDataConn()
+  qryDict,exDict = dbQuery(**qryArgs)
+  exp = beams.find(qryDict,exDict).sort(cipher['time'],1).explain()
+  names = _indexNames(exp['queryPlanner']['winningPlan'])
+  ex = exp['executionStats']
+  return {'index':','.join(names) if len(names) > 0 else 'COLLSCAN', \
+          'nReturned':ex['nReturned'],'keysExamined':ex['totalKeysExamined'], \
+          'docsExamined':ex['totalDocsExamined'],'millis':ex['executionTimeMillis']}
+
+def benchmarkQueries(sTime, stid, eTime=None, channel='a', bmnum=7, fileType='fitex', repeat=3, beams=None):
+  """Times representative readFromDb queries against a database and prints the latency, the documents examined and the index used for each.  Point SDDB at a local mongod to compare indices.
+
+  **Args**:
+    * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the start of the time range to query
+    * **stid** (int): the station id of a radar that has data at sTime
+    * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the end of the time range.  if this is None, it is 1 day after sTime.  default = None
+    * **[channel]** (str): the channel used in the channel queries.  default = 'a'
+    * **[bmnum]** (int): the beam used in the beam queries.  default = 7
+    * **[fileType]** (str): the file type to query.  default = 'fitex'
+    * **[repeat]** (int): the number of times each query is timed, the best is reported.  default = 3
+    * **[beams]**: a connection to the beams collection.  if this is None, a read connection is made.  default = None
+  **Returns**:
+    * **results** (list): one (name, seconds, stats) per query, where stats is from :func:`explainQuery`
+  **Example**:
+    ::
+
+      benchmarkQueries(dt.datetime(2011,1,1),33)
+  """
+  import datetime as dt, time
+  from pydarn.sdio.dbUtils import dbQuery, getDataConn
+
+  if(beams == None): beams = getDataConn()
+  if(eTime == None): eTime = sTime+dt.timedelta(days=1)
+  hour = min(eTime,sTime+dt.timedelta(hours=1))
+  queries = [ \
+    ('radar', dict(sTime=sTime,eTime=eTime,stid=stid)), \
+    ('radar+channel', dict(sTime=sTime,eTime=eTime,stid=stid,channel=channel)), \
+    ('radar+beam', dict(sTime=sTime,eTime=eTime,stid=stid,bmnum=bmnum)), \
+    ('radar+beam+channel', dict(sTime=sTime,eTime=eTime,stid=stid,bmnum=bmnum,channel=channel)), \
+    ('all radars, 1 hour', dict(sTime=sTime,eTime=hour)), \
+    ('all radars+beam, 1 hour', dict(sTime=sTime,eTime=hour,bmnum=bmnum)), \
+  ]
+
+  results = []
+  print '%-24s %9s %9s %9s %9s  %s' % ('query','ms','returned','keys','docs','index')
+  for name,args in queries:
+    args['fileType'] = fileType
+    qryDict,exDict = dbQuery(**args)
+    best = None
+    for i in range(repeat):
+      t0 = time.time()
+      for rec in beams.find(qryDict,exDict).sort(cipher['time'],1).batch_size(1000): pass
+      t = time.time()-t0
+      if(best == None or t < best): best = t
+    stats = explainQuery(beams=beams,**args)
+    print '%-24s %9.1f %9d %9d %9d  %s' % (name,best*1e3,stats['nReturned'], \
+      stats['keysExamined'],stats['docsExamined'],stats['index'])
+    results.append((name,best,stats))
+  return results
+
+if __name__ == '__main__':
+  import sys, datetime as dt
+  if(len(sys.argv) > 1 and sys.argv[1] == 'migrate'):
+    migrateRadDataIndices(dryRun=('--dry-run' in sys.argv))
+  elif(len(sys.argv) > 3 and sys.argv[1] == 'bench'):
+    benchmarkQueries(dt.datetime.strptime(sys.argv[2],'%Y%m%d'),int(sys.argv[3]))
+  else:
+    print 'usage: python -m pydarn.sdio.dbIndex migrate [--dry-run]'
+    print '       python -m pydarn.sdio.dbIndex bench yyyymmdd stid'
@@ -8,18 +8,37 @@
 *********************
 **Functions**:
   * :func:`getServerConn`
+  * :func:`closeServerConns`
   * :func:`getDbConn`
   * :func:`getDataConn`
   * :func:`updateDbDict`
+  * :func:`bulkUpsert`
+  * :func:`printRate`
+  * :func:`dbFieldName`
+  * :func:`dbQuery`
   * :func:`readFromDb`
+  * :func:`readFromDbColumns`
   * :func:`mapDbFit`
+  * :func:`mapDbFitDays`
+**Classes**:
+  * :class:`dbCursor`
 """
 
 
 from pymongo import MongoClient
 from pydarn.sdio import *
 from pydarn.sdio.radDataTypes import *
-import pydarn, datetime, os
+import pydarn, pymongo, datetime, os, threading
+
+#the most connections each shared client keeps open to the server,
+#with pymongo 3
+dbPoolSize = 10
+#the number of seconds an unused pooled connection is kept open
+dbIdleTimeout = 300
+#one shared client per (username, password, dbAddress), along with the
+#pid of the process that made it, so that a forked child makes its own
+_serverConns = {}
+_serverConnsLock = threading.Lock()
 
 
 def getServerConn(username=os.environ['DBREADUSER'],password=os.environ['DBREADPASS'],\
@@ -34,6 +53,14 @@ def getServerConn(username=os.environ['DBREADUSER'],password=os.environ['DBREADP
 
   **NOTE**: mongodb hierarchy goes SERVER->DATABASE->COLLECTION
 
+  **NOTE**: the connection is a pooled client shared by every call with
+    the same username, password and dbAddress in this process, so only
+    the first call connects and authenticates.  It is safe to use from
+    several threads.  With pymongo 3, the pool size and idle timeout
+    are set by dbUtils.dbPoolSize and dbUtils.dbIdleTimeout.  pymongo 2
+    does not take these options, so it uses its own defaults.  A process
+    forked by multiprocessing makes its own client on first use.
+
   **INPUTS**:
     **[username]**: the username to connect with.  
      default is the read-only user defined in .bashrc
@@ -52,17 +79,49 @@ def getServerConn(username=os.environ['DBREADUSER'],password=os.environ['DBREADP
   Written by AJ 20130108
   """
   
-  #get a server connection
-  try:
-    sConn = MongoClient('mongodb://'+username+':'+password+'@'+dbAddress)
-  #check for error
-  except Exception,e:
-    print e
-    print 'problem getting connection to server',dbAddress
-    sConn = None
+  key = (username,password,dbAddress)
+  with _serverConnsLock:
+    #reuse the client made by this process, if there is one
+    pid,sConn = _serverConns.get(key,(None,None))
+    if(sConn != None and pid == os.getpid()): return sConn
+    #get a server connection
+    try:
+      opts = {}
+      if(pymongo.version_tuple[0] >= 3):
+        opts = {'maxPoolSize':dbPoolSize,'maxIdleTimeMS':int(dbIdleTimeout*1000)}
+      sConn = MongoClient('mongodb://'+username+':'+password+'@'+dbAddress,**opts)
+      _serverConns[key] = (os.getpid(),sConn)
+    #check for error
+    except Exception,e:
+      print e
+      print 'problem getting connection to server',dbAddress
+      sConn = None
     
   #return connection for good, none for bad
   return sConn
+
+def closeServerConns():
+  """
+  **PACKAGE**: pydarn.sdio.dbUtils
+  **FUNCTION**: closeServerConns()
+  **PURPOSE**: closes the shared server connections made by this
+    process.  The next call to getServerConn connects again.
+
+  **INPUTS**:
+    NONE
+
+  **OUTPUTS**:
+    NONE
+
+  **EXAMPLES**:
+    closeServerConns()
+
+  """
+  with _serverConnsLock:
+    for key,(pid,sConn) in _serverConns.items():
+      #clients inherited from a parent process are left alone
+      if(pid == os.getpid()): sConn.close()
+    _serverConns.clear()
   
 def getDbConn(username=os.environ['DBREADUSER'],password=os.environ['DBREADPASS'],\
               dbAddress=os.environ['SDDB'],dbName='radData'):
@@ -191,71 +250,189 @@ def updateDbDict(dbDict,dmapDict):
           print 'problem changing value'
   #return the updated dictionary
   return dbDict
-  
-  
-def readFromDb(sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=None, fileType='fitex',exactFlg=False):
+
+def bulkUpsert(coll, docs, keyFields, replace=False, batchSize=1000, insertOnly=None):
   """
 | **PACKAGE**: pydarn.sdio.dbUtils
-| **FUNCTION**: readFromDb([sTime],[eTime],[stid],[channel],[bmnum],[cp],\
-|                           [fileType],[exactFlg])
-| **PURPOSE**: read some record(s) from the mongodb database
+| **FUNCTION**: bulkUpsert(coll,docs,keyFields,[replace],[batchSize],[insertOnly])
+| **PURPOSE**: writes documents to a collection in unordered bulk
+|   upserts, matching existing documents on a natural key instead of
+|   querying for each one first
 |
-| **NOTE**:  I recommend making your query as specific as possible, as this
-|   will speed up the read speeds.  The biggest limiting factor is network speed,
-|   so be specific.  For even higher performance, consider writing your own
-|   mongodb queries
+| **INPUTS**:
+|   **coll**: the collection to write to, eg from getDataConn
+|   **docs**: an iterable of the documents to write
+|   **keyFields**: the fields that identify a document, eg ['time','res']
+|   **[replace]**: if True, an existing document is replaced by the new
+|     one.  if False, the fields of the new document are set on the
+|     existing one and its other fields are kept.  default = False
+|   **[batchSize]**: the number of documents sent to the server per
+|     bulk write.  default = 1000
+|   **[insertOnly]**: with replace=False, the fields that are only
+|     written when a new document is inserted, so that an existing
+|     document keeps its values of them.  default = None
+|
+| **OUTPUTS**:
+|   **nDocs**: the number of documents written
+|
+| **NOTE**: the documents that fail are reported by raising a
+|   pymongo BulkWriteError once every batch has been sent, so the others
+|   are still written.  its details hold the server's counts, eg
+|   'nUpserted', 'nMatched' and 'writeErrors', summed over the batches.
+|   this works with pymongo 2.7 and later, using the bulk builder of
+|   pymongo 2 and bulk_write of pymongo 3
+|
+| **EXAMPLES**:
+|   n = bulkUpsert(coll,(rec.toDbDict() for rec in recs),['time'],replace=True)
+  """
+  import pymongo
+  from pymongo.errors import BulkWriteError
+
+  result = {'nUpserted':0,'nMatched':0,'writeErrors':[]}
+
+  def flush(ops):
+    #unordered, so the server can apply the batch in parallel and one
+    #bad document does not stop the rest
+    if(pymongo.version_tuple[0] >= 3):
+      reqs = []
+      for key,update,rep in ops:
+        if(rep): reqs.append(pymongo.ReplaceOne(key,update,upsert=True))
+        else: reqs.append(pymongo.UpdateOne(key,update,upsert=True))
+      execute = lambda: coll.bulk_write(reqs,ordered=False).bulk_api_result
+    else:
+      bulk = coll.initialize_unordered_bulk_op()
+      for key,update,rep in ops:
+        if(rep): bulk.find(key).upsert().replace_one(update)
+        else: bulk.find(key).upsert().update_one(update)
+      execute = bulk.execute
+    try: res = execute()
+    except BulkWriteError,e: res = e.details
+    result['nUpserted'] += res.get('nUpserted',0)
+    result['nMatched'] += res.get('nMatched',0)
+    result['writeErrors'].extend(res.get('writeErrors',[]))
+
+  ops = []
+  for doc in docs:
+    doc.pop('_id',None)
+    key = dict([(k,doc[k]) for k in keyFields])
+    if(replace): ops.append((key,doc,True))
+    elif(insertOnly):
+      onInsert = dict([(k,doc.pop(k)) for k in insertOnly if doc.has_key(k)])
+      ops.append((key,{'$set':doc,'$setOnInsert':onInsert},False))
+    else: ops.append((key,{'$set':doc},False))
+    if(len(ops) >= batchSize):
+      flush(ops)
+      ops = []
+  if(len(ops) > 0): flush(ops)
+
+  if(len(result['writeErrors']) > 0):
+    print 'error, bulk write failed for',len(result['writeErrors']),'documents'
+    print result['writeErrors'][0]['errmsg']
+    raise BulkWriteError(result)
+  return result['nUpserted']+result['nMatched']
+
+def printRate(what, nDocs, t0):
+  """
+| **PACKAGE**: pydarn.sdio.dbUtils
+| **FUNCTION**: printRate(what,nDocs,t0)
+| **PURPOSE**: prints the throughput of a database load
 |
 | **INPUTS**:
-|   **[sTime]**: a datetime object with the time to start reading.
-|     if this is None, sTime is defined as 00:00 UT on 1 Jan 2011.
-|     default: None
-|   **[eTime]**: a datetime object specifying the last record to read.
-|     if this is none, the first record after sTime (within 24 hours,
-|     provided it exists) will be read.  defualt = None
-|   **[stid]**: the station id of the radar we want data for.  if this is
-|     None, all available radars will be read.  default = None
-|   **[channel]**: the channel letter for which to read data.  if this
-|     is None, data from all channels will be read.  default = None
-|   **[bmnum]**: the beam number for which to read data.  if this is None,
-|     data from all beams will be read.  default = None
-|   **[cp]**: the control program for which to read data.  if this is None,
-|     data from all control programs will be read.  default = None
-|   **[fileType]**: the filetype for which to read data.  valid inputs are:
-|     'fitex' [default], 'fitacf', 'lmfit', 'rawacf', 'iqdat'.  if a fit file 
-|     type is specified but data is not found, the program will search for another
-|     fit type.
-|   **[exactFlg]**: a flag to indicate the we only want a record with EXACTLY
-|     the params specified (including time, to the ms).  this is useful for
-|     updating records.  default = False
+|   **what**: a description of what was loaded, eg 'bks 20110101'
+|   **nDocs**: the number of documents written
+|   **t0**: a datetime object with the time the load started
+|
+| **OUTPUTS**:
+|   NONE
+|
+| **EXAMPLES**:
+|   printRate('dst 2011',n,t0)
+  """
+  dt = datetime.datetime.now()-t0
+  dt = max(dt.days*86400.+dt.seconds+dt.microseconds*1e-6,1e-6)
+  print '%s: wrote %d records in %.1f s (%.0f records/s)' % (what,nDocs,dt,nDocs/dt)
+
+
+class dbCursor(object):
+  """
+| **PACKAGE**: pydarn.sdio.dbUtils
+| **CLASS**: dbCursor
+| **PURPOSE**: wraps a pymongo cursor whose first record has already
+|   been read, so that readFromDb can tell whether there are any results
+|   without a separate count query.  it iterates like the cursor itself.
+  """
+  def __init__(self, cursor, first):
+    self.cursor = cursor
+    self.collection = cursor.collection
+    self._first = [first]
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    if(len(self._first) > 0): return self._first.pop()
+    return self.cursor.next()
+
+  def close(self):
+    self._first = []
+    self.cursor.close()
+
+def dbFieldName(field, fileType='fitex'):
+  """
+| **PACKAGE**: pydarn.sdio.dbUtils
+| **FUNCTION**: dbFieldName(field,[fileType])
+| **PURPOSE**: translates a beamData attribute name into the name
+|   of the field in the radData collection
+|
+| **INPUTS**:
+|   **field**: the attribute name, with a dot for nested attributes,
+|     eg 'bmnum', 'prm.nrang' or 'fit.v'
+|   **[fileType]**: the file type that 'fit' refers to.  default = 'fitex'
 |
 | **OUTPUTS**:
-|   **myData**: a list of pydarn.sdio.beamData objects in chronological order
+|   **name**: the mongodb field name, eg 'b', 'p.nr' or 'ex.v'
 | 
 | **EXAMPLES**:
-    >>> myData = readFromDb(sTime=atime,stid=33,channel='a',bmnum=7,cp=153,fileType='fitacf',exactFlg=True)
-|   
-| Written by AJ 20130108
+|   name = dbFieldName('fit.v',fileType='fitacf')
   """
-  import datetime as dt
-  import operator
+  parts = field.split('.')
+  if(parts[0] == 'fit'): parts[0] = fileType
+  return '.'.join([cipher[x] for x in parts])
 
-  t = dt.datetime.now()
+def dbQuery(sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=None, fileType='fitex', \
+            exactFlg=False, fields=None):
+  """
+| **PACKAGE**: pydarn.sdio.dbUtils
+| **FUNCTION**: dbQuery([sTime],[eTime],[stid],[channel],[bmnum],[cp],\
+|                        [fileType],[exactFlg],[fields])
+| **PURPOSE**: builds the query and projection that readFromDb sends
+|   to the radData collection, eg for explaining or benchmarking it
+|
+| **INPUTS**:
+|   the same as readFromDb
+|
+| **OUTPUTS**:
+|   **qryDict**: the query document
+|   **exDict**: the projection document
+| 
+| **EXAMPLES**:
+|   qryDict,exDict = dbQuery(sTime=atime,stid=33,bmnum=7)
+  """
+  import datetime as dt
   
   #a list which will contain our query criteria
   qryList = []
-  singFlg = False
 
   #if a start time is not provided, use a default
   if(sTime == None): sTime = dt.datetime(2011,1,1)
   
   #if we want only a single exact time (useful for filling/updating database)
-  if(exactFlg): qryList.append({"time": sTime})
+  if(exactFlg): qryList.append({cipher["time"]: sTime})
   #otherwise query for a time range
   else:
     #if endtime is not provided, use a 24-hour window
     if(eTime == None): 
       eTime = sTime+dt.timedelta(hours=24)
-      singFlg = True
     #query for time later than start time and less than end time
     qryList.append({cipher["time"]: {"$lte": eTime}})
     qryList.append({cipher["time"]: {"$gte": sTime}})
@@ -266,9 +443,6 @@ def readFromDb(sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=N
   if(bmnum != None): qryList.append({cipher["bmnum"]: bmnum})
   if(cp != None): qryList.append({cipher["cp"]: cp})
   
-  #get a data connection for the mongodb database
-  beams = getDataConn()
-  
   #some arrays for dealing with data types
   if(fileType == 'fitex'): flg = 'exflg'
   elif(fileType == 'fitacf'): flg = 'acflg'
@@ -283,28 +457,157 @@ def readFromDb(sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=N
   
   #make a dictionary telling which data types NOT to get,
   #eg dont get rawacf, iqdat, fitacf, lmfit for fitex request
-  exDict = {}
-  for key,val in refArr.iteritems():
-    if(key != flg): exDict[cipher[val]] = 0
+  if(fields == None):
+    exDict = {}
+    for key,val in refArr.iteritems():
+      if(key != flg): exDict[cipher[val]] = 0
+  #or, only get the fields that were asked for
+  else:
+    exDict = dict((dbFieldName(x,fileType),1) for x in \
+                  ['time','stid','channel','bmnum','cp',flg]+list(fields))
+  return qryDict,exDict
+
+def readFromDb(sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=None, fileType='fitex', \
+                exactFlg=False, fields=None, batchSize=1000):
+  """
+| **PACKAGE**: pydarn.sdio.dbUtils
+| **FUNCTION**: readFromDb([sTime],[eTime],[stid],[channel],[bmnum],[cp],\
+|                           [fileType],[exactFlg],[fields],[batchSize])
+| **PURPOSE**: read some record(s) from the mongodb database
+|
+| **NOTE**:  I recommend making your query as specific as possible, as this
+|   will speed up the read speeds.  The biggest limiting factor is network speed,
+|   so be specific.  For even higher performance, consider writing your own
+|   mongodb queries
+|
+| **INPUTS**:
+|   **[sTime]**: a datetime object with the time to start reading.
+|     if this is None, sTime is defined as 00:00 UT on 1 Jan 2011.
+|     default: None
+|   **[eTime]**: a datetime object specifying the last record to read.
+|     if this is none, the first record after sTime (within 24 hours,
+|     provided it exists) will be read.  defualt = None
+|   **[stid]**: the station id of the radar we want data for.  if this is
+|     None, all available radars will be read.  default = None
+|   **[channel]**: the channel letter for which to read data.  if this
+|     is None, data from all channels will be read.  default = None
+|   **[bmnum]**: the beam number for which to read data.  if this is None,
+|     data from all beams will be read.  default = None
+|   **[cp]**: the control program for which to read data.  if this is None,
+|     data from all control programs will be read.  default = None
+|   **[fileType]**: the filetype for which to read data.  valid inputs are:
+|     'fitex' [default], 'fitacf', 'lmfit', 'rawacf', 'iqdat'.  if a fit file 
+|     type is specified but data is not found, the program will search for another
+|     fit type.
+|   **[exactFlg]**: a flag to indicate the we only want a record with EXACTLY
+|     the params specified (including time, to the ms).  this is useful for
+|     updating records.  default = False
+|   **[fields]**: a list of the beamData attributes to fetch, eg
+|     ['prm.nrang','fit.slist','fit.v'].  time, stid, channel, bmnum and cp
+|     are always fetched.  if this is None, everything for fileType is
+|     fetched.  default = None
+|   **[batchSize]**: the number of records fetched from the server per
+|     round trip.  default = 1000
+|
+| **OUTPUTS**:
+|   **myData**: a cursor over the matching records in chronological order,
+|     or None if there are none
+| 
+| **EXAMPLES**:
+    >>> myData = readFromDb(sTime=atime,stid=33,channel='a',bmnum=7,cp=153,fileType='fitacf',exactFlg=True)
+|   
+| Written by AJ 20130108
+  """
+  #build the query and the fields to fetch
+  qryDict,exDict = dbQuery(sTime=sTime,eTime=eTime,stid=stid,channel=channel,bmnum=bmnum, \
+                           cp=cp,fileType=fileType,exactFlg=exactFlg,fields=fields)
+  
+  #get a data connection for the mongodb database
+  beams = getDataConn()
     
   #do the actual query
-  qry = beams.find(qryDict,exDict)
-  #check if we have any results
+  qry = beams.find(qryDict,exDict).sort(cipher['time'],1).batch_size(batchSize)
+  #check if we have any results by reading the first one, rather
+  #than with a separate count query
   try:
-    count = qry.count()
+    first = next(qry,None)
   except Exception,e:
     print e
-    count = 0
-  if(count > 0):
-    return qry
+    first = None
+  if(first != None):
+    return dbCursor(qry,first)
   else:
     return None
     
-def mapDbFit(dateStr, rad, time=[0,2400], fileType='fitex', vb=0):
+def readFromDbColumns(sTime=None, eTime=None, stid=None, channel=None, bmnum=None, cp=None, \
+                      fileType='fitex', batchSize=10000):
+  """
+| **PACKAGE**: pydarn.sdio.dbUtils
+| **FUNCTION**: readFromDbColumns([sTime],[eTime],[stid],[channel],[bmnum],\
+|                                  [cp],[fileType],[batchSize])
+| **PURPOSE**: bulk read records from the mongodb database into columns.
+|   only the fields of the columns are fetched, the cursor is drained in
+|   large batches, and no beamData objects are built.  the output is laid
+|   out like that of pydarn.dmapio.readDmapFile and
+|   pydarn.sdio.radDataRead.beamsToColumns.  each column is built
+|   with one numpy call per batch of documents, see
+|   pydarn.sdio.radDataRead.makeColumns
+|
+| **INPUTS**:
+|   the same as readFromDb, except:
+|   **[batchSize]**: the number of records fetched from the server per
+|     round trip.  default = 10000
+|
+| **OUTPUTS**:
+|   **cols**: a dict of numpy arrays, 'time' (epoch seconds) and the
+|     scalars with one value per record, and the per-gate vectors
+|     concatenated, where record i owns
+|     cols['slist'][cols['offsets'][i]:cols['offsets'][i+1]].
+|     None if there are no matching records
+| 
+| **EXAMPLES**:
+|   cols = readFromDbColumns(sTime=atime,eTime=btime,stid=33,fileType='fitacf')
+  """
+  from pydarn.sdio.radDataRead import colScalars, colVectors, makeColumns, concatColumns
+  from itertools import islice
+  import numpy as np
+
+  #the fields of the columns, and where they are in a beam
+  prmKeys = [key for key,dtype,default in colScalars[4:]]
+  fitKeys = [key for key,dtype,default in colVectors]
+  fields = ['prm.'+key for key in prmKeys]+['fit.'+key for key in fitKeys]
+  qry = readFromDb(sTime=sTime,eTime=eTime,stid=stid,channel=channel,bmnum=bmnum,cp=cp, \
+                    fileType=fileType,fields=fields,batchSize=batchSize)
+  if(qry == None): return None
+
+  tKey,prmKey,fitKey = cipher['time'],cipher['prm'],cipher[fileType]
+  chanNum = dict((alpha[i],i+1) for i in range(len(alpha)))
+  #gather each field over a batch of documents at a time, so only one
+  #batch of documents is held at once
+  parts = []
+  while(True):
+    batch = list(islice(qry,batchSize))
+    if(len(batch) == 0): break
+    times = np.array([rec[tKey] for rec in batch],dtype='datetime64[us]')
+    times = times.astype(np.int64)*1e-6
+    scalars = dict((key,[rec.get(cipher[key]) for rec in batch]) for key in ['stid','bmnum','cp'])
+    scalars['channel'] = [chanNum.get(rec.get(cipher['channel'])) for rec in batch]
+    prms = [rec.get(prmKey) or {} for rec in batch]
+    for key in prmKeys: scalars[key] = [prm.get(cipher[key]) for prm in prms]
+    fits = [rec.get(fitKey) or {} for rec in batch]
+    vectors = dict((key,[fit.get(cipher[key]) for fit in fits]) for key in fitKeys)
+    parts.append(makeColumns(times,scalars,vectors))
+  qry.close()
+  return concatColumns(parts)
+
+def mapDbFit(dateStr, rad, time=[0,2400], fileType='fitex', vb=0, batchSize=1000):
   """
 | **PACKAGE**: pydarn.sdio.dbUtils
-| **FUNCTION**: mapDbFit(dateStr, rad, [time], [fileType], [vb]):
-| **PURPOSE**: put dmap data into the mongodb database
+| **FUNCTION**: mapDbFit(dateStr, rad, [time], [fileType], [vb], [batchSize]):
+| **PURPOSE**: put dmap data into the mongodb database.  beams are
+|   written in unordered bulk upserts on time/stid/bmnum/channel/cp, and
+|   a beam that is already in the database has its fields for this
+|   file type updated, keeping those of the other file types
 |
 | **NOTE**: this is a write operation, so you must have DBWRITEUSER
 |   and DBWRITEPASS defined in your ~/.bashrc.  these can be obtained
@@ -318,9 +621,11 @@ def mapDbFit(dateStr, rad, time=[0,2400], fileType='fitex', vb=0):
 |   **[fileType]**: the file type for which to perform the operation.
 |     valid inputs are 'fitex' [default], 'fitacf', 'lmfit', 'rawacf' , 'iqdat'
 |   **[vb]**: a flag for verbose output.  default = 0
+|   **[batchSize]**: the number of beams sent to the server per bulk
+|     write.  default = 1000
 |
 | **OUTPUTS**:
-|   NONE
+|   **nDocs**: the number of beams written, or None if there was an error
 | 
 | **EXAMPLES**:
 |   mapDbFit('20110710', 'bks', time=[0,240], fileType='fitacf', vb=1):
@@ -364,48 +669,102 @@ def mapDbFit(dateStr, rad, time=[0,2400], fileType='fitex', vb=0):
     print 'error connecting to database for writing'
     return None
   
-  #ensure all necessary indices
-  beams.ensure_index(cipher['time'])
-  beams.ensure_index(cipher['bmnum'])
-  beams.ensure_index(cipher['channel'])
-  beams.ensure_index(cipher['stid'])
-  beams.ensure_index(cipher['cp'])
-  beams.ensure_index(cipher['exflg'])
-  beams.ensure_index(cipher['acflg'])
-  beams.ensure_index(cipher['lmflg'])
-  beams.ensure_index(cipher['iqflg'])
-  beams.ensure_index(cipher['rawflg'])
+  #ensure all necessary indices, see dbIndex
+  from pydarn.sdio.dbIndex import ensureRadDataIndices
+  ensureRadDataIndices(beams)
   
-  #go until the end of file
-  while(dmapBeam != None):
-    #check that we're in the time window
-    if(dmapBeam.time > etime): break
-    if(dmapBeam.time <= etime):
+  #the natural key of a beam sounding, which upserts are matched on
+  keyFields = [cipher['time'],cipher['stid'],cipher['bmnum'],cipher['channel'],cipher['cp']]
+  #the subdocuments and flags of the other file types are empty in these
+  #beams, so they are only written to new documents.  a beam that is
+  #already stored keeps what was mapped into it from the other file types
+  others = [f for f in ['fitex','fitacf','lmfit','rawacf','iqdat'] if f != myFile.fType]
+  insertOnly = [cipher[f] for f in others]+[cipher[refArr[f]] for f in others]
+
+  def dbDicts(dmapBeam):
+    #go until the end of file
+    while(dmapBeam != None):
+      #check that we're in the time window
+      if(dmapBeam.time > etime): break
       #check for verbose output
       if(vb): print dmapBeam.time,dmapBeam.stid
       del dmapBeam.fType
       del dmapBeam.fit
       del dmapBeam.rawacf.parent
       #convert the dmap dict to a db dictionary
-      dmapDict = dmapBeam.toDbDict()
-      
-      #perform a query (search for already existent entry
-      qry = beams.find({'$and':[{cipher["time"]: dmapBeam.time}, {cipher["bmnum"]: dmapBeam.bmnum}, \
-                                {cipher["channel"]: dmapBeam.channel}, {cipher["stid"]: dmapBeam.stid}, \
-                                {cipher["cp"]: dmapBeam.cp}]})
-      #check for a new entry
-      if(qry.count() == 0):
-        #inster the data
-        beams.insert(dmapDict)
-      #if this beam sounding already exists
-      else:
-        #update the data
-        dbDict = qry.next()
-        dbDict = updateDbDict(dbDict,dmapDict)
-        beams.save(dbDict)
-    #read the next record from the dmap file
-    dmapBeam = radDataReadRec(myFile)
+      yield dmapBeam.toDbDict()
+      #read the next record from the dmap file
+      dmapBeam = radDataReadRec(myFile)
+
+  t0 = datetime.datetime.now()
+  nDocs = bulkUpsert(beams,dbDicts(dmapBeam),keyFields,batchSize=batchSize,insertOnly=insertOnly)
+  if(vb): printRate(rad+' '+dateStr,nDocs,t0)
     
-  
   #close the dmap file
   myFile.close()
+  return nDocs
+
+def _mapDbFitTask(args):
+  """the pool worker for mapDbFitDays: map one radar-day and return (rad,dateStr,nDocs,seconds)"""
+  rad,dateStr,fileType,batchSize = args
+  t0 = datetime.datetime.now()
+  try: nDocs = mapDbFit(dateStr,rad,fileType=fileType,batchSize=batchSize)
+  except Exception,e:
+    print e
+    print 'problem mapping',rad,dateStr
+    nDocs = None
+  dt = datetime.datetime.now()-t0
+  return rad,dateStr,nDocs,dt.days*86400.+dt.seconds+dt.microseconds*1e-6
+
+def mapDbFitDays(sDate, eDate, rads, fileType='fitex', nProcs=4, batchSize=1000):
+  """
+| **PACKAGE**: pydarn.sdio.dbUtils
+| **FUNCTION**: mapDbFitDays(sDate,eDate,rads,[fileType],[nProcs],[batchSize])
+| **PURPOSE**: put several days of dmap data from several radars into
+|   the mongodb database, one radar-day per task across a pool of
+|   processes, printing the throughput of each task and of the whole load
+|
+| **NOTE**: this is a write operation, see mapDbFit
+|
+| **INPUTS**:
+|   **sDate**: a datetime object with the first day to map
+|   **eDate**: a datetime object with the last day to map
+|   **rads**: a list of three letter radar codes, e.g. ['bks','fhe']
+|   **[fileType]**: the file type to map, see mapDbFit.  default = 'fitex'
+|   **[nProcs]**: the number of processes to use.  default = 4
+|   **[batchSize]**: the number of beams sent to the server per bulk
+|     write.  default = 1000
+|
+| **OUTPUTS**:
+|   **nDocs**: the total number of beams written
+| 
+| **EXAMPLES**:
+|   mapDbFitDays(datetime.datetime(2011,1,1),datetime.datetime(2011,12,31),['bks','fhe','fhw'],nProcs=8)
+  """
+  import multiprocessing as mp
+
+  assert(isinstance(rads,list)),"error, rads must be a list, eg ['bks']"
+  assert(eDate >= sDate),'error, eDate is before sDate'
+
+  tasks = []
+  myDate = sDate
+  while(myDate <= eDate):
+    for rad in rads: tasks.append((rad,myDate.strftime('%Y%m%d'),fileType,batchSize))
+    myDate += datetime.timedelta(days=1)
+
+  t0 = datetime.datetime.now()
+  total = 0
+  pool = mp.Pool(processes=nProcs)
+  try:
+    for rad,dateStr,nDocs,secs in pool.imap_unordered(_mapDbFitTask,tasks):
+      if(nDocs == None): continue
+      total += nDocs
+      print '%s %s: wrote %d beams in %.1f s (%.0f beams/s)' % (rad,dateStr,nDocs,secs,nDocs/max(secs,1e-6))
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+  printRate('mapDbFitDays',total,t0)
+  return total
@@ -0,0 +1,144 @@
+"""
+.. module:: dmapIndex
+   :synopsis: a record-offset index for dmap files
+
+*********************
+**Module**: pydarn.sdio.dmapIndex
+*********************
+An index holds the byte offset, epoch time, stid, bmnum, channel and cp
+of every record in a dmap file.  It is stored as an npz file in a local
+cache directory, keyed by the path of the file it describes.  Setting
+writeSidecars to True stores it next to the data file instead, when that
+directory is writable; a sidecar that already exists is always used.
+The index is rebuilt whenever the size or mtime of the source file
+changes.
+
+For uncompressed files the offsets let a reader seek straight to a
+record.  A .bz2 or .gz file can't be entered part way through, so
+seeking into one still decompresses everything up to the offset; the
+index only saves decoding those records, and lets whole files which end
+before the requested time be skipped without being read.
+radDataOpen avoids this by decompressing such files once into the file
+cache and seeking in the copy, using the index of the original file.
+
+**Functions**:
+  * :func:`getDmapIndex`
+  * :func:`dmapIndexPath`
+  * :func:`findFirstRec`
+"""
+
+import os
+
+#where indices are stored
+indexCacheDir = os.path.join(os.path.expanduser('~'),'.davitpy','dmapIndex')
+#whether to store indices next to the data files, where we can
+writeSidecars = False
+
+def dmapIndexPath(srcName, cacheDir=None, sidecar=None):
+  """Returns the path of the index file for a dmap (or compressed dmap) file.  This is in the cache directory unless sidecar is set and the directory of srcName is writable.
+
+  **Args**:
+    * **srcName** (str): the data file the index describes
+    * **[cacheDir]** (str): the directory to store indices in.  default = indexCacheDir
+    * **[sidecar]** (bool): whether to use the sidecar location, srcName+'.idx.npz'.  default = writeSidecars
+  **Returns**:
+    * **idxName** (str): the path of the index file
+  **Example**:
+    ::
+
+      idxName = dmapIndexPath('/sd-data/2011/fitex/bks/20110101.00.bks.fitex.bz2')
+  """
+  import hashlib
+
+  srcName = os.path.abspath(srcName)
+  if(sidecar == None): sidecar = writeSidecars
+  if(sidecar and os.access(os.path.dirname(srcName),os.W_OK)):
+    return srcName+'.idx.npz'
+  if(cacheDir == None): cacheDir = indexCacheDir
+  return os.path.join(cacheDir,hashlib.sha1(srcName).hexdigest()+'.idx.npz')
+
+def getDmapIndex(srcName, dmapName=None, cacheDir=None):
+  """Loads the record index of a dmap file, building and storing it first if it is missing or stale.
+
+  **Args**:
+    * **srcName** (str): the data file the index describes.  its size and mtime are used to invalidate the index, so this should be the original (possibly compressed) file
+    * **[dmapName]** (str): an uncompressed copy of srcName to scan if the index has to be built.  if None, srcName itself is scanned, decompressing it on the fly if it is a .bz2 or .gz file.  default = None
+    * **[cacheDir]** (str): the directory to store indices in.  default = indexCacheDir
+  **Returns**:
+    * **idx** (dict): numpy arrays 'offset', 'time', 'stid', 'bmnum', 'channel' and 'cp', one entry per record.  None if the index could not be built
+  **Example**:
+    ::
+
+      idx = getDmapIndex('/sd-data/2011/fitex/bks/20110101.00.bks.fitex.bz2')
+  """
+  import numpy as np
+  import pydarn
+  from pydarn.sdio.radDataTypes import dmapStream
+
+  try: st = os.stat(srcName)
+  except OSError: return None
+  idxName = dmapIndexPath(srcName,cacheDir=cacheDir)
+
+  #try the stored index first, including a sidecar someone else wrote
+  for name in [os.path.abspath(srcName)+'.idx.npz',idxName]:
+    try:
+      stored = np.load(name)
+      if(int(stored['size']) == st.st_size and int(stored['mtime']) == int(st.st_mtime)):
+        return dict((key,stored[key]) for key in ['offset','time','stid','bmnum','channel','cp'])
+    except Exception:
+      pass
+
+  #otherwise build it from the uncompressed data
+  try:
+    if(dmapName == None): f = dmapStream([srcName])
+    else: f = open(dmapName,'r')
+    idx = pydarn.dmapio.readDmapIndex(f)
+    f.close()
+  except Exception,e:
+    print e
+    print 'problem indexing',srcName
+    return None
+
+  #write to a temporary name and rename, so concurrent readers never
+  #see a partial index
+  try:
+    d = os.path.dirname(idxName)
+    if not os.path.exists(d):
+      os.makedirs(d)
+    tmpName = idxName+'.'+str(os.getpid())+'.npz'
+    np.savez(tmpName,size=st.st_size,mtime=int(st.st_mtime),**idx)
+    os.rename(tmpName,idxName)
+  except Exception,e:
+    print e
+    print 'could not store index for',srcName
+
+  return idx
+
+def findFirstRec(idx, sTime, stid=None, channel=None, cp=None):
+  """Finds the first record in an index at or after sTime which matches the requested parameters.
+
+  **Args**:
+    * **idx** (dict): an index, as returned by :func:`getDmapIndex`
+    * **sTime** (float): the start time, in epoch seconds
+    * **[stid]** (int): the station id to match.  records with stid 0 always match.  default = None
+    * **[channel]** (str): the 1-letter channel to match.  default = None
+    * **[cp]** (int): the control program to match.  default = None
+  **Returns**:
+    * **offset** (int): the byte offset of the record, or None if no record matches
+  **Example**:
+    ::
+
+      offset = findFirstRec(idx, 1293840000., stid=33, channel='a')
+  """
+  import numpy as np
+  from pydarn.sdio.radDataTypes import alpha
+
+  mask = idx['time'] >= sTime
+  if(stid != None): mask &= (idx['stid'] == stid) | (idx['stid'] == 0)
+  if(channel != None):
+    if(channel == 'a'): mask &= idx['channel'] < 2
+    else: mask &= idx['channel'] == alpha.index(channel)+1
+  if(cp != None): mask &= idx['cp'] == cp
+  match = np.flatnonzero(mask)
+  if(len(match) == 0): return None
+  return int(idx['offset'][match[0]])
@@ -0,0 +1,164 @@
+"""
+.. module:: fileCache
+   :synopsis: a size-bounded local cache for downloaded and filtered data files
+
+*********************
+**Module**: pydarn.sdio.fileCache
+*********************
+Files are stored under a key made from the paths, sizes and mtimes of
+the sources they were made from, so a changed source gets a new entry
+and an unchanged one is reused.  When the cache grows past its byte
+budget the least recently used entries are deleted.  Entries are built
+under a per-key lock and renamed into place, so several processes can
+share the cache safely.
+
+**Functions**:
+  * :func:`fileKey`
+  * :func:`getCachedFile`
+  * :func:`evictCache`
+"""
+
+import os
+
+#where cached files are kept
+cacheDir = '/tmp/fit/cache'
+#the most bytes the cache may hold
+cacheMaxBytes = 2*1024**3
+#entries used more recently than this many seconds ago are never evicted,
+#so that a file is not deleted between being looked up and being opened
+cacheGrace = 300
+
+def fileKey(srcs, tag=''):
+  """Makes a cache key from the path, size and mtime of each source.
+
+  **Args**:
+    * **srcs** (list): the sources, either file names or (name, size, mtime) tuples for files that are not local, eg on an sftp server
+    * **[tag]** (str): distinguishes entries made from the same sources in different ways.  default = ''
+  **Returns**:
+    * **key** (str): a hex digest
+  **Example**:
+    ::
+
+      key = fileKey(['/sd-data/2011/fitex/bks/20110101.00.bks.fitex.bz2'],tag='fitexfilter')
+  """
+  import hashlib
+
+  h = hashlib.sha1(tag)
+  for src in srcs:
+    if(isinstance(src,str)):
+      st = os.stat(src)
+      src = (os.path.abspath(src),st.st_size,int(st.st_mtime))
+    h.update('\0'+'\0'.join([str(x) for x in src]))
+  return h.hexdigest()
+
+def getCachedFile(key, build, suffix='', cacheDir=None, maxBytes=None):
+  """Returns the cached file for a key, building it first if it is not in the cache.
+
+  **Args**:
+    * **key** (str): the key of the entry, see :func:`fileKey`
+    * **build** (function): called as build(fileName) to write the entry when it is missing.  it should raise an exception if it fails
+    * **[suffix]** (str): appended to the name of the cached file, eg '.fitex'.  default = ''
+    * **[cacheDir]** (str): the cache directory.  default = fileCache.cacheDir
+    * **[maxBytes]** (int): the byte budget to evict down to after adding an entry.  default = fileCache.cacheMaxBytes
+  **Returns**:
+    * **fileName** (str): the path of the cached file
+  **Example**:
+    ::
+
+      fileName = getCachedFile(key, lambda name: sftp.get(remoteName,name), suffix='.fitex')
+  """
+  import fcntl
+
+  if(cacheDir == None): cacheDir = globals()['cacheDir']
+  if not os.path.exists(cacheDir):
+    try: os.makedirs(cacheDir)
+    except OSError: pass
+  fileName = os.path.join(cacheDir,key+suffix)
+
+  #only one process builds an entry, the others wait and then reuse it
+  lock = _lockKey(os.path.join(cacheDir,key+'.lock'))
+  try:
+    if(os.path.isfile(fileName)):
+      #mark it as recently used
+      os.utime(fileName,None)
+      return fileName
+    tmpName = fileName+'.'+str(os.getpid())+'.tmp'
+    try:
+      build(tmpName)
+      os.rename(tmpName,fileName)
+    finally:
+      if(os.path.exists(tmpName)): os.remove(tmpName)
+  finally:
+    fcntl.flock(lock,fcntl.LOCK_UN)
+    lock.close()
+
+  evictCache(maxBytes=maxBytes,cacheDir=cacheDir)
+  return fileName
+
+def _lockKey(lockName):
+  """open and exclusively lock the lock file of an entry.  evictCache deletes lock files while holding them, so if the file was unlinked while we waited for it, the lock is on a dead inode and we try again with the new file"""
+  import fcntl
+
+  while(True):
+    lock = open(lockName,'a')
+    fcntl.flock(lock,fcntl.LOCK_EX)
+    try:
+      if(os.fstat(lock.fileno()).st_ino == os.stat(lockName).st_ino): return lock
+    except OSError: pass
+    fcntl.flock(lock,fcntl.LOCK_UN)
+    lock.close()
+
+def evictCache(maxBytes=None, cacheDir=None):
+  """Deletes the least recently used entries until the cache holds no more than maxBytes.  Entries used in the last cacheGrace seconds are kept.
+
+  **Args**:
+    * **[maxBytes]** (int): the byte budget.  default = fileCache.cacheMaxBytes
+    * **[cacheDir]** (str): the cache directory.  default = fileCache.cacheDir
+  **Returns**:
+    * **freed** (int): the number of bytes deleted
+  **Example**:
+    ::
+
+      evictCache(maxBytes=0)
+  """
+  import fcntl, time
+
+  if(maxBytes == None): maxBytes = cacheMaxBytes
+  if(cacheDir == None): cacheDir = globals()['cacheDir']
+  if not os.path.isdir(cacheDir): return 0
+
+  lock = open(os.path.join(cacheDir,'.evict.lock'),'w')
+  try:
+    fcntl.flock(lock,fcntl.LOCK_EX)
+    entries,total = [],0
+    for name in os.listdir(cacheDir):
+      if(name.startswith('.') or name.endswith('.lock') or name.endswith('.tmp')): continue
+      path = os.path.join(cacheDir,name)
+      try: st = os.stat(path)
+      except OSError: continue
+      entries.append((st.st_mtime,st.st_size,name))
+      total += st.st_size
+    entries.sort()
+    freed,now = 0,time.time()
+    for mtime,size,name in entries:
+      if(total <= maxBytes or now-mtime < cacheGrace): break
+      #an entry is only deleted while holding its lock, and is skipped
+      #if another process holds it.  the lock file is removed under the
+      #lock too, see _lockKey
+      lockName = os.path.join(cacheDir,name.split('.')[0]+'.lock')
+      keyLock = open(lockName,'a')
+      try:
+        try: fcntl.flock(keyLock,fcntl.LOCK_EX|fcntl.LOCK_NB)
+        except IOError: continue
+        try: os.remove(os.path.join(cacheDir,name))
+        except OSError: continue
+        try: os.remove(lockName)
+        except OSError: pass
+      finally:
+        keyLock.close()
+      total -= size
+      freed += size
+  finally:
+    fcntl.flock(lock,fcntl.LOCK_UN)
+    lock.close()
+  return freed
@@ -45,7 +45,7 @@ def combBeams(scan):
 
       #initialize a new beam object
       myBeam.copyData(beams[0])
-      for key,val in myBeam.fit.__dict__.iteritems(): 
+      for key,val in myBeam.fit.iterAttrs(): 
         setattr(myBeam.fit,key,[])
       myBeam.prm.nrang = nrang
 
@@ -56,7 +56,7 @@ def combBeams(scan):
         if cnt/pos > .5:
           myBeam.fit.slist.append(j)
           myBeam.fit.qflg = 1
-          for key in myBeam.fit.__dict__.iterkeys():
+          for key,val in myBeam.fit.iterAttrs():
             if key == 'qflg' or key == 'gflg' or key == 'slist':
               continue
             arr = []
@@ -151,7 +151,7 @@ def doFilter(scans,thresh=.4):
     #make a new beam
     myBeam = pydarn.sdio.beamData()
     myBeam.copyData(b)
-    for key,val in myBeam.fit.__dict__.iteritems(): 
+    for key,val in myBeam.fit.iterAttrs(): 
       setattr(myBeam.fit,key,[])
 
     for r in range(0,b.prm.nrang):
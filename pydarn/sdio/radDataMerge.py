@@ -0,0 +1,137 @@
+"""
+.. module:: radDataMerge
+   :synopsis: read several radars at once as one time-ordered stream
+
+*********************
+**Module**: pydarn.sdio.radDataMerge
+*********************
+Each radar is opened and read in its own worker process, so that the
+decompression and decoding of the different radars runs on different
+cores.  Workers hand their beams over in batches through a bounded
+queue, which stops a fast radar from running far ahead of the others,
+and the batches are merged into a single stream sorted by beam time.
+
+**Classes**:
+  * :class:`mergedRadDataPtr`
+"""
+
+def _radReader(sTime, rad, eTime, openArgs, batchSize, outQ):
+  """the worker process for one radar: open it and put batches of beams on outQ, followed by None when done"""
+  from pydarn.sdio.radDataRead import radDataOpen, radDataReadBatch
+  try:
+    myPtr = radDataOpen(sTime,rad,eTime=eTime,**openArgs)
+    if(myPtr != None):
+      while(1):
+        beams = radDataReadBatch(myPtr,batchSize)
+        if(beams == None): break
+        outQ.put(beams)
+  except Exception,e:
+    print e
+    print 'problem reading',rad
+  finally:
+    outQ.put(None)
+
+class mergedRadDataPtr():
+  """A pipeline to the data of several radars, read concurrently and merged in time order.  Iterating over it yields :class:`radDataTypes.beamData` objects from all of the radars, sorted by time.  Beams with the same time come out in the order of rads.
+
+  **Attrs**:
+    * **rads** (list): the 3-letter codes of the radars
+    * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): start time of the request
+    * **eTime** (`datetime <http://tinyurl.com/bl352yx>`_): end time of the request
+  **Methods**:
+    * :func:`firstBeams`
+    * :func:`close`
+  **Example**:
+    ::
+
+      import datetime as dt
+      myPtr = pydarn.sdio.mergedRadDataPtr(dt.datetime(2011,1,1),['bks','fhe','fhw'],channel='a')
+      for myBeam in myPtr:
+        print myBeam.time,myBeam.stid
+
+  """
+  def __init__(self, sTime, rads, eTime=None, batchSize=256, prefetch=4, **openArgs):
+    """
+    **Args**:
+      * **sTime** (`datetime <http://tinyurl.com/bl352yx>`_): the beginning time for which you want data
+      * **rads** (list): the 3-letter codes of the radars you want data for
+      * **[eTime]** (`datetime <http://tinyurl.com/bl352yx>`_): the last time that you want data for.  if this is set to None, it will be set to 1 day after sTime.  default = None
+      * **[batchSize]** (int): the number of beams a worker reads and hands over at a time.  default = 256
+      * **[prefetch]** (int): the number of batches each worker may read ahead of the merge.  default = 4
+      * **[openArgs]**: any other keywords are passed on to :func:`radDataRead.radDataOpen`, eg channel, bmnum, fileType, filtered
+    """
+    import multiprocessing as mp, datetime as dt
+
+    assert(isinstance(sTime,dt.datetime)), \
+      'error, sTime must be datetime object'
+    assert(isinstance(rads,list) and len(rads) > 0), \
+      "error, rads must be a list, eg ['bks'] or ['bks','fhe']"
+    assert(isinstance(prefetch,int) and prefetch > 0), \
+      'error, prefetch must be a positive int'
+    if(eTime == None): eTime = sTime+dt.timedelta(days=1)
+
+    self.rads = list(rads)
+    self.sTime = sTime
+    self.eTime = eTime
+    self._queues, self._procs = [], []
+    #the current batch of each radar and our position in it, a batch of
+    #None means the radar has no more data
+    self._batches = [[] for r in self.rads]
+    self._pos = [0 for r in self.rads]
+    for r in self.rads:
+      q = mp.Queue(maxsize=prefetch)
+      p = mp.Process(target=_radReader,args=(sTime,r,eTime,openArgs,batchSize,q))
+      p.daemon = True
+      p.start()
+      self._queues.append(q)
+      self._procs.append(p)
+
+  def _head(self, i):
+    """the next beam of radar i, without consuming it.  None when the radar is finished"""
+    while(self._batches[i] != None and self._pos[i] >= len(self._batches[i])):
+      self._batches[i] = self._queues[i].get()
+      self._pos[i] = 0
+    if(self._batches[i] == None): return None
+    return self._batches[i][self._pos[i]]
+
+  def firstBeams(self):
+    """Returns the next beam of each radar without consuming it.  Before iterating, this is the first beam of each radar, eg for working out fields of view.
+
+    **Args**:
+      * Nothing.
+    **Returns**:
+      * **beams** (list): one :class:`radDataTypes.beamData` per radar in rads, None for the radars without (any more) data
+    **Example**:
+      ::
+
+        beams = myPtr.firstBeams()
+    """
+    return [self._head(i) for i in range(len(self.rads))]
+
+  def __iter__(self):
+    """yield the beams of all of the radars in time order"""
+    import heapq
+    heap = []
+    for i in range(len(self.rads)):
+      b = self._head(i)
+      if(b != None): heap.append((b.time,i))
+    heapq.heapify(heap)
+    try:
+      while(len(heap) > 0):
+        t,i = heap[0]
+        yield self._batches[i][self._pos[i]]
+        self._pos[i] += 1
+        b = self._head(i)
+        if(b != None): heapq.heapreplace(heap,(b.time,i))
+        else: heapq.heappop(heap)
+    finally:
+      self.close()
+
+  def close(self):
+    """Stops the workers and releases their queues"""
+    for p in self._procs:
+      if(p.is_alive()): p.terminate()
+      p.join()
+    for q in self._queues: q.close()
+    self._procs, self._queues = [], []
+    self._batches = [None for r in self.rads]
@@ -12,11 +12,16 @@
   * :func:`radDataOpen`
   * :func:`radDataReadRec`
   * :func:`radDataReadScan`
+  * :func:`radDataReadBatch`
+  * :func:`beamsToColumns`
+  * :func:`makeColumns`
+  * :func:`concatColumns`
+  * :func:`dmapFilterArgs`
 """
 
 def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
                 fileType='fitex',filtered=False, src=None,fileName=None, \
-                custType='fitex'):
+                custType='fitex',fields=None):
 
   """A function to establish a pipeline through which we can read radar data.  first it tries the mongodb, then it tries to find local files, and lastly it sftp's over to the VT data server.
 
@@ -32,6 +37,7 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
     * **[src]** (str): the source of the data.  valid inputs are 'mongo' 'local' 'sftp'.  if this is set to None, it will try all possibilites sequentially.  default = None
     * **[fileName]** (str): the name of a specific file which you want to open.  default=None
     * **[custType]** (str): if fileName is specified, the filetype of the file.  default='fitex'
+    * **[fields]** (list): the beamData attributes to fetch when reading from the mongodb, eg ['prm.nrang','fit.slist','fit.v'], so that only the data you will use is transferred.  the beams read will have None for everything else.  ignored for files.  default=None (everything)
   **Returns**:
     * **myPtr** (:class:`radDataTypes.radDataPtr`): a radDataPtr object which contains a link to the data to be read.  this can then be passed to radDataReadRec in order to actually read the data.
     
@@ -44,9 +50,11 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
   Written by AJ 20130110
   """
   import subprocess as sub, paramiko as p, re, string
-  import datetime as dt, os, pydarn.sdio, glob
-  from pydarn.sdio import radDataPtr
+  import datetime as dt, os, pydarn.sdio, glob, shutil
+  from pydarn.sdio import radDataPtr, dmapStream
   from pydarn.radar import network
+  from pydarn.sdio.dmapIndex import getDmapIndex, findFirstRec
+  from pydarn.sdio.fileCache import fileKey, getCachedFile
   from utils.timeUtils import datetimeToEpoch
   
   #check inputs
@@ -71,6 +79,8 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
     'error, filtered must be True of False'
   assert(src == None or src == 'mongo' or src == 'local' or src == 'sftp'), \
     'error, src must be one of None,local,mongo,sftp'
+  assert(fields == None or isinstance(fields,list)), \
+    'error, fields must be None or a list'
     
   if(eTime == None):
     eTime = sTime+dt.timedelta(days=1)
@@ -80,17 +90,24 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
                       channel=channel,bmnum=bmnum,cp=cp)
   
   filelist = []
+  #the files in filelist which can be indexed, None for the others
+  srclist = []
+  #what each file in filelist was made from, for cache keys.  a local
+  #path, or a (name, size, mtime) tuple for a file on the sftp server
+  keylist = []
+
+  def inflateFile(srcName, outName):
+    #write the data of a (possibly compressed) dmap file to outName
+    inp,out = dmapStream([srcName]),open(outName,'wb')
+    shutil.copyfileobj(inp,out,1048576)
+    inp.close()
+    out.close()
   if(fileType == 'fitex'): arr = ['fitex','fitacf','lmfit']
   elif(fileType == 'fitacf'): arr = ['fitacf','fitex','lmfit']
   elif(fileType == 'lmfit'): arr = ['lmfit','fitex','fitacf']
   else: arr = [fileType]
   #move back a little in time because files often start at 2 mins after the hour
   sTime = sTime-dt.timedelta(minutes=4)
-  #a temporary directory to store a temporary file
-  tmpDir = '/tmp/fit/'
-  d = os.path.dirname(tmpDir)
-  if not os.path.exists(d):
-    os.makedirs(d)
 
   #FIRST, check if a specific filename was given
   if(fileName != None):
@@ -98,19 +115,9 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
       if(not os.path.isfile(fileName)):
         print 'problem reading',fileName,':file does not exist'
         return None
-      outname = tmpDir+str(int(datetimeToEpoch(dt.datetime.now())))
-      if(string.find(fileName,'.bz2') != -1):
-        outname = string.replace(fileName,'.bz2','')
-        print 'bunzip2 -c '+fileName+' > '+outname+'\n'
-        os.system('bunzip2 -c '+fileName+' > '+outname)
-      elif(string.find(fileName,'.gz') != -1):
-        outname = string.replace(fileName,'.gz','')
-        print 'gunzip -c '+fileName+' > '+outname+'\n'
-        os.system('gunzip -c '+fileName+' > '+outname)
-      else:
-        os.system('cp '+fileName+' '+outname)
-        print 'cp '+fileName+' '+outname
-      filelist.append(outname)
+      filelist.append(fileName)
+      srclist.append(fileName)
+      keylist.append(fileName)
       myPtr.fType,myPtr.dType = custType,'dmap'
     except Exception, e:
       print e
@@ -141,18 +148,10 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
             dateStr = ctime.strftime("%Y%m%d")
             #iterate through all of the files which begin in this hour
             for filename in glob.glob(myDir+dateStr+'.'+hrStr+form):
-              outname = string.replace(filename,myDir,tmpDir)
-              #unzip the compressed file
-              if(string.find(filename,'.bz2') != -1):
-                outname = string.replace(outname,'.bz2','')
-                print 'bunzip2 -c '+filename+' > '+outname+'\n'
-                os.system('bunzip2 -c '+filename+' > '+outname)
-              else:
-                outname = string.replace(outname,'.gz','')
-                print 'gunzip -c '+filename+' > '+outname+'\n'
-                os.system('gunzip -c '+filename+' > '+outname)
-              
-              filelist.append(outname)
+              print 'found '+filename
+              filelist.append(filename)
+              srclist.append(filename)
+              keylist.append(filename)
             ##################################################################
             ### END SECTION YOU WILL HAVE TO CHANGE
             ##################################################################
@@ -177,7 +176,7 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
       print '\nLooking on mongodb for',ftype,'data'
       myPtr.ptr = pydarn.sdio.readFromDb(sTime=myPtr.sTime, eTime=myPtr.eTime, stid=myPtr.stid, \
                   channel=myPtr.channel, bmnum=myPtr.bmnum, cp=myPtr.cp, \
-                  fileType=fileType,exactFlg=False)
+                  fileType=ftype,exactFlg=False,fields=fields)
       if(myPtr.ptr != None): 
         print 'found',ftype,'data on mongodb'
         myPtr.dType,myPtr.fType = 'mongo',ftype
@@ -220,24 +219,25 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
             for aFile in allFiles:
               #if we have a file match between a file and our regex
               if(regex.match(aFile)): 
-                print 'copying file '+myDir+aFile+' to '+tmpDir+aFile
-                filename = tmpDir+aFile
-                #download the file via sftp
-                sftp.get(myDir+aFile,filename)
-                #unzip the compressed file
-                if(string.find(filename,'.bz2') != -1):
-                  outname = string.replace(filename,'.bz2','')
-                  print 'bunzip2 -c '+filename+' > '+outname+'\n'
-                  os.system('bunzip2 -c '+filename+' > '+outname)
-                elif(string.find(filename,'.gz') != -1):
-                  outname = string.replace(filename,'.gz','')
-                  print 'gunzip -c '+filename+' > '+outname+'\n'
-                  os.system('gunzip -c '+filename+' > '+outname)
-                else:
-                  print 'It seems we have downloaded an uncompressed file :/'
-                  print 'Strange things might happen from here on out...'
-                  
-                filelist.append(outname)
+                #download and decompress the file, unless we already
+                #have this version of it in the local cache
+                st = sftp.stat(myDir+aFile)
+                remote = (os.environ['VTDB']+':'+myDir+aFile,st.st_size,st.st_mtime)
+                def fetch(name):
+                  #the download keeps the file's ending, so that it is
+                  #decompressed the right way
+                  tmpName = name+'.'+aFile
+                  try:
+                    sftp.get(myDir+aFile,tmpName)
+                    inflateFile(tmpName,name)
+                  finally:
+                    if(os.path.exists(tmpName)): os.remove(tmpName)
+                print 'copying file '+myDir+aFile+' to the local cache'
+                filename = getCachedFile(fileKey([remote],tag='inflate'),fetch, \
+                                          suffix='.'+re.sub('\.(bz2|gz)$','',aFile))
+                filelist.append(filename)
+                srclist.append(None)
+                keylist.append(remote)
               
             ctime = ctime+dt.timedelta(hours=1)
           if(len(filelist) > 0):
@@ -253,22 +253,57 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
         
   #check if we have found files
   if(len(filelist) != 0):
-    #concatenate the files into a single file
-    print 'Concatenating all the files in to one'
-    tmpName = tmpDir+str(int(datetimeToEpoch(dt.datetime.now())))+'.'+rad+'.'+fileType
-    print 'cat '+string.join(filelist)+' > '+tmpName
-    os.system('cat '+string.join(filelist)+' > '+tmpName)
-    for filename in filelist:
-      print 'rm '+filename
-      os.system('rm '+filename)
-      
-    #filter(if desired) and open the file
-    if(not filtered): myPtr.ptr = open(tmpName,'r')
+    #compressed files are decompressed once into the local cache, so
+    #that opening them again, eg for another beam, reads the copy
+    for i in range(len(filelist)):
+      if(not re.search('\.(bz2|gz)$',filelist[i])): continue
+      try:
+        filelist[i] = getCachedFile(fileKey([keylist[i]],tag='inflate'), \
+                        lambda name: inflateFile(filelist[i],name), \
+                        suffix='.'+re.sub('\.(bz2|gz)$','',os.path.basename(filelist[i])))
+      except Exception,e:
+        print e
+        print 'problem caching',filelist[i],', it will be decompressed as it is read'
+    #stream the files straight from disk, if we don't need to filter
+    if(not filtered):
+      #use the record indices to skip the files which end before
+      #sTime, and to find the first record we want in the next one.
+      #an index is keyed by the original file, and its offsets hold in
+      #the decompressed copy, which is seeked into directly
+      startFile,startOff = 0,0
+      for i in range(len(filelist)):
+        startFile,startOff = i,0
+        idx = None
+        if(srclist[i] != None): idx = getDmapIndex(srclist[i],dmapName=filelist[i])
+        if(idx == None): break
+        recOff = findFirstRec(idx,datetimeToEpoch(myPtr.sTime),stid=myPtr.stid, \
+                              channel=myPtr.channel,cp=myPtr.cp)
+        if(recOff != None):
+          startOff = recOff
+          break
+        startFile = i+1
+      myPtr.ptr = dmapStream(filelist[startFile:],offset=startOff)
+    #fitexfilter needs one real file, so join the files into one.  the
+    #filtered output is cached, keyed by the files it was made from
     else:
-      print 'fitexfilter '+tmpName+' > '+tmpName+'f'
-      os.system('fitexfilter '+tmpName+' > '+tmpName+'f')
-      os.system('rm '+tmpName)
-      myPtr.ptr = open(tmpName+'f','r')
+      def filterFiles(outName):
+        tmpName = outName+'.in'
+        print 'joining '+string.join(filelist)+' into '+tmpName
+        inp,out = dmapStream(filelist),open(tmpName,'wb')
+        shutil.copyfileobj(inp,out,1048576)
+        inp.close()
+        out.close()
+        print 'fitexfilter '+tmpName+' > '+outName
+        status = os.system('fitexfilter '+tmpName+' > '+outName)
+        os.remove(tmpName)
+        if(status != 0): raise IOError('fitexfilter failed on '+string.join(filelist))
+      try:
+        key = fileKey(keylist,tag='fitexfilter')
+        myPtr.ptr = open(getCachedFile(key,filterFiles,suffix='.'+rad+'.'+fileType+'f'),'r')
+      except Exception,e:
+        print e
+        print 'problem filtering the data'
+        myPtr.ptr = None
       
   if(myPtr.ptr != None): 
     if(myPtr.dType == None): myPtr.dType = 'dmap'
@@ -277,6 +312,39 @@ def radDataOpen(sTime,rad,eTime=None,channel=None,bmnum=None,cp=None, \
     print '\nSorry, we could not find any data for you :('
     return None
   
+#the arrays that readDmapRec returns as numpy ndarrays instead of lists.
+#these are the large rawacf and iqdat sample arrays, which are reshaped
+#in place by rawData and iqData
+dmapArrays = ('acfd','xcfd','data')
+
+def dmapFilterArgs(myPtr, bmnum=True, channel=None):
+  """Builds the filter keywords for :func:`pydarn.dmapio.readDmapRec` from a :class:`radDataTypes.radDataPtr`, so that records which don't match are skipped before their arrays are decoded.
+
+  **Args**:
+    * **myPtr** (:class:`radDataTypes.radDataPtr`): the pointer whose time window and parameters are wanted
+    * **[bmnum]** (boolean): whether to filter on myPtr.bmnum.  default = True
+    * **[channel]** (str): a 1-letter channel to use instead of myPtr.channel.  default = None
+  **Returns**:
+    * **kwargs** (dict): keyword arguments for readDmapRec
+  **Example**:
+    ::
+
+      dfile = pydarn.dmapio.readDmapRec(myPtr.ptr, **dmapFilterArgs(myPtr))
+
+  """
+  from pydarn.sdio.radDataTypes import alpha
+  from utils.timeUtils import datetimeToEpoch
+
+  kwargs = {}
+  if(myPtr.sTime != None): kwargs['sTime'] = datetimeToEpoch(myPtr.sTime)
+  if(myPtr.eTime != None): kwargs['eTime'] = datetimeToEpoch(myPtr.eTime)
+  if(myPtr.stid != None): kwargs['stid'] = myPtr.stid
+  if(channel == None): channel = myPtr.channel
+  if(channel != None): kwargs['channel'] = alpha.index(channel)+1
+  if(bmnum and myPtr.bmnum != None): kwargs['bmnum'] = myPtr.bmnum
+  if(myPtr.cp != None): kwargs['cp'] = myPtr.cp
+  return kwargs
+
 def radDataReadRec(myPtr):
   """A function to read a single record of radar data from a :class:`radDataTypes.radDataPtr` object
   
@@ -296,24 +364,65 @@ def radDataReadRec(myPtr):
       myBeam = radDataReadRec(myPtr)
     
   Written by AJ 20130110
+  """
+  beams = radDataReadBatch(myPtr,1)
+  if(beams == None): return None
+  return beams[0]
+
+def radDataReadBatch(myPtr, n, columnar=False):
+  """A function to read a block of up to n records of radar data from a :class:`radDataTypes.radDataPtr` object.  The setup that :func:`radDataReadRec` repeats for every record is done once per block, so this is the faster way to read a long stream.
+  
+  .. note::
+    to use this, you must first create a :class:`radDataTypes.radDataPtr` object with :func:`radDataOpen` 
+
+  **Args**:
+    * **myPtr** (:class:`radDataTypes.radDataPtr`): contains the pipeline to the data we are after
+    * **n** (int): the maximum number of records to read
+    * **[columnar]** (boolean): if True, return the block as columns (see :func:`beamsToColumns`) instead of a list of beams.  fit data from a dmap file is then decoded straight into columns by :func:`pydarn.dmapio.readDmapFile`, without building any beams, and a record that can't be decoded raises an IOError.  default = False
+  **Returns**:
+    * **beams** (list): a list of up to n :class:`radDataTypes.beamData` objects, fewer only at the end of the data.  or a dict of numpy arrays if columnar is True.  *will return None when finished reading*
+    
+  **Example**:
+    ::
+    
+      import datetime as dt
+      myPtr = radDataOpen(dt.datetime(2011,1,1),'bks',eTime=dt.datetime(2011,1,1,2),channel='a',fileType='fitex')
+      beams = radDataReadBatch(myPtr,500)
+    
   """
   from pydarn.sdio.radDataTypes import radDataPtr, beamData, \
-    fitData, prmData, rawData, iqData, refArr, alpha
+    refArr, alpha, cipher
   import pydarn, datetime as dt
-  from pydarn.sdio.radDataTypes import cipher
+  import numpy as np
   
   #check input
   assert(isinstance(myPtr,radDataPtr)),\
     'error, input must be of type radDataPtr'
+  assert(isinstance(n,int) and n > 0),'error, n must be a positive int'
   if(myPtr.ptr == None):
     print 'error, your pointer does not point to any data'
     return None
+  #we have already reached the end of a dmap stream
+  if(myPtr.dType == 'dmap' and myPtr.ptr.closed): return None
   
-  myBeam = beamData()
+  beams = []
+  fltArgs = dmapFilterArgs(myPtr)
+  isFit = (myPtr.fType == 'fitacf' or myPtr.fType == 'fitex' or myPtr.fType == 'lmfit')
   
-  #do this until we reach the requested start time
-  #and have a parameter match
-  while(1):
+  #decode fit records straight into columns, carrying on from where
+  #the stream is.  fewer than n records means we hit the end
+  if(columnar and isFit and myPtr.dType == 'dmap'):
+    cols = pydarn.dmapio.readDmapFile(myPtr.ptr,offset=-1,n=n,**fltArgs)
+    if(len(cols['time']) < n):
+      print '\nreached end of data'
+      myPtr.ptr.close()
+    if(len(cols['time']) == 0): return None
+    #channels 0 and 1 are both 'a', as in beamsToColumns
+    cols['channel'] = np.maximum(cols['channel'],1)
+    return cols
+
+  #do this until we have n records or reach the end of the data
+  while(len(beams) < n):
     #check for a mongodb query object
     if(myPtr.dType == 'mongo'):
       #get the next record from the database
@@ -322,9 +431,10 @@ def radDataReadRec(myPtr):
       if(rec == None or rec[cipher['time']] > myPtr.eTime):
         #if we dont have valid data, clean up, get out
         print '\nreached end of data'
-        try: myPtr.ptr.collection.database.connection.disconnect()
+        #the connection is shared, so only close the cursor
+        try: myPtr.ptr.close()
         except: pass
-        return None
+        break
       #check that we're in the time window, and that we have a 
       #match for out params
       if(rec[cipher['time']] >= myPtr.sTime and rec[cipher['time']] <= myPtr.eTime and \
@@ -333,22 +443,23 @@ def radDataReadRec(myPtr):
           (myPtr.bmnum == None or myPtr.bmnum == rec[cipher['bmnum']]) and
           (myPtr.cp == None or myPtr.cp == rec[cipher['cp']])):
         #fill the beamData object
+        myBeam = beamData()
         myBeam.dbDictToObj(rec)
         myBeam.fType = myPtr.fType
         setattr(myBeam,refArr[myPtr.fType],1)
-        if(myPtr.fType == 'fitex' or myPtr.fType == 'fitex' or myPtr.fType == 'lmfit'):
-          if(myBeam.fit.slist == None): myBeam.fit.slist = []
-        return myBeam
+        if(isFit and myBeam.fit.slist == None): myBeam.fit.slist = []
+        beams.append(myBeam)
     #check if we're reading from a dmap file
     elif(myPtr.dType == 'dmap'):
-      #read the next record from the dmap file
-      dfile = pydarn.dmapio.readDmapRec(myPtr.ptr)
+      #read the next matching record from the dmap file, the
+      #others are skipped without being decoded
+      dfile = pydarn.dmapio.readDmapRec(myPtr.ptr,arrays=dmapArrays,**fltArgs)
       #check for valid data
       if(dfile == None or dt.datetime.utcfromtimestamp(dfile['time']) > myPtr.eTime):
         #if we dont have valid data, clean up, get out
         print '\nreached end of data'
         myPtr.ptr.close()
-        return None
+        break
       #check that we're in the time window, and that we have a 
       #match for the desired params
       if(dfile['channel'] < 2): channel = 'a'
@@ -360,6 +471,7 @@ def radDataReadRec(myPtr):
           (myPtr.bmnum == None or myPtr.bmnum == dfile['bmnum']) and
           (myPtr.cp == None or myPtr.cp == dfile['cp'])):
         #fill the beamdata object
+        myBeam = beamData()
         myBeam.updateValsFromDict(dfile)
         myBeam.fit.updateValsFromDict(dfile)
         myBeam.prm.updateValsFromDict(dfile)
@@ -367,13 +479,124 @@ def radDataReadRec(myPtr):
         myBeam.iqdat.updateValsFromDict(dfile)
         myBeam.fType = myPtr.fType
         setattr(myBeam,refArr[myPtr.fType],1)
-        if(myPtr.fType == 'fitex' or myPtr.fType == 'fitex' or myPtr.fType == 'lmfit'):
+        if(isFit):
           setattr(myBeam,myPtr.fType,myBeam.fit)
           if(myBeam.fit.slist == None): myBeam.fit.slist = []
-        return myBeam
+        beams.append(myBeam)
     else: 
       print 'error, unrecognized data type'
       return None
+
+  if(len(beams) == 0): return None
+  if(columnar): return beamsToColumns(beams)
+  return beams
+
+#the columns of a bulk read, laid out like the output of
+#pydarn.dmapio.readDmapFile.  (name, dtype, fill) for the scalars, which
+#have one value per beam, and for the per-gate vectors, which are
+#concatenated and sliced by 'offsets'
+colScalars = [('stid','int16',-1),('bmnum','int16',-1),('channel','int16',-1), \
+              ('cp','int16',-1),('scan','int16',-1),('nrang','int16',-1), \
+              ('frang','int16',-1),('rsep','int16',-1),('tfreq','int16',-1), \
+              ('nave','int16',-1),('noisesky','float32',float('nan')), \
+              ('noisesearch','float32',float('nan')),('noisemean','float32',float('nan'))]
+colVectors = [('slist','int16',-1),('v','float32',float('nan')),('p_l','float32',float('nan')), \
+              ('w_l','float32',float('nan')),('gflg','int8',-1),('elv','float32',float('nan')), \
+              ('phi0','float32',float('nan'))]
+
+def makeColumns(times, scalars, vectors):
+  """Builds columns, laid out like the output of :func:`pydarn.dmapio.readDmapFile`, from the values of each field over a block of records.  Each column is built in one numpy call over its values, without a dict per record.  This is shared by the bulk readers so that their output is the same whichever backend the data came from.
+
+  **Args**:
+    * **times** (list): the time of each record, in epoch seconds
+    * **scalars** (dict): for each name in colScalars, a list of its value in each record.  None values, or names that are left out, are filled with NaN, or -1 for the integer fields.  the channel is 1 for 'a', 2 for 'b', etc.
+    * **vectors** (dict): for each name in colVectors, a list of its per-gate values in each record.  a record's values are filled in the same way if they are None, or if their length differs from its slist
+  **Returns**:
+    * **cols** (dict): numpy arrays 'time', the colScalars with one value per beam, 'offsets', and the colVectors, where beam i owns cols['slist'][cols['offsets'][i]:cols['offsets'][i+1]]
+  **Example**:
+    ::
+
+      cols = makeColumns([1293840000.],{'stid':[33],'bmnum':[7]},{'slist':[[10,11]],'v':[[150.,160.]]})
+
+  """
+  import numpy as np
+  from itertools import chain, izip
+
+  n = len(times)
+  cols = {'time':np.array(times,dtype=np.float64)}
+  for key,dtype,default in colScalars:
+    vals = scalars.get(key)
+    if(vals is None): vals = [None]*n
+    cols[key] = np.fromiter((default if x is None else x for x in vals),dtype=dtype,count=n)
+
+  #the per-gate fields, sized by slist
+  slists = vectors.get('slist',[None]*n)
+  lens = np.fromiter((0 if x is None else len(x) for x in slists),dtype=np.int64,count=n)
+  cols['offsets'] = np.zeros(n+1,dtype=np.int64)
+  np.cumsum(lens,out=cols['offsets'][1:])
+  for key,dtype,default in colVectors:
+    vals = vectors.get(key,[None]*n)
+    ok = np.fromiter((x is not None and len(x) == l for x,l in izip(vals,lens)),dtype=bool,count=n)
+    if(ok.all()):
+      cols[key] = np.fromiter(chain.from_iterable(vals),dtype=dtype,count=cols['offsets'][-1])
+      continue
+    col = np.empty(cols['offsets'][-1],dtype=dtype)
+    col.fill(default)
+    good = np.repeat(ok,lens)
+    col[good] = np.fromiter(chain.from_iterable(x for x,o in izip(vals,ok) if o),dtype=dtype,count=good.sum())
+    cols[key] = col
+  return cols
+
+def concatColumns(parts):
+  """Joins blocks of columns, as made by :func:`makeColumns`, into one, shifting the offsets of each block.
+
+  **Args**:
+    * **parts** (list): the blocks of columns, in order
+  **Returns**:
+    * **cols** (dict): the joined columns, or None if there are no blocks
+  **Example**:
+    ::
+
+      cols = concatColumns([makeColumns(*blk) for blk in blocks])
+
+  """
+  import numpy as np
+
+  if(len(parts) == 0): return None
+  if(len(parts) == 1): return parts[0]
+  cols = dict((key,np.concatenate([p[key] for p in parts])) \
+              for key in parts[0].keys() if key != 'offsets')
+  offsets,last = [np.zeros(1,dtype=np.int64)],0
+  for p in parts:
+    offsets.append(p['offsets'][1:]+last)
+    last += p['offsets'][-1]
+  cols['offsets'] = np.concatenate(offsets)
+  return cols
+
+def beamsToColumns(beams):
+  """Converts a list of beams into columns, laid out like the output of :func:`pydarn.dmapio.readDmapFile`.  See :func:`makeColumns`.
+
+  **Args**:
+    * **beams** (list): a list of :class:`radDataTypes.beamData` objects
+  **Returns**:
+    * **cols** (dict): numpy arrays 'time' (epoch seconds), 'stid', 'bmnum', 'channel' (1 for 'a', 2 for 'b', ...), 'cp', 'scan', 'nrang', 'frang', 'rsep', 'tfreq', 'nave', 'noisesky', 'noisesearch', 'noisemean', 'offsets', 'slist', 'v', 'p_l', 'w_l', 'gflg', 'elv' and 'phi0'
+  **Example**:
+    ::
+
+      cols = beamsToColumns(radDataReadBatch(myPtr,500))
+
+  """
+  from pydarn.sdio.radDataTypes import alpha
+  from utils.timeUtils import datetimeToEpoch
+
+  chanNum = dict((alpha[i],i+1) for i in range(len(alpha)))
+  times = [datetimeToEpoch(b.time) for b in beams]
+  scalars = {'stid':[b.stid for b in beams],'bmnum':[b.bmnum for b in beams], \
+             'cp':[b.cp for b in beams],'channel':[chanNum.get(b.channel) for b in beams]}
+  for key,dtype,default in colScalars[4:]:
+    scalars[key] = [getattr(b.prm,key) for b in beams]
+  vectors = dict((key,[getattr(b.fit,key) for b in beams]) for key,dtype,default in colVectors)
+  return makeColumns(times,scalars,vectors)
       
 def radDataReadScan(myPtr):
   """A function to read a full scan of data from a :class:`radDataTypes.radDataPtr` object
@@ -415,6 +638,7 @@ def radDataReadScan(myPtr):
   else: firstflg = True
   if(myPtr.channel == None): tmpchn = 'a'
   else: tmpchn = myPtr.channel
+  fltArgs = dmapFilterArgs(myPtr,bmnum=False,channel=tmpchn)
   
   #do this until we reach the requested start time
   #and have a parameter match
@@ -427,7 +651,8 @@ def radDataReadScan(myPtr):
       if(rec == None or rec[cipher['time']] > myPtr.eTime):
         #if we dont have valid data, clean up, get out
         print '\nreached end of data'
-        try: myPtr.ptr.collection.database.connection.disconnect()
+        #the connection is shared, so only close the cursor
+        try: myPtr.ptr.close()
         except: pass
         return None
       #check that we're in the time window, and that we have a 
@@ -451,8 +676,9 @@ def radDataReadScan(myPtr):
           return myScan
     #check if we're reading from a dmap file
     elif(myPtr.dType == 'dmap'):
-      #read the next record from the dmap file
-      dfile = pydarn.dmapio.readDmapRec(myPtr.ptr)
+      #read the next matching record from the dmap file, the
+      #others are skipped without being decoded
+      dfile = pydarn.dmapio.readDmapRec(myPtr.ptr,arrays=dmapArrays,**fltArgs)
       #check for valid data
       if(dfile == None or dt.datetime.utcfromtimestamp(dfile['time']) > myPtr.eTime):
         #if we dont have valid data, clean up, get out
@@ -7,6 +7,7 @@
 *********************
 **Classes**:
   * :class:`radDataPtr`
+  * :class:`dmapStream`
   * :class:`baseData`
   * :class:`beamData`
   * :class:`prmData`
@@ -52,8 +53,15 @@ class radDataPtr():
     * **dType** (str): the data type, 'mongo' or 'dmap'
     * **fType** (str): the file type, 'fitacf', 'rawacf', 'iqdat', 'fitex', 'lmfit'
     * **fBeam** (:class:`beamData`): the first beam of the next scan, useful for when reading into scan objects
+    * **batchSize** (int): the number of records read at a time when iterating over the pointer
   **Methods**:
-    * Nothing.
+    * :func:`readBatch`
+  **Example**:
+    ::
+
+      myPtr = pydarn.sdio.radDataOpen(dt.datetime(2011,1,1),'bks',bmnum=7)
+      for myBeam in myPtr:
+        print myBeam.time
     
   Written by AJ 20130108
   """
@@ -68,6 +76,31 @@ class radDataPtr():
     self.dType = None
     self.fType = None
     self.fBeam = None
+    self.batchSize = 256
+
+  def __iter__(self):
+    """iterate over the remaining beams, which are read batchSize at a time"""
+    from pydarn.sdio.radDataRead import radDataReadBatch
+    while(1):
+      beams = radDataReadBatch(self,self.batchSize)
+      if(beams == None): return
+      for myBeam in beams: yield myBeam
+
+  def readBatch(self, n, columnar=False):
+    """Reads a block of up to n beams, see :func:`pydarn.sdio.radDataRead.radDataReadBatch`
+
+    **Args**:
+      * **n** (int): the maximum number of beams to read
+      * **[columnar]** (boolean): if True, return the block as a dict of numpy arrays instead of a list of beams.  default = False
+    **Returns**:
+      * **beams** (list): up to n :class:`beamData` objects, or a dict of numpy arrays.  None when there is nothing left to read
+    **Example**:
+      ::
+
+        beams = myPtr.readBatch(500)
+    """
+    from pydarn.sdio.radDataRead import radDataReadBatch
+    return radDataReadBatch(self,n,columnar=columnar)
     
   def __repr__(self):
     myStr = 'radDataPtr\n'
@@ -75,18 +108,146 @@ class radDataPtr():
       myStr += key+' = '+str(var)+'\n'
     return myStr
 
-class baseData():
+class dmapStream():
+  """A read-only file-like object which reads a list of dmap files as one continuous stream.  Files ending in .bz2 or .gz are decompressed in memory as they are read, so no uncompressed copy is ever written to disk.
+
+  **Attrs**:
+    * **fileList** (list): the names of the files which have not been opened yet
+    * **closed** (bool): True once the stream has been closed
+  **Methods**:
+    * :func:`read`
+    * :func:`close`
+  **Example**:
+    ::
+
+      myStream = pydarn.sdio.dmapStream(['20110101.00.bks.fitex.bz2','20110101.02.bks.fitex.bz2'])
+      myDict = pydarn.dmapio.readDmapRec(myStream)
+  """
+  def __init__(self, fileList, offset=0, chunkSize=1048576):
+    """
+    **Args**:
+      * **fileList** (list): the names of the files to read, in order
+      * **[offset]** (int): the number of (uncompressed) bytes to skip at the start of the first file.  an uncompressed file is seeked into, a .bz2 or .gz file is still decompressed up to the offset, so this only saves parsing the skipped records.  default = 0
+      * **[chunkSize]** (int): the number of compressed bytes read from disk at a time.  default = 1048576
+    """
+    self.fileList = list(fileList)
+    self.chunkSize = chunkSize
+    self.closed = False
+    self._fp = None
+    self._decomp = None
+    self._newDecomp = None
+    self._buf = ''
+    self._bufPos = 0
+    self._nextFile()
+    if(offset > 0 and self._fp != None and self._decomp == None):
+      self._fp.seek(offset)
+      offset = 0
+    while(offset > 0):
+      skipped = len(self.read(min(offset,self.chunkSize)))
+      if(skipped == 0): break
+      offset -= skipped
+
+  def _nextFile(self):
+    """close the current file and open the next one, returns False when there are none left"""
+    import bz2, zlib
+    if(self._fp != None): self._fp.close()
+    self._fp, self._decomp, self._newDecomp = None, None, None
+    if(len(self.fileList) == 0): return False
+    fileName = self.fileList.pop(0)
+    self._fp = open(fileName,'rb')
+    if(fileName.endswith('.bz2')): self._newDecomp = bz2.BZ2Decompressor
+    elif(fileName.endswith('.gz')): self._newDecomp = lambda: zlib.decompressobj(16+zlib.MAX_WBITS)
+    if(self._newDecomp != None): self._decomp = self._newDecomp()
+    return True
+
+  def _decompress(self, raw):
+    """decompress a chunk, starting a new decompressor whenever a compressed stream ends, since files may hold several concatenated streams"""
+    out = []
+    while(len(raw) > 0):
+      try: out.append(self._decomp.decompress(raw))
+      except EOFError:
+        #the previous stream ended exactly at the end of the last chunk
+        self._decomp = self._newDecomp()
+        continue
+      raw = self._decomp.unused_data
+      if(len(raw) > 0): self._decomp = self._newDecomp()
+    return ''.join(out)
+
+  def read(self, n=-1):
+    """Reads up to n bytes, fewer only at the end of the last file.  n < 0 reads everything that is left.
+
+    **Args**:
+      * **[n]** (int): the number of bytes to read.  default = -1
+    **Returns**:
+      * **data** (str): the bytes read, '' at the end of the stream
+    """
+    have = len(self._buf)-self._bufPos
+    #serve small reads straight from the buffer
+    if(n >= 0 and have >= n):
+      data = self._buf[self._bufPos:self._bufPos+n]
+      self._bufPos += n
+      return data
+    pieces = [self._buf[self._bufPos:]]
+    while((n < 0 or have < n) and self._fp != None):
+      raw = self._fp.read(self.chunkSize)
+      if(raw == ''):
+        self._nextFile()
+        continue
+      if(self._decomp != None): raw = self._decompress(raw)
+      pieces.append(raw)
+      have += len(raw)
+    self._buf = ''.join(pieces)
+    if(n < 0): n = len(self._buf)
+    data = self._buf[:n]
+    self._bufPos = len(data)
+    return data
+
+  def close(self):
+    """Closes the stream and any open file"""
+    if(self._fp != None): self._fp.close()
+    self._fp, self.fileList, self._buf, self._bufPos = None, [], '', 0
+    self.closed = True
+
+class baseData(object):
   """a base class for the radar data types.  This allows for single definition of common routines
+
+  .. note::
+    the radar data types use __slots__ to keep a day of beams small, so their attributes are fixed.  Use :func:`iterAttrs` instead of __dict__ to walk them.
   
   **ATTRS**:
     * Nothing.
   **METHODS**:
+    * :func:`iterAttrs`: lists the (name, value) pairs of the attributes that are set
     * :func:`dbDictToObj`: converts a mongodb dictionary to a baseData object
     * :func:`toDbDict`: converts a baseData object to a mongodb dictionaty
     * :func:`updateValsFromDict`: converts a dict from a dmap file to baseData
     
   Written by AJ 20130108
   """
+  __slots__ = ()
+  #attributes that updateValsFromDict leaves to the subclass, or that
+  #hold other baseData objects
+  _dmapSkip = ()
+  #attributes that are only updated when the dmap dict has them, and
+  #the dmap names they are stored under
+  _dmapKeep = ()
+  #attributes that are copied straight from the dmap dict, None when
+  #missing.  filled in by _compileDmapFields at import time
+  _dmapPlain = ()
+
+  def iterAttrs(self):
+    """lists the (name, value) pairs of the attributes which are set.  attributes that have been deleted are skipped.
+
+    **Args**:
+      * Nothing.
+    **Returns**:
+      * **attrs** (list): (name, value) tuples
+    **Example**:
+      ::
+
+        for key,val in myBeam.fit.iterAttrs(): print key,val
+    """
+    return [(attr,getattr(self,attr)) for attr in self.__slots__ if hasattr(self,attr)]
   
   def copyData(self,obj):
     """This method is used to recursively copy all of the contents from ont object to self
@@ -105,7 +266,7 @@ class baseData():
       
     written by AJ, 20130402
     """
-    for key, val in obj.__dict__.iteritems():
+    for key, val in obj.iterAttrs():
       if isinstance(val, baseData):
         try: getattr(self, key).copyData(val)
         except: pass
@@ -140,7 +301,7 @@ class baseData():
       #if the value is a dictionary, make a recursive call
       elif(isinstance(val,dict)): 
         if(cipher[key] == 'fitex' or cipher[key] == 'lmfit' or cipher[key] == 'fitacf'):
-          self.fit.dictToObj(val)
+          self.fit.dbDictToObj(val)
         else: getattr(self, cipher[key]).dbDictToObj(val)
       #otherwise, copy the value
       else: setattr(self,cipher[key],val)
@@ -162,8 +323,9 @@ class baseData():
       
     written by AJ, 20130123
     """
+    import numpy as np
     aDict = {}
-    for attr, val in self.__dict__.iteritems():
+    for attr, val in self.iterAttrs():
       #check for things we dont want to save
       if(attr=='inttus' or attr=='tus' or attr.rfind('_s') != -1): continue
       elif(attr == 'inttsc'): 
@@ -174,6 +336,8 @@ class baseData():
         except: aDict['tt'] = None
       #if the value is a class, recursively convert to dict
       elif(isinstance(val,baseData)): aDict[cipher[attr]] = val.toDbDict()
+      #mongodb can't store numpy arrays, so store them as nested lists
+      elif(isinstance(val,np.ndarray)): aDict[cipher[attr]] = val.tolist()
       #otherwise, copy the value
       else: aDict[cipher[attr]] = val
     return aDict
@@ -191,94 +355,16 @@ class baseData():
       
     Written by AJ 20121130
     """
-    
-    import datetime as dt
-    
-    #iterate through prmData's attributes
-    for attr, value in self.__dict__.iteritems():
-      #check for special params
-      if(attr == 'time'):
-        #convert from epoch to datetime
-        if(aDict.has_key(attr) and isinstance(aDict[attr], float)): 
-          setattr(self,attr,dt.datetime.utcfromtimestamp(aDict[attr]))
-        continue
-      elif(attr == 'channel'):
-        if(aDict.has_key('channel')): 
-          if(isinstance(aDict.has_key('channel'), int)):
-            if(aDict['channel'] < 2): self.channel = 'a'
-            else: self.channel = alpha[aDict['channel']-1]
-          else: self.channel = aDict['channel']
-        else: self.channel = 'a'
-        continue
-      elif(attr == 'inttus'):
-        if(aDict.has_key('intt.us')): 
-          self.inttus = aDict['intt.us']
-        continue
-      elif(attr == 'inttsc'):
-        if(aDict.has_key('intt.sc')): 
-          self.inttsc = aDict['intt.sc']
-        continue
-      elif(attr == 'noisesky'):
-        if(aDict.has_key('noise.sky')): 
-          self.noisesky = aDict['noise.sky']
-        continue
-      elif(attr == 'noisesearch'):
-        if(aDict.has_key('noise.search')): 
-          self.noisesearch = aDict['noise.search']
-        continue
-      elif(attr == 'noisemean'):
-        if(aDict.has_key('noise.mean')): 
-          self.noisemean = aDict['noise.mean']
-        continue
-      elif(attr == 'acfd' or attr == 'xcfd'):
-        if(aDict.has_key(attr)): 
-          setattr(self,attr,[])
-          for i in range(self.parent.prm.nrang):
-            rec = []
-            for j in range(self.parent.prm.mplgs):
-              samp = []
-              for k in range(2):
-                samp.append(aDict[attr][(i*self.parent.prm.mplgs+j)*2+k])
-              rec.append(samp)
-            getattr(self, attr).append(rec)
-        else: setattr(self,attr,[])
-        continue
-      elif(attr == 'mainData'):
-        if(aDict.has_key('data')): 
-          if(len(aDict['data']) == aDict['smpnum']*aDict['seqnum']*2*2): fac = 2
-          else: fac = 1
-          setattr(self,attr,[])
-          for i in range(aDict['seqnum']):
-            rec = []
-            for j in range(aDict['smpnum']):
-              samp = []
-              for k in range(2):
-                samp.append(aDict['data'][(i*fac*aDict['smpnum']+j)*2+k])
-              rec.append(samp)
-            getattr(self, attr).append(rec)
-        else: setattr(self,attr,[])
-        continue
-      elif(attr == 'intData'):
-        if(aDict.has_key('data')): 
-          if(len(aDict['data']) == aDict['smpnum']*aDict['seqnum']*2*2): fac = 2
-          else: continue
-          setattr(self,attr,[])
-          for i in range(aDict['seqnum']):
-            rec = []
-            for j in range(aDict['smpnum']):
-              samp = []
-              for k in range(2):
-                samp.append(aDict['data'][((i*fac+1)*aDict['smpnum']+j)*2+k])
-              rec.append(samp)
-            getattr(self, attr).append(rec)
-        else: setattr(self,attr,[])
-        continue
-      try:
-        setattr(self,attr,aDict[attr])
-      except:
-        #put in a default value if not another object
-        if(not isinstance(getattr(self,attr),baseData)):
-          setattr(self,attr,None)
+    get = aDict.get
+    for attr in self._dmapPlain:
+      setattr(self,attr,get(attr))
+    for attr,key in self._dmapKeep:
+      if(key in aDict): setattr(self,attr,aDict[key])
+    self._specialValsFromDict(aDict)
+
+  def _specialValsFromDict(self, aDict):
+    """fill the attributes which need converting, the subclasses override this"""
+    pass
           
   #def __repr__(self):
     #myStr = ''
@@ -337,6 +423,11 @@ class beamData(baseData):
     
   Written by AJ 20121130
   """
+  __slots__ = ('cp','stid','time','bmnum','channel','exflg','lmflg','acflg', \
+                'rawflg','iqflg','fitex','fitacf','lmfit','fit','rawacf','prm', \
+                'iqdat','fType')
+  _dmapSkip = ('time','channel','fit','rawacf','prm','iqdat')
+
   def __init__(self, beamDict=None, myBeam=None, proctype=None):
     #initialize the attr values
     self.cp = None
@@ -360,11 +451,23 @@ class beamData(baseData):
     
     #if we are intializing from an object, do that
     if(beamDict != None): self.updateValsFromDict(beamDict)
+
+  def _specialValsFromDict(self, aDict):
+    """convert the epoch time to a datetime and the channel number to a letter"""
+    import datetime as dt
+    if(isinstance(aDict.get('time'), float)):
+      self.time = dt.datetime.utcfromtimestamp(aDict['time'])
+    if(aDict.has_key('channel')):
+      if(isinstance(aDict['channel'], int)):
+        if(aDict['channel'] < 2): self.channel = 'a'
+        else: self.channel = alpha[aDict['channel']-1]
+      else: self.channel = aDict['channel']
+    else: self.channel = 'a'
     
   def __repr__(self):
     import datetime as dt
     myStr = 'Beam record FROM: '+str(self.time)+'\n'
-    for key,var in self.__dict__.iteritems():
+    for key,var in self.iterAttrs():
       myStr += key+' = '+str(var)+'\n'
     return myStr
     
@@ -399,6 +502,12 @@ class prmData(baseData):
   Written by AJ 20121130
   """
 
+  __slots__ = ('nave','lagfr','smsep','bmazm','scan','rxrise','inttsc','inttus', \
+                'mpinc','mppul','mplgs','mplgexs','nrang','frang','rsep','xcf', \
+                'tfreq','ifmode','ptab','ltab','noisemean','noisesky','noisesearch')
+  _dmapKeep = (('inttsc','intt.sc'),('inttus','intt.us'),('noisemean','noise.mean'), \
+                ('noisesky','noise.sky'),('noisesearch','noise.search'))
+
   #initialize the struct
   def __init__(self, prmDict=None, myPrm=None):
     #set default values
@@ -461,6 +570,9 @@ class fitData(baseData):
   Written by AJ 20121130
   """
 
+  __slots__ = ('pwr0','slist','npnts','nlag','qflg','gflg','p_l','p_l_e','p_s', \
+                'p_s_e','v','v_e','w_l','w_l_e','w_s','w_s_e','phi0','phi0_e','elv')
+
   #initialize the struct
   def __init__(self, fitDict=None, myFit=None):
     self.pwr0 = None      #lag 0 power
@@ -489,8 +601,8 @@ class rawData(baseData):
   """a class to contain the rawacf data from a radar beam sounding, extends :class:`baseData`
   
   **Attrs**:
-    * **acfd** (nrang x mplgs x 2 length list): acf data
-    * **xcfd** (nrang x mplgs x 2 length list): xcf data
+    * **acfd** (nrang x mplgs x 2 float32 numpy array): acf data, real and imaginary parts in the last axis
+    * **xcfd** (nrang x mplgs x 2 float32 numpy array): xcf data, real and imaginary parts in the last axis
   
   **Example**: 
     ::
@@ -500,6 +612,9 @@ class rawData(baseData):
   Written by AJ 20130125
   """
 
+  __slots__ = ('acfd','xcfd','parent')
+  _dmapSkip = __slots__
+
   #initialize the struct
   def __init__(self, rawDict=None, parent=None):
     self.acfd = []      #acf data
@@ -507,6 +622,18 @@ class rawData(baseData):
     self.parent = parent #reference to parent beam
     
     if(rawDict != None): self.updateValsFromDict(rawDict)
+
+  def _specialValsFromDict(self, aDict):
+    """take the acf and xcf samples as nrang x mplgs x 2 arrays.  readDmapRec decodes them straight into arrays of that shape (see pydarn.sdio.radDataRead.dmapArrays), which are sliced to nrang without copying.  flat lists, as readDmapRec returns by default, are converted and reshaped"""
+    import numpy as np
+    nrang,mplgs = self.parent.prm.nrang,self.parent.prm.mplgs
+    for attr in ['acfd','xcfd']:
+      if(not aDict.has_key(attr)): setattr(self,attr,[])
+      elif(isinstance(aDict[attr],np.ndarray) and aDict[attr].ndim == 3): 
+        setattr(self,attr,aDict[attr][:nrang])
+      else:
+        samps = np.asarray(aDict[attr],dtype=np.float32).ravel()
+        setattr(self,attr,samps[:nrang*mplgs*2].reshape(nrang,mplgs,2))
     
 class iqData(baseData):
   """ a class to contain the iq data from a radar beam sounding, extends :class:`baseData`
@@ -526,8 +653,8 @@ class iqData(baseData):
     * **offset** (? length list): ?
     * **size** (? length list): ?
     * **badtr** (? length list): bad tr samples?
-    * **mainData** (seqnum x smpnum x 2 length list): the actual iq samples (main array)
-    * **intData** (seqnum x smpnum x 2 length list): the actual iq samples (interferometer)
+    * **mainData** (seqnum x smpnum x 2 int16 numpy array): the actual iq samples (main array)
+    * **intData** (seqnum x smpnum x 2 int16 numpy array): the actual iq samples (interferometer)
   
   **Example**: 
     ::
@@ -537,6 +664,10 @@ class iqData(baseData):
   Written by AJ 20130116
   """
 
+  __slots__ = ('seqnum','chnnum','smpnum','skpnum','btnum','tsc','tus','tatten', \
+                'tnoise','toff','tsze','tbadtr','badtr','mainData','intData')
+  _dmapSkip = ('mainData','intData')
+
   #initialize the struct
   def __init__(self, iqDict=None, parent=None):
     self.seqnum = None
@@ -557,3 +688,29 @@ class iqData(baseData):
     
     if(iqDict != None): self.updateValsFromDict(iqDict)
         
+
+  def _specialValsFromDict(self, aDict):
+    """reshape the flat samples into seqnum x smpnum x 2 arrays for the main array and, if it was recorded, the interferometer.  each sequence holds the main samples followed by the interferometer samples, so both are views of one array"""
+    import numpy as np
+    if(aDict.has_key('data')): 
+      seqnum,smpnum = aDict['seqnum'],aDict['smpnum']
+      #readDmapRec gives an int16 array (see pydarn.sdio.radDataRead.dmapArrays),
+      #which ravel and reshape only view
+      samps = aDict['data']
+      if(not isinstance(samps,np.ndarray)): samps = np.asarray(samps,dtype=np.int16)
+      samps = samps.ravel()
+      if(len(samps) == smpnum*seqnum*2*2): fac = 2
+      else: fac = 1
+      samps = samps[:seqnum*fac*smpnum*2].reshape(seqnum,fac,smpnum,2)
+      self.mainData = samps[:,0]
+      if(fac == 2): self.intData = samps[:,1]
+    else: self.mainData, self.intData = [], []
+
+def _compileDmapFields(cls):
+  """work out, once, which attributes of a radar data type are copied straight from a dmap dict"""
+  skip = set(cls._dmapSkip) | set(attr for attr,key in cls._dmapKeep)
+  cls._dmapPlain = tuple(attr for attr in cls.__slots__ if attr not in skip)
+
+for _cls in [beamData, prmData, fitData, rawData, iqData]:
+  _compileDmapFields(_cls)
+del _cls
@@ -17,6 +17,12 @@ This module contains the following functions
 	calcDistPnt
 		calculates the coordines|distance,elevation,azimuth of a point given a point of origin and distance,elevation,azimuth|distant point coordinates
 
+All these functions take scalars, lists or numpy arrays of any shape, which
+are broadcast against each other like numpy arithmetic, so that a whole set
+of points (a radar field of view, a satellite pass...) is converted in a
+single call. Array inputs give arrays of the broadcast shape, and scalar
+inputs give scalars.
+
 Based on J.M. Ruohoniemi's geopack
 Based on R.J. Barnes radar.pro
 Created by Sebastien
@@ -24,6 +30,20 @@ Created by Sebastien
 *******************************
 """
 
+# *************************************************************
+def _toArrays(*args):
+	"""Converts the inputs to float arrays, so that lists work like arrays"""
+	from numpy import asarray
+	return [asarray(x, dtype='float') for x in args]
+
+
+# *************************************************************
+def _toScalars(*args):
+	"""Returns the 0-d arrays of a result as scalars"""
+	from numpy import ndarray
+	return tuple([x[()] if isinstance(x, ndarray) and x.ndim == 0 else x for x in args])
+
+
 # *************************************************************
 def geodToGeoc(lat,lon,into='geoc'):
 	"""
@@ -43,6 +63,7 @@ OUTPUTS
 	
 	assert isinstance(into, str), 'geodToGeoc: Argument "into" must be a string. Try again!'
 	
+	lat, lon = _toArrays(lat, lon)
 	a = 6378.16
 	f = 1./298.25
 	b = a*(1.-f)
@@ -62,7 +83,7 @@ OUTPUTS
 		print 'geodToGeoc: {} is not a valid system.'.format(into)
 		return
 		
-	return latOut, lonOut, Re
+	return _toScalars(latOut, lonOut, Re)
 
 
 # *************************************************************
@@ -89,6 +110,7 @@ OUTPUTS
 	
 	assert isinstance(into, str), 'geodToGeocAzEl: Argument "into" must be a string. Try again!'
 	
+	lat, lon, az, el = _toArrays(lat, lon, az, el)
 	taz = radians(az)
 	tel = radians(el)
 	
@@ -131,7 +153,7 @@ OUTPUTS
 		print 'geodToGeocAzEl: {} is not a valid system. Try again!'.format(into)
 		return
 	
-	return latOut, lonOut, Re, azOut, elOut
+	return _toScalars(latOut, lonOut, Re, azOut, elOut)
 
 
 # *************************************************************
@@ -160,6 +182,7 @@ OUTPUTS
 	
 	assert isinstance(into, str), 'gspToGcar: Argument "into" must be a string. Try again!'
 	
+	X, Y, Z = _toArrays(X, Y, Z)
 	if into == 'gcar':
 		# Global spherical to global cartesian
 		xOut = Z * cos( radians(X) ) * cos( radians(Y) )
@@ -172,8 +195,9 @@ OUTPUTS
 		yOut = degrees( arctan2( Y, X ) )
 	else:
 		print 'gspToGcar: {} is not a valid system. Try again!'.format(into)
+		return
 		
-	return xOut, yOut, zOut
+	return _toScalars(xOut, yOut, zOut)
 
 
 # *************************************************************
@@ -210,6 +234,7 @@ OUTPUTS
 	
 	assert isinstance(into, str), 'gcarToLcar: Argument "into" must be a string. Try again!'
 	
+	X, Y, Z, lat, lon, rho = _toArrays(X, Y, Z, lat, lon, rho)
 	# First get global cartesian coordinates of local origin
 	(goX, goY, goZ) = gspToGcar(lat, lon, rho)
 	
@@ -245,8 +270,9 @@ OUTPUTS
 		zOut = zOut + goZ
 	else:
 		print 'gcarToLcar: {} is not a valid system. Try again!'.format(into)
+		return
 	
-	return xOut, yOut, zOut
+	return _toScalars(xOut, yOut, zOut)
 
 
 # *************************************************************
@@ -281,6 +307,7 @@ OUTPUTS
 	
 	assert(isinstance(into, str)), 'lspToLcar: Argument "into" must be a string. Try again!'
 	
+	X, Y, Z = _toArrays(X, Y, Z)
 	if into == 'lcar':
 		# local spherical into local cartesian
 		r = Z
@@ -299,8 +326,9 @@ OUTPUTS
 		zOut = r
 	else:
 		print 'lspToLcar: {} is not a valid system. Try again!'.format(into)
+		return
 	
-	return xOut, yOut, zOut
+	return _toScalars(xOut, yOut, zOut)
 
 
 # *************************************************************
@@ -329,14 +357,15 @@ INPUTS:
 		altitide [km] of distant point. Must be set together.
 OUTPUTS:
 	dict: a dictionary containing all the information about origin and distant \
-		points and their relative positions
+		points and their relative positions. With array inputs, every value is an \
+		array of the broadcast shape of the inputs
 	"""
-	from math import sqrt, pi
+	from math import pi
 	import numpy
 	
 	# If all the input parameters (keywords) are set to 0, show a warning, and default to fint distance/azimuth/elevation
 	if dist is None and el is None and az is None:
-		assert None not in [distLat, distLon, distAlt], 'calcDistPnt: Warning: Not enough keywords.'
+		assert distLat is not None and distLon is not None and distAlt is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
 		# Convert point of origin from geodetic to geocentric
 		(gcLat, gcLon, origRe) = geodToGeoc(origLat, origLon, into='geoc')
@@ -350,10 +379,10 @@ OUTPUTS:
 		(gaz, gel, rho) = lspToLcar(dX, dY, dZ, into='lsp')
 		# convert pointing azimuth and elevation to geodetic
 		(lat, lon, Re, az, el) = geodToGeocAzEl(gcLat, gcLon, gaz, gel, into='geod')
-		dist = sqrt( dX**2 + dY**2 + dZ**2 )
+		dist = numpy.sqrt( dX**2 + dY**2 + dZ**2 )
 
 	elif distLat is None and distLon is None and distAlt is None:
-		assert None not in [dist, el, az], 'calcDistPnt: Warning: Not enough keywords.'
+		assert dist is not None and el is not None and az is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
 		# convert pointing azimuth and elevation to geocentric
 		(gcLat, gcLon, origRe, gaz, gel) = geodToGeocAzEl(origLat, origLon, az, el, into='geoc')
@@ -369,7 +398,7 @@ OUTPUTS:
 		distRe = Re
 
 	elif dist is None and distAlt is None and az is None:
-		assert None not in [distLat, distLon, el], 'calcDistPnt: Warning: Not enough keywords.'
+		assert distLat is not None and distLon is not None and el is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
 		# Convert point of origin from geodetic to geocentric
 		(gcLat, gcLon, origRe) = geodToGeoc(origLat, origLon, into='geoc')
@@ -395,7 +424,7 @@ OUTPUTS:
 		dist = Dref*numpy.sin(theta)/numpy.cos(theta+numpy.radians(gel))
 
 	elif distLat is None and distLon is None and dist is None:
-		assert None not in [distAlt, el, az], 'calcDistPnt: Warning: Not enough keywords.'
+		assert distAlt is not None and el is not None and az is not None, 'calcDistPnt: Warning: Not enough keywords.'
 
 		# convert pointing azimuth and elevation to geocentric
 		(gcLat, gcLon, origRe, gaz, gel) = geodToGeocAzEl(origLat, origLon, az, el, into='geoc')
@@ -418,10 +447,11 @@ OUTPUTS:
 	else:
 		return
 	
-	# Fill output dictionary
-	dictOut = {'origLat': origLat, 'origLon': origLon, 'origAlt': origAlt, \
-				'distLat': distLat, 'distLon': distLon, 'distAlt': distAlt, \
-				'az': az, 'el': el, 'dist': dist, 'origRe': origRe, 'distRe': distRe}
+	# Fill output dictionary, with all the values broadcast to the same shape
+	keys = ['origLat', 'origLon', 'origAlt', 'distLat', 'distLon', 'distAlt', 'az', 'el', 'dist', 'origRe', 'distRe']
+	vals = numpy.broadcast_arrays(*_toArrays(origLat, origLon, origAlt, distLat, distLon, distAlt, \
+				az, el, dist, origRe, distRe))
+	dictOut = dict(zip(keys, _toScalars(*[v.copy() for v in vals])))
 	
 	return dictOut
 
@@ -156,12 +156,7 @@ class mapObj(basemap.Basemap):
 				flag = 0 if trans == 'geo-mag' else 1
 				try:
 					nx, ny = len(x), len(y)
-					xt = np.array(x)
-					yt = np.array(y)
-					shape = xt.shape	
-					y, x, _ = aacgm.aacgmConvArr(list(yt.flatten()), list(xt.flatten()), [0.]*nx, flag)
-					x = np.array(x).reshape(shape)
-					y = np.array(y).reshape(shape)
+					y, x, _ = aacgm.aacgmConvArray(y, x, 0., flag)
 				except TypeError as e:
 					y, x, _ = aacgm.aacgmConv(y, x, 0., flag)
 
@@ -180,12 +175,7 @@ class mapObj(basemap.Basemap):
 				if not inverse:
 					try:
 						nx, ny = len(x), len(y)
-						x = np.array(x)
-						y = np.array(y)
-						shape = x.shape
-						yout, xout, _ = aacgm.aacgmConvArr(list(y.flatten()), list(x.flatten()), [0.]*nx, 0)
-						xout = np.array(xout).reshape(shape)
-						yout = np.array(yout).reshape(shape)
+						yout, xout, _ = aacgm.aacgmConvArray(y, x, 0., 0)
 					except TypeError:
 						yout, xout, _ = aacgm.aacgmConv(y, x, 0., 0)
 					return basemap.Basemap.__call__(self, xout, yout, inverse=inverse)
@@ -205,10 +195,8 @@ class mapObj(basemap.Basemap):
 		import numpy as np
 
 		if self.coords is 'mag':
-			nPts = len(self._boundarypolyll.boundary[:, 0])
-			lats, lons, _ = aacgm.aacgmConvArr(list(self._boundarypolyll.boundary[:, 1]), 
-							list(self._boundarypolyll.boundary[:, 0]), 
-							[0.]*nPts, 1)
+			lats, lons, _ = aacgm.aacgmConvArray(self._boundarypolyll.boundary[:, 1], 
+							self._boundarypolyll.boundary[:, 0], 0., 1)
 			b = np.asarray([lons,lats]).T
 			oldgeom = deepcopy(self._boundarypolyll)
 			newgeom = _geoslib.Polygon(b).fix()